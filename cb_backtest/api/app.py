@@ -1,5 +1,6 @@
 """可转债回测服务API"""
 
+from contextlib import asynccontextmanager
 from typing import Dict
 from fastapi import FastAPI, HTTPException
 import yaml
@@ -8,13 +9,17 @@ import time
 import os
 from logging.handlers import RotatingFileHandler
 from cb_backtest.core.single_runner import SingleRunner
+from cb_backtest.core.dataset import get_registry
+from cb_backtest.core.store import META_FILE, ensure_store, get_store
+from cb_backtest.core.mask_cache import get_mask_cache
+from cb_backtest.core.factor_cache import configure_factor_cache, get_factor_cache
+from cb_backtest.core.transforms import get_transform_cache
 from .models import (
     BacktestRequest, 
     BacktestResponse, 
     BacktestResult
 )
 import sys
-from pathlib import Path
 
 # 设置项目根目录
 project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -50,10 +55,53 @@ except Exception as e:
     logger.error(f"加载配置文件失败: {str(e)}")
     config = {}
 
+def store_built(store_dir: str) -> bool:
+    """列式面板存储是否已构建"""
+    return os.path.exists(os.path.join(store_dir, META_FILE))
+
+def warm_dataset() -> None:
+    """启动时预加载数据集，避免首个请求承担读取开销"""
+    cache_config = config.get('cache') or {}
+    if 'mask_cache_mb' in cache_config:
+        get_mask_cache().resize(int(cache_config['mask_cache_mb'] * 1024 * 1024))
+    if 'transform_cache_mb' in cache_config:
+        get_transform_cache().resize(int(cache_config['transform_cache_mb'] * 1024 * 1024))
+    if cache_config.get('factor_cache_dir'):
+        configure_factor_cache(cache_config['factor_cache_dir'],
+                               int(cache_config.get('factor_cache_mb', 1024) * 1024 * 1024))
+        
+    data_config = config.get('data')
+    if not data_config:
+        return
+    try:
+        if data_config.get('store_dir'):
+            if not store_built(data_config['store_dir']):
+                # 未经 gunicorn 钩子启动（如直接运行 uvicorn）时由本进程构建存储
+                ensure_store(
+                    cb_data_path=data_config['cb_data_path'],
+                    index_data_path=data_config['index_data_path'],
+                    directory=data_config['store_dir']
+                )
+            get_store(data_config['store_dir'])
+        else:
+            get_registry().get(
+                cb_data_path=data_config['cb_data_path'],
+                index_data_path=data_config['index_data_path']
+            )
+    except Exception as e:
+        logger.warning(f"预加载数据集失败: {str(e)}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时预加载数据集"""
+    warm_dataset()
+    yield
+
 app = FastAPI(
     title="可转债回测服务",
     description="提供可转债回测相关的API服务",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 @app.post("/backtest", response_model=BacktestResponse)
@@ -74,28 +122,27 @@ async def run_backtest(request: BacktestRequest) -> BacktestResponse:
     try:
         logger.info(f"Received backtest request: {request}")
         
-        # 获取配置文件路径
-        config_path = Path(__file__).parent / "config.yaml"
-        if not config_path.exists():
+        # 数据集进程级缓存，仅在首次请求或数据文件变化时读取
+        data_config = config.get('data')
+        if not data_config:
             raise HTTPException(status_code=500, detail="Configuration file not found")
             
-        # 读取配置
-        with open(config_path) as f:
-            config = yaml.safe_load(f)
-            
-        logger.info(f"Loaded config: {config}")
-        
-        # 创建回测实例
-        runner = SingleRunner(
-            cb_data_path=config['data']['cb_data_path'],
-            index_data_path=config['data']['index_data_path']
-        )
+        # 创建回测实例；配置了 store_dir 时直接映射构建好的共享存储，存储尚未构建时退回进程级数据集缓存
+        if data_config.get('store_dir') and store_built(data_config['store_dir']):
+            runner = SingleRunner(store=get_store(data_config['store_dir']))
+        else:
+            dataset = get_registry().get(
+                cb_data_path=data_config['cb_data_path'],
+                index_data_path=data_config['index_data_path']
+            )
+            runner = SingleRunner(dataset=dataset)
         
         # 执行回测
         result = runner.run(
             start_date=request.data.start_date,
             end_date=request.data.end_date,
-            strategy=request.strategy.dict()
+            strategy=request.strategy.dict(),
+            trade_log=request.trade_log
         )
         
         # 构造回测结果
@@ -109,7 +156,8 @@ async def run_backtest(request: BacktestRequest) -> BacktestResponse:
             avg_hold_days=result['metrics']['avg_hold_days'],
             daily_returns=result['daily_returns'],
             positions=result['positions'],
-            trades=result['trades']
+            trades=result['trades'],
+            trade_log=result.get('trade_log')
         )
         
         # 构造响应
@@ -132,6 +180,12 @@ async def run_backtest(request: BacktestRequest) -> BacktestResponse:
         )
 
 @app.get("/health")
-async def health_check() -> Dict[str, str]:
-    """健康检查"""
-    return {"status": "healthy"} 
\ No newline at end of file
+async def health_check() -> Dict:
+    """健康检查，附带过滤掩码缓存、截面变换缓存和因子磁盘缓存的命中统计"""
+    factor_cache = get_factor_cache()
+    return {
+        "status": "healthy",
+        "mask_cache": get_mask_cache().stats(),
+        "transform_cache": get_transform_cache().stats(),
+        "factor_cache": factor_cache.stats() if factor_cache is not None else None
+    } 
\ No newline at end of file
@@ -3,9 +3,10 @@
 定义了API接口使用的请求和响应数据模型。
 """
 
-from typing import List, Dict, Optional
-from pydantic import BaseModel, Field
+from typing import Any, List, Dict, Optional
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
+from ..core.expr import compile_condition
 
 class BacktestData(BaseModel):
     start_date: str = Field(
@@ -53,6 +54,42 @@ class Strategy(BaseModel):
         ge=0,
         example=0.002
     )
+    hold_days: int = Field(
+        1,
+        description="最短持有天数，未满期的持仓在调仓日不卖出",
+        ge=1,
+        example=1
+    )
+    rebalance_every: int = Field(
+        1,
+        description="调仓间隔（交易日），非调仓日沿用前一日持仓",
+        ge=1,
+        example=5
+    )
+    normalize: str = Field(
+        "raw",
+        description="评分前对各评分因子按交易日在未过滤转债中做的截面变换：raw 不变换，"
+                    "rank、pct_rank、zscore、winsorized_zscore",
+        pattern="^(raw|rank|pct_rank|zscore|winsorized_zscore)$"
+    )
+    backend: Optional[str] = Field(
+        None,
+        description="模拟后端：numpy（默认）向量化数组计算，jit 使用编译内核",
+        pattern="^(numpy|jit)$"
+    )
+    engine: Optional[str] = Field(
+        None,
+        description="因子计算引擎：frame（默认）在长表上计算，panel 转换为 (交易日 x 转债) 面板计算",
+        pattern="^(frame|panel)$"
+    )
+
+    @field_validator('exclude_conditions')
+    @classmethod
+    def check_conditions(cls, conditions: List[str]) -> List[str]:
+        """校验排除条件语法，非法表达式直接返回 422"""
+        for condition in conditions:
+            compile_condition(condition)
+        return conditions
 
 class StrategyConfig(Strategy):
     """扩展的策略配置，包含更多可选参数"""
@@ -64,19 +101,25 @@ class StrategyConfig(Strategy):
 class BacktestRequest(BaseModel):
     data: BacktestData = Field(..., description="回测时间范围")
     strategy: Strategy = Field(..., description="策略参数")
+    trade_log: str = Field(
+        "none",
+        description="持仓和交易记录返回方式：none 不返回，records 返回 positions/trades，columnar 返回列式 trade_log",
+        pattern="^(none|records|columnar)$"
+    )
 
 class BacktestResult(BaseModel):
     """回测结果详情"""
     annual_return: float = Field(..., description="年化收益率")
     max_drawdown: float = Field(..., description="最大回撤")
-    sharpe: float = Field(..., description="夏普比率")
-    sortino_ratio: float = Field(..., description="索提诺比率")
+    sharpe: Optional[float] = Field(..., description="夏普比率，零波动或样本不足时为 null")
+    sortino_ratio: Optional[float] = Field(..., description="索提诺比率，没有下行收益时为 null")
     win_rate: float = Field(..., description="胜率")
     trade_count: int = Field(..., description="交易次数")
     avg_hold_days: float = Field(..., description="平均持仓天数")
-    daily_returns: Dict[str, float] = Field(..., description="每日收益率序列，格式：{日期: 收益率}")
+    daily_returns: Dict[str, Optional[float]] = Field(..., description="每日收益率序列，格式：{日期: 收益率}，缺失收益为 null")
     positions: Dict[str, List[str]] = Field(..., description="每日持仓")
     trades: List[Dict] = Field(..., description="交易记录")
+    trade_log: Optional[Dict[str, Any]] = Field(None, description="列式持仓和交易记录（trade_log=columnar 时返回）")
 
 class BacktestResponse(BaseModel):
     """回测响应"""
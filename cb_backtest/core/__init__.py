@@ -1,15 +1,27 @@
 from .backtester import CBBacktester
 from .engine import FactorEngine
+from .factors import FACTORS, FactorContext, register_factor
 from .eval import evaluate_performance
 from .single_runner import SingleRunner
 from .batch_runner import BatchRunner
 from .backtest_runner import BacktestRunner
+from .dataset import Dataset, DatasetRegistry, get_registry
+from .store import PanelStore
+from .panel import Panel
 
 __all__ = [
     'CBBacktester',
     'FactorEngine',
+    'FACTORS',
+    'FactorContext',
+    'register_factor',
     'evaluate_performance',
     'SingleRunner',
     'BatchRunner',
-    'BacktestRunner'
+    'BacktestRunner',
+    'Dataset',
+    'DatasetRegistry',
+    'get_registry',
+    'PanelStore',
+    'Panel'
 ] 
\ No newline at end of file
@@ -4,11 +4,19 @@ import pandas as pd
 import numpy as np
 import logging
 from .engine import FactorEngine
+from .expr import compile_condition, evaluate_conditions
+from .kernel import HAS_NUMBA, simulate_kernel
+from .panel import Panel
+from .selection import Selection, rebalance_mask, top_n_mask
+from .trade_log import TradeLog
+from .transforms import NORMALIZE_METHODS, Transform, cross_sectional, dense_transform
+from ..utils.date import int_dates_to_datetime
 
 logger = logging.getLogger(__name__)
 
 class CBBacktester:
-    def __init__(self, df, index_df, exclude_conditions=None, score_factors=None, weights=None, hold_num=5, stop_profit=0.03, fee_rate=0.002):
+    def __init__(self, df, index_df, exclude_conditions=None, score_factors=None, weights=None, hold_num=5, stop_profit=0.03, fee_rate=0.002, copy=True, engine='frame', filter_mask=None, full_rank=True, next_day=None,
+                 hold_days=1, rebalance_every=1, normalize='raw', normalized=None):
         """
         初始化回测器
         
@@ -19,8 +27,25 @@ class CBBacktester:
             score_factors (list): 评分因子列表
             weights (list): 因子权重列表
             hold_num (int): 持仓数量
-            stop_profit (float): 止盈比例
-            fee_rate (float): 交易费率
+            stop_profit (float): 止盈比例，次日最高价达到 close*(1+stop_profit) 时按该比例止盈，
+                开盘即达到时按开盘价止盈；为 0 时不止盈
+            fee_rate (float): 交易费率（买卖一次的双边费用），按每日换手比例收取
+            copy (bool): 是否复制 df；调用方已持有独占副本时可设为 False 避免重复复制
+            engine (str): 计算引擎，'frame' 直接在 MultiIndex 长表上计算；'panel' 转换为
+                (trade_date × code) 稠密面板后整块数组计算，结果列仍写回 df
+            filter_mask (np.ndarray): 预先计算好的排除掩码，与 df 的行一一对应；
+                提供时 apply_filters 直接使用，不再对 exclude_conditions 求值
+            full_rank (bool): compute_score 是否计算完整的 rank 列；模拟只需要每日前
+                hold_num 名（见 selection），关闭后跳过完整排名，需要时可调用 compute_ranks
+            next_day (dict): 预先计算好的次日行情 {'open','high','close','pct_chg': 数组}，
+                与 df 的行一一对应（如 Dataset.next_day 的切片）；None 时按需计算
+            hold_days (int): 最短持有天数，未满期的持仓在调仓日不卖出
+            rebalance_every (int): 调仓间隔（交易日），非调仓日沿用前一日持仓且不排名
+            normalize (str): 评分前对各评分因子按交易日在未过滤转债中做的截面变换，
+                'raw'（不变换）、'rank'、'pct_rank'、'zscore' 或 'winsorized_zscore'；
+                变换保持因子的大小顺序，权重的方向含义不变
+            normalized (dict): 预先计算好的变换结果 {因子: 数组}，与 df 的行一一对应
+                （如 TransformCache 中全量结果的切片）；None 时按需计算
         """
         if not isinstance(df.index, pd.MultiIndex):
             raise ValueError("df must have MultiIndex with levels ['code', 'trade_date']")
@@ -28,14 +53,45 @@ class CBBacktester:
         if not all(level in df.index.names for level in ['code', 'trade_date']):
             raise ValueError("df must have 'code' and 'trade_date' as index levels")
             
-        self.df = df.copy()
+        if engine not in ('frame', 'panel'):
+            raise ValueError(f"engine must be 'frame' or 'panel', got {engine}")
+            
+        if hold_days < 1 or rebalance_every < 1:
+            raise ValueError("hold_days and rebalance_every must be at least 1")
+            
+        if normalize not in NORMALIZE_METHODS:
+            raise ValueError(f"normalize must be one of {NORMALIZE_METHODS}, got {normalize}")
+            
+        if filter_mask is not None and len(filter_mask) != len(df):
+            raise ValueError(f"filter_mask length {len(filter_mask)} does not match df length {len(df)}")
+            
+        self.df = df.copy() if copy else df
         self.index_df = index_df
         self.exclude_conditions = exclude_conditions or []
         self.score_factors = score_factors or []
         self.weights = weights or []
         self.hold_num = hold_num
+        self.hold_days = hold_days
+        self.rebalance_every = rebalance_every
         self.SP = stop_profit
         self.c_rate = fee_rate
+        self.engine = engine
+        self.panel = None
+        self.filter_mask = filter_mask
+        self.full_rank = full_rank
+        self.selection = None
+        self.layout = None
+        self.next_day = dict(next_day) if next_day is not None else {}
+        self.normalize = normalize
+        self.normalized = normalized
+        
+        # 模拟结果：与 selection.rows 一一对应的每笔持仓收益和止盈标记
+        self.trade_returns = None
+        self.stop_hit = None
+        self.trade_log = None
+        
+        # 校验并编译过滤条件，非法表达式在此处直接报错
+        self.predicates = [compile_condition(condition) for condition in self.exclude_conditions]
         
         # 初始化过滤列
         self.df['filter'] = False
@@ -48,52 +104,62 @@ class CBBacktester:
         """应用过滤条件"""
         logger.info("Applying filters...")
         
-        # 重置过滤标记
-        self.df['filter'] = False
+        if self.engine == 'panel':
+            return self._panel_apply_filters()
         
-        for condition in self.exclude_conditions:
-            try:
-                mask = self.df.eval(condition)
-                self.df.loc[mask, 'filter'] = True
-                logger.debug(f"Applied filter: {condition}, excluded {mask.sum()} records")
-            except Exception as e:
-                logger.error(f"Error applying filter '{condition}': {str(e)}")
-                raise
+        if self.filter_mask is not None:
+            self.df['filter'] = np.asarray(self.filter_mask, dtype=bool)
+            logger.info(f"Total filtered records: {self.df['filter'].sum()}")
+            return
+            
+        try:
+            # 条件按表达式文本编译并缓存，所有条件在一次遍历中按位或
+            columns = {name: self.df[name].to_numpy() for name in self._condition_columns(self.df.columns)}
+            self.df['filter'] = evaluate_conditions(self.exclude_conditions, columns, shape=(len(self.df),))
+        except Exception as e:
+            logger.error(f"Error applying filters {self.exclude_conditions}: {str(e)}")
+            raise
                 
         total_filtered = self.df['filter'].sum()
         logger.info(f"Total filtered records: {total_filtered}")
         
-    def compute_score(self):
-        """计算评分并排名"""
+    def compute_score(self, select=True):
+        """计算评分并选出每日持仓
+        
+        Args:
+            select (bool): 是否生成 selection；编译内核自行完成选择时为 False
+        """
         logger.info("Computing scores...")
         
         if not self.score_factors or not self.weights:
             logger.warning("No score factors or weights provided")
             return
             
+        if self.engine == 'panel':
+            return self._panel_compute_score(select)
+            
         try:
+            for factor in self.score_factors:
+                if factor not in self.df.columns:
+                    raise ValueError(f"Factor {factor} not found in DataFrame")
+            normalized = self._normalized_factors()
+            
             # 初始化得分
             self.df['score'] = 0
             
             # 计算每个因子的得分
             for factor, weight in zip(self.score_factors, self.weights):
-                if factor not in self.df.columns:
-                    raise ValueError(f"Factor {factor} not found in DataFrame")
-                    
-                self.df['score'] += self.df[factor] * weight
+                values = self.df[factor] if normalized is None else normalized[factor]
+                self.df['score'] += values * weight
                 
-            # 对每个交易日分别排名
-            self.df['rank'] = np.nan
+            # 每日得分最小的前N名（部分排序，不计算完整排名）
+            if select:
+                layout = self._layout()
+                valid = (~self.df['filter'] & self.df['score'].notna()).to_numpy()
+                self._select(layout, layout.from_rows(self.df['score'].to_numpy(dtype=float)), layout.from_rows(valid))
             
-            for date in self.df.index.get_level_values('trade_date').unique():
-                # 获取当日未被过滤的数据
-                mask = (self.df.index.get_level_values('trade_date') == date) & (~self.df['filter'])
-                valid_data = self.df.loc[mask]
-                
-                if not valid_data.empty:
-                    # 计算排名（升序，1为最好）
-                    ranks = valid_data['score'].rank(method='min', ascending=True)
-                    self.df.loc[mask, 'rank'] = ranks
+            if self.full_rank:
+                self.compute_ranks()
                     
             logger.info("Score computation completed")
             
@@ -101,46 +167,88 @@ class CBBacktester:
             logger.error(f"Error in compute_score: {str(e)}")
             raise
             
+    def _normalized_factors(self):
+        """按 normalize 变换后的评分因子 {因子: 与 df 行对齐的数组}，'raw' 时为 None
+        
+        所有评分因子在一次批量截面变换中计算，被过滤的行不参与且结果为 NaN。
+        """
+        if self.normalize == 'raw':
+            return None
+        if self.normalized is None:
+            factors = list(dict.fromkeys(self.score_factors))
+            layout = self._layout()
+            values = cross_sectional(
+                np.stack([self.df[factor].to_numpy(dtype=float) for factor in factors]),
+                layout.date_idx, layout.code_idx,
+                Transform(self.normalize, filtered=True),
+                exclude=self.df['filter'].to_numpy(dtype=bool)
+            )
+            self.normalized = dict(zip(factors, values))
+        return self.normalized
+        
+    def _select(self, layout: Panel, score: np.ndarray, valid: np.ndarray):
+        """在 (T, N) 得分矩阵上选出每日持仓（默认每日调仓，持有前 hold_num 名）"""
+        if self.hold_days == 1 and self.rebalance_every == 1:
+            mask = top_n_mask(score, valid, self.hold_num)
+        else:
+            mask = rebalance_mask(score, valid, layout.valid, self.hold_num, self.rebalance_every, self.hold_days)
+        self.selection = Selection.from_mask(mask, layout.dates, layout.codes, layout.rows)
+        logger.info(f"Selected {len(self.selection.rows)} positions over {len(self.selection)} dates")
+        
+    def compute_ranks(self):
+        """计算每个交易日的完整排名（升序，1为最好，并列取最小名次），写入 rank 列
+        
+        模拟只依赖 selection，完整排名仅用于诊断和展示。
+        
+        Returns:
+            pd.Series: 与 df 行对齐的排名，被过滤的行为 NaN
+        """
+        if self.engine == 'panel':
+            panel = self._ensure_panel()
+            score = np.where(panel.fields['filter'], np.nan, panel.fields['score'])
+            panel.fields['rank'] = pd.DataFrame(score).rank(axis=1, method='min', ascending=True).to_numpy()
+            self.df['rank'] = panel.to_rows(panel.fields['rank'])
+        else:
+            # 被过滤的行不参与排名
+            valid_score = self.df['score'].where(~self.df['filter'])
+            self.df['rank'] = valid_score.groupby(level='trade_date', sort=False).rank(method='min', ascending=True)
+        return self.df['rank']
+        
     def simulate(self):
-        """模拟交易"""
+        """模拟交易
+        
+        每日持有 selection 中的转债，按等权计算持有到下一交易日的组合收益。
+        选中的转债在下一交易日没有记录时不计入当日组合。
+        
+        Returns:
+            pd.DataFrame: 以交易日为索引，包含 time_return（组合收益）、cost（费率）、
+                returns（扣除费用后的收益，供 evaluate_performance 使用）以及
+                positions、entries（持仓数量和调入数量，用于计算平均持有天数）
+        """
         logger.info("Starting trade simulation...")
         
         try:
-            # 获取所有交易日期
-            dates = sorted(self.df.index.get_level_values('trade_date').unique())
-            
-            # 初始化结果DataFrame
-            results = pd.DataFrame(index=pd.to_datetime(dates[:-1]))  # 最后一天没有next day return
-            results['time_return'] = 0.0
-            results['cost'] = 0.0
-            
-            # 对每个交易日进行模拟
-            for i in range(len(dates) - 1):
-                current_date = dates[i]
-                next_date = dates[i+1]
-                
-                # 获取当前日期的数据
-                current_data = self.df.xs(current_date, level='trade_date')
-                next_data = self.df.xs(next_date, level='trade_date')
-                
-                # 获取当日排名前N的转债
-                valid_data = current_data[~current_data['filter']]
-                selected = valid_data[valid_data['rank'] <= self.hold_num]
-                
-                if selected.empty:
-                    continue
-                    
-                # 计算收益率
-                selected_codes = selected.index.tolist()
-                next_day_returns = next_data.loc[selected_codes, 'pct_chg']
-                
-                # 计算等权重组合收益
-                portfolio_return = next_day_returns.mean()
-                
-                # 记录结果
-                results.loc[pd.to_datetime(current_date), 'time_return'] = portfolio_return
-                results.loc[pd.to_datetime(current_date), 'cost'] = self.c_rate
-                
+            layout = self._layout()
+            selection = self.selection if self.selection is not None else Selection.empty(layout.dates, layout.codes)
+            n_dates = len(selection) - 1  # 最后一天没有next day return
+            
+            # 选中记录的次日收益（含止盈），按交易日一次性分组求均值（忽略缺失）
+            date_pos = selection.date_pos
+            next_ret = self._trade_returns(selection.rows)
+            has_ret = ~np.isnan(next_ret) & (date_pos < n_dates)
+            total = np.bincount(date_pos[has_ret], weights=next_ret[has_ret], minlength=n_dates)[:n_dates]
+            count = np.bincount(date_pos[has_ret], minlength=n_dates)[:n_dates]
+            
+            portfolio_return = np.full(n_dates, np.nan)
+            np.divide(total, count, out=portfolio_return, where=count > 0)
+            
+            # 当日没有持仓时收益记为0
+            held = selection.counts[:n_dates] > 0
+            time_return = np.where(held, portfolio_return, 0.0)
+            entries, exits = selection.turnover()
+            cost = self._turnover_cost(selection, entries, exits)
+            results = self._results(selection, time_return, cost, entries)
+            
             logger.info("Trade simulation completed")
             return results
             
@@ -148,19 +256,239 @@ class CBBacktester:
             logger.error(f"Error in simulate: {str(e)}")
             raise
             
-    def run(self):
-        """运行回测"""
+    def _results(self, selection: Selection, time_return, cost, entries) -> pd.DataFrame:
+        """组装每日结果（最后一个交易日没有next day return，不计入），并生成交易记录"""
+        self.trade_log = TradeLog.from_selection(selection, self.df['close'].to_numpy(dtype=float), self.trade_returns,
+                                                 self.stop_hit)
+        n_dates = len(selection) - 1
+        time_return, cost = time_return[:n_dates], cost[:n_dates]
+        return pd.DataFrame({
+            'time_return': time_return,
+            'cost': cost,
+            'returns': (time_return + 1) * (1 - cost) - 1,  # 扣除手续费后的回报
+            'positions': selection.counts[:n_dates],  # 当日持仓数量
+            'entries': entries[:n_dates],  # 当日调入数量
+        }, index=self._result_index(selection.dates))
+        
+    def _simulate_kernel(self):
+        """编译内核路径：在一个循环内完成选择、止盈和成本计算
+        
+        结果与 compute_score + simulate 一致，同时写回 selection、trade_returns、stop_hit。
+        """
+        logger.info(f"Starting trade simulation with compiled kernel (numba={HAS_NUMBA})...")
+        layout = self._layout()
+        n_dates, n_codes = layout.shape
+        
+        # 行按 (交易日, 代码) 连续排列
+        order = np.lexsort((layout.code_idx, layout.date_idx))
+        offsets = np.zeros(n_dates + 1, dtype=np.int64)
+        np.cumsum(np.bincount(layout.date_idx, minlength=n_dates), out=offsets[1:])
+        
+        if 'score' in self.df.columns:
+            score = self.df['score'].to_numpy(dtype=float)[order]
+        else:
+            score = np.full(len(order), np.nan)
+        selected, trade_returns, stop_hit, time_return, cost, counts, entries = simulate_kernel(
+            offsets,
+            np.ascontiguousarray(layout.code_idx[order], dtype=np.int64),
+            score,
+            self.df['filter'].to_numpy(dtype=bool)[order],
+            self.df['close'].to_numpy(dtype=float)[order],
+            self._next_day('open')[order],
+            self._next_day('high')[order],
+            self._next_day('pct_chg')[order],
+            n_codes,
+            self.hold_num,
+            float(self.SP or 0),
+            float(self.c_rate)
+        )
+        
+        rows = order[selected]
+        offsets = np.zeros(n_dates + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        self.selection = Selection(layout.dates, layout.codes, offsets, layout.code_idx[rows], rows)
+        self.trade_returns = trade_returns[selected]
+        self.stop_hit = stop_hit[selected]
+        
+        logger.info("Trade simulation completed")
+        return self._results(self.selection, time_return, cost, entries)
+        
+    def _turnover_cost(self, selection: Selection, entries: np.ndarray, exits: np.ndarray) -> np.ndarray:
+        """按换手比例计算每日交易成本
+        
+        持仓等权，成本 = 0.5 * 费率 * (买入权重 + 卖出权重)：买入权重为调入数 /
+        当日持仓数，卖出权重为调出数 / 前一日持仓数。费率为双边费用，单边买入或
+        卖出按半个费率收取，因此首日建仓、空仓后重新建仓和清仓均为半个费率，
+        全部换仓为一个费率。
+        
+        Args:
+            selection: 每日持仓
+            entries: 每日调入数量（见 Selection.turnover）
+            exits: 每日调出数量
+            
+        Returns:
+            np.ndarray: 每个交易日的成本比例
+        """
+        counts = selection.counts
+        previous = np.concatenate([[0], counts[:-1]])
+        
+        bought = np.zeros(len(selection))
+        sold = np.zeros(len(selection))
+        np.divide(entries, counts, out=bought, where=counts > 0)
+        np.divide(exits, previous, out=sold, where=previous > 0)
+        return 0.5 * self.c_rate * (bought + sold)
+        
+    def _layout(self) -> Panel:
+        """(trade_date × code) 布局：面板引擎即为面板本身，长表引擎只展开行号"""
+        if self.engine == 'panel':
+            return self._ensure_panel()
+        if self.layout is None:
+            self.layout = Panel.from_frame(self.df, columns=[])
+        return self.layout
+        
+    def _next_day(self, name: str) -> np.ndarray:
+        """每行同一代码下一交易日的取值，下一交易日无该代码记录时为 NaN"""
+        if name not in self.next_day:
+            layout = self._layout()
+            values = layout.field(name) if name in layout else layout.from_rows(self.df[name].to_numpy(dtype=float))
+            self.next_day[name] = layout.to_rows(layout.next_day(values))
+        return self.next_day[name]
+        
+    def _trade_returns(self, rows: np.ndarray) -> np.ndarray:
+        """计算选中记录持有到次日的收益，并按止盈规则截断
+        
+        次日最高价达到 close*(1+SP) 时收益记为 SP；次日开盘即达到时按开盘价
+        计算收益。结果和止盈标记保存在 trade_returns、stop_hit 中。
+        
+        Args:
+            rows: 选中记录在 df 中的行号
+            
+        Returns:
+            np.ndarray: 每条记录的收益，次日无数据时为 NaN
+        """
+        returns = self._next_day('pct_chg')[rows]
+        stop_hit = np.zeros(len(rows), dtype=bool)
+        
+        if self.SP:
+            close = self.df['close'].to_numpy(dtype=float)[rows]
+            next_open = self._next_day('open')[rows]
+            target = close * (1 + self.SP)
+            with np.errstate(invalid='ignore'):
+                high_hit = self._next_day('high')[rows] >= target
+                open_hit = next_open >= target
+            returns = np.where(high_hit, self.SP, returns)
+            returns = np.where(open_hit, (next_open - close) / close, returns)
+            stop_hit = high_hit | open_hit
+            
+        self.trade_returns = returns
+        self.stop_hit = stop_hit
+        return returns
+        
+    def _condition_columns(self, available):
+        """过滤条件引用的列（按 available 中的顺序）"""
+        names = set().union(*(predicate.names for predicate in self.predicates))
+        return [col for col in available if col in names]
+        
+    def _panel_columns(self):
+        """面板引擎需要展开的列：收益率、评分因子和过滤条件引用的列"""
+        columns = {'pct_chg'} | set(self.score_factors)
+        return [col for col in self.df.columns if col in columns] + [
+            col for col in self._condition_columns(self.df.columns) if col not in columns
+        ]
+        
+    def _ensure_panel(self) -> Panel:
+        """懒加载稠密面板"""
+        if self.panel is None:
+            self.panel = Panel.from_frame(self.df, columns=self._panel_columns())
+            logger.info(f"Built panel with shape {self.panel.shape}")
+        return self.panel
+        
+    def _panel_apply_filters(self):
+        """在面板上应用过滤条件，所有条件的掩码整块按位或"""
+        panel = self._ensure_panel()
+        
+        # 面板中不存在的 (日期, 代码) 位置视为已过滤
+        try:
+            if self.filter_mask is not None:
+                excluded = ~panel.valid | panel.from_rows(np.asarray(self.filter_mask, dtype=bool))
+            else:
+                excluded = ~panel.valid | evaluate_conditions(
+                    self.exclude_conditions, panel.fields, shape=panel.shape
+                )
+        except Exception as e:
+            logger.error(f"Error applying filters {self.exclude_conditions}: {str(e)}")
+            raise
+        panel.fields['filter'] = excluded
+        
+        # 兼容长表接口：写回 filter 列
+        self.df['filter'] = panel.to_rows(excluded)
+        logger.info(f"Total filtered records: {self.df['filter'].sum()}")
+        
+    def _panel_compute_score(self, select=True):
+        """在面板上计算加权得分，并选出每个交易日的前N名"""
+        panel = self._ensure_panel()
+        excluded = panel.fields.get('filter', ~panel.valid)
+        
+        factors = list(dict.fromkeys(self.score_factors))
+        fields = {factor: panel.field(factor) for factor in factors}
+        if self.normalize != 'raw':
+            # 所有评分因子整块做截面变换；已有预先计算的结果时直接展开
+            if self.normalized is not None:
+                fields = {factor: panel.from_rows(np.asarray(self.normalized[factor], dtype=float)) for factor in factors}
+            else:
+                values = dense_transform(np.stack(list(fields.values())), Transform(self.normalize, filtered=True),
+                                         exclude=excluded)
+                fields = dict(zip(factors, values))
+        
+        score = np.zeros(panel.shape)
+        for factor, weight in zip(self.score_factors, self.weights):
+            score += fields[factor] * weight
+        
+        panel.fields['filter'] = excluded
+        panel.fields['score'] = score
+        if select:
+            self._select(panel, score, ~excluded & ~np.isnan(score))
+        
+        # 兼容长表接口：写回 score 列，需要时写回 rank 列
+        self.df['score'] = panel.to_rows(score)
+        if self.full_rank:
+            self.compute_ranks()
+        logger.info("Score computation completed")
+        
+    def _result_index(self, dates):
+        """结果索引：除最后一个交易日外的全部交易日（最后一天没有next day return）"""
+        # 交易日通常为 YYYYMMDD 整数，也兼容字符串或日期类型
+        dates = np.asarray(dates)
+        if dates.dtype.kind in 'iu':
+            return int_dates_to_datetime(dates[:-1])
+        return pd.to_datetime(dates[:-1])
+            
+    def run(self, backend='numpy'):
+        """运行回测
+        
+        Args:
+            backend (str): 模拟后端，'numpy' 为向量化数组计算；'jit' 使用编译内核
+                一次循环完成选择、止盈和成本计算，未安装 numba 或使用多日持有/
+                非每日调仓时回退到 'numpy'
+        """
         logger.info("Starting backtest...")
         
+        if backend not in ('numpy', 'jit'):
+            raise ValueError(f"backend must be 'numpy' or 'jit', got {backend}")
+            
         try:
             # 应用过滤条件
             self.apply_filters()
             
+            use_kernel = backend == 'jit' and HAS_NUMBA and self.hold_days == 1 and self.rebalance_every == 1
+            if backend == 'jit' and not use_kernel:
+                logger.info("Compiled kernel unavailable for this run, using numpy backend")
+            
             # 计算评分
-            self.compute_score()
+            self.compute_score(select=not use_kernel)
             
             # 模拟交易
-            results = self.simulate()
+            results = self._simulate_kernel() if use_kernel else self.simulate()
             
             logger.info("Backtest completed successfully")
             return results
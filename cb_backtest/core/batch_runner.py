@@ -3,23 +3,29 @@ import logging
 import pandas as pd
 from pathlib import Path
 from .single_runner import SingleRunner
+from .dataset import strategy_columns
 
 logger = logging.getLogger(__name__)
 
 class BatchRunner:
     """批量回测运行器"""
     
-    def __init__(self, cb_data_path: str, index_data_path: str):
+    def __init__(self,
+                 cb_data_path: str,
+                 index_data_path: str,
+                 strategies: Optional[List[Dict[str, Any]]] = None):
         """
         初始化批量回测运行器
         
         Args:
             cb_data_path: 可转债数据文件路径
             index_data_path: 指数数据文件路径
+            strategies: 预先知道的策略列表，提供时只读取这些策略引用到的列
         """
         self.single_runner = SingleRunner(
             cb_data_path=cb_data_path,
-            index_data_path=index_data_path
+            index_data_path=index_data_path,
+            columns=strategy_columns(strategies) if strategies else None
         )
     
     def run_batch(self, 
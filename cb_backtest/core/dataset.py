@@ -0,0 +1,345 @@
+# dataset.py - 数据集加载与进程级缓存
+
+import os
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pyarrow.types as pa_types
+from .expr import referenced_names
+from .factors import factor_inputs
+from .panel import next_day_values
+from .partition import INDEX_FILE, is_partitioned, partition_schema, read_partitioned
+from .transforms import transform_inputs
+from ..utils.date import to_int_date, to_int_dates
+
+logger = logging.getLogger(__name__)
+
+# 回测必需的行情列（trade_date和code在索引中）
+REQUIRED_COLUMNS = ['close', 'open', 'high', 'low', 'pct_chg']
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """已加载并完成格式规整的回测数据集
+
+    Attributes:
+        cb_data: 可转债数据，MultiIndex (code, trade_date)，trade_date 为 YYYYMMDD
+            整数，行按 (trade_date, code) 排序
+        index_data: 指数数据，MultiIndex (code, trade_date)
+        version: 数据版本标识，由源文件路径、修改时间和大小计算得到
+
+    数据集在多个请求之间共享，调用方只能读取，不得原地修改。构造时两个 DataFrame
+    的数值列换成只读数组视图（不复制数据，传入的 DataFrame 本身不受影响），
+    trade_dates、next_day 同样只读，原地写入会抛出 ValueError，需要修改时先 copy()。
+    """
+    cb_data: pd.DataFrame
+    index_data: pd.DataFrame
+    version: str
+
+    def __post_init__(self):
+        object.__setattr__(self, 'cb_data', _freeze(self.cb_data))
+        object.__setattr__(self, 'index_data', _freeze(self.index_data))
+
+    @cached_property
+    def trade_dates(self) -> np.ndarray:
+        """每行的交易日（已排序），用于 searchsorted 定位日期区间"""
+        return _read_only(self.cb_data.index.get_level_values('trade_date').to_numpy())
+
+    @cached_property
+    def next_day(self) -> Dict[str, np.ndarray]:
+        """每行同一代码下一交易日的开盘价、最高价、收盘价和涨跌幅，首次使用时计算"""
+        return {name: _read_only(values) for name, values in next_day_values(self.cb_data).items()}
+
+
+def _read_only(values: np.ndarray) -> np.ndarray:
+    """将数组设为只读后返回"""
+    values.flags.writeable = False
+    return values
+
+
+def _freeze(frame: pd.DataFrame) -> pd.DataFrame:
+    """返回数值列为只读数组视图的 DataFrame（不复制数据）
+
+    各数值列取 to_numpy() 视图设为只读后重新组装，通过返回的 DataFrame 原地
+    写入（loc/iloc 赋值、to_numpy() 后修改）会抛出 ValueError；其余类型的列
+    原样沿用。
+    """
+    data = {}
+    for name in frame.columns:
+        column = frame[name]
+        if isinstance(column.dtype, np.dtype) and column.dtype.kind in 'biuf':
+            data[name] = _read_only(column.to_numpy())
+        else:
+            data[name] = column.array
+    return pd.DataFrame(data, index=frame.index, columns=frame.columns, copy=False)
+
+
+def file_fingerprint(path: str) -> Tuple[str, int, int]:
+    """返回文件指纹 (绝对路径, mtime_ns, size)
+
+    分区数据目录以其 _index.json 为准，转换工具每次重写目录时都会更新该文件。
+    """
+    stat = os.stat(os.path.join(path, INDEX_FILE) if is_partitioned(path) else path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+def dataset_version(cb_data_path: str, index_data_path: str) -> str:
+    """根据两个数据文件的指纹计算数据版本号"""
+    fingerprint = (file_fingerprint(cb_data_path), file_fingerprint(index_data_path))
+    return hashlib.md5(repr(fingerprint).encode('utf-8')).hexdigest()
+
+
+def _prepare_cb_data(cb_data: pd.DataFrame) -> pd.DataFrame:
+    """校验可转债数据并规整日期索引"""
+    logger.info(f"CB Data columns: {cb_data.columns.tolist()}")
+    logger.info(f"CB Data shape: {cb_data.shape}")
+
+    # 确保可转债数据有正确的MultiIndex
+    if not isinstance(cb_data.index, pd.MultiIndex):
+        raise ValueError("CB data must have MultiIndex with (code, trade_date)")
+
+    # 确保必要的列存在
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in cb_data.columns]
+    if missing_columns:
+        raise ValueError(f"Missing required columns in cb_data: {missing_columns}")
+
+    # 将索引中的trade_date转换为YYYYMMDD整数，只需转换去重后的日期级别
+    cb_data.index = cb_data.index.set_levels(
+        to_int_dates(cb_data.index.levels[cb_data.index.names.index('trade_date')]), level='trade_date'
+    )
+    # 按 (trade_date, code) 排序，日期区间可用 searchsorted 二分定位
+    cb_data = cb_data.sort_index(level=['trade_date', 'code'])
+
+    dates = cb_data.index.get_level_values('trade_date')
+    logger.info(f"CB Data date range: {dates.min()} to {dates.max()}")
+    logger.info(f"CB Data unique dates count: {dates.nunique()}")
+    logger.info(f"CB Data unique codes count: {cb_data.index.get_level_values('code').nunique()}")
+    return cb_data
+
+
+def _prepare_index_data(index_data: pd.DataFrame) -> pd.DataFrame:
+    """将指数数据转换为 (code, trade_date) MultiIndex 并规整日期格式"""
+    logger.info(f"Index Data columns: {index_data.columns.tolist()}")
+
+    # 如果指数数据不是MultiIndex，将其转换为MultiIndex
+    if not isinstance(index_data.index, pd.MultiIndex):
+        logger.info("Converting index data to MultiIndex format")
+
+        # 检查是否已经有trade_date作为索引
+        if index_data.index.name == 'trade_date':
+            logger.info("Index data already has trade_date as index")
+            # 重置索引，将trade_date变成列
+            index_data = index_data.reset_index()
+        else:
+            # 检查日期列的名称
+            date_columns = [col for col in index_data.columns if 'date' in col.lower()]
+            if not date_columns:
+                raise ValueError("No date column found in index data")
+            date_column = date_columns[0]
+            logger.info(f"Using {date_column} as trade_date column")
+            # 重命名日期列
+            index_data = index_data.rename(columns={date_column: 'trade_date'})
+
+        # 添加code列并设置MultiIndex
+        index_data['code'] = '000001.SH'  # 使用上证指数作为默认指数
+        index_data = index_data.set_index(['code', 'trade_date'])
+
+    # 将指数数据的日期转换为YYYYMMDD整数
+    index_data.index = index_data.index.set_levels(
+        to_int_dates(index_data.index.levels[index_data.index.names.index('trade_date')]), level='trade_date'
+    )
+    index_data = index_data.sort_index(level=['trade_date', 'code'])
+
+    dates = index_data.index.get_level_values('trade_date')
+    logger.info(f"Index Data date range: {dates.min()} to {dates.max()}")
+    return index_data
+
+
+def strategy_columns(strategies: Iterable[Dict[str, Any]]) -> Optional[List[str]]:
+    """计算一组策略需要读取的数据列
+
+    合并必需行情列、评分因子以及排除条件中引用的列；引用注册因子时改为读取
+    计算该因子所需的原始列，引用截面变换列（如 bond_prem_score）时读取其原始列。任一排除条件无法解析时返回 None，表示需要读取全部列。
+
+    Args:
+        strategies: 策略配置列表
+
+    Returns:
+        Optional[List[str]]: 排序后的列名列表，None 表示全部列
+    """
+    names = set()
+    for strategy in strategies:
+        names.update(strategy.get('score_factors') or [])
+        for condition in strategy.get('exclude_conditions') or []:
+            try:
+                names.update(referenced_names(condition))
+            except ValueError:
+                logger.info(f"Cannot analyse condition '{condition}', loading all columns")
+                return None
+    # 数据文件中已有同名列时照常读取，读取时会忽略文件中不存在的列
+    names = transform_inputs(names)
+    return sorted(set(REQUIRED_COLUMNS) | names | factor_inputs(names))
+
+
+def _date_filters(schema, start_date: Optional[str], end_date: Optional[str]) -> Optional[List[Tuple]]:
+    """按 parquet 中 trade_date 的物理类型构造日期过滤条件，用于跳过行组"""
+    if (start_date is None and end_date is None) or 'trade_date' not in schema.names:
+        return None
+
+    field_type = schema.field('trade_date').type
+    if pa_types.is_timestamp(field_type) or pa_types.is_date(field_type):
+        convert = pd.Timestamp
+    elif pa_types.is_integer(field_type):
+        convert = lambda value: int(pd.Timestamp(value).strftime('%Y%m%d'))
+    else:
+        convert = lambda value: pd.Timestamp(value).strftime('%Y%m%d')
+
+    filters = []
+    if start_date is not None:
+        filters.append(('trade_date', '>=', convert(start_date)))
+    if end_date is not None:
+        filters.append(('trade_date', '<=', convert(end_date)))
+    return filters
+
+
+def _read_cb_data(path: str,
+                  columns: Optional[List[str]],
+                  start_date: Optional[str],
+                  end_date: Optional[str]) -> pd.DataFrame:
+    """读取可转债数据，只读取需要的列和日期区间覆盖的分区与行组"""
+    partitioned = is_partitioned(path)
+    schema = partition_schema(path) if partitioned else pq.read_schema(path)
+    if columns is not None:
+        available = set(schema.names)
+        # 数据文件中不存在的列（如派生因子）不读取；索引列由 pandas 元数据自动恢复
+        columns = [col for col in columns if col in available and col not in ('code', 'trade_date')]
+        logger.info(f"Reading {len(columns)} of {len(schema.names)} columns from {path}")
+
+    filters = _date_filters(schema, start_date, end_date)
+    if partitioned:
+        return read_partitioned(path, columns=columns, start_date=start_date, end_date=end_date, filters=filters)
+    return pd.read_parquet(path, columns=columns, filters=filters)
+
+
+def _read_index_data(path: str, start_date: Optional[str], end_date: Optional[str]) -> pd.DataFrame:
+    """读取指数数据，分区目录只读取与日期区间重叠的分区"""
+    if is_partitioned(path):
+        filters = _date_filters(partition_schema(path), start_date, end_date)
+        return read_partitioned(path, start_date=start_date, end_date=end_date, filters=filters)
+    return pd.read_parquet(path)
+
+
+def lookback_start(index_data_path: str, start_date: str, history: int) -> Optional[str]:
+    """按指数数据的交易日历，返回 start_date 之前第 history 个交易日
+
+    Args:
+        index_data_path: 指数数据文件路径或分区目录
+        start_date: 区间开始日期，格式：YYYYMMDD
+        history: 需要向前多读的交易日数
+
+    Returns:
+        Optional[str]: 读取起始日期（YYYYMMDD），之前的交易日不足 history 个时
+            返回 None，表示从头读取
+    """
+    start = to_int_date(start_date)
+    index_data = _prepare_index_data(_read_index_data(index_data_path, None, str(start)))
+    dates = np.unique(index_data.index.get_level_values('trade_date'))
+    dates = dates[dates < start]
+    if len(dates) < history:
+        return None
+    return str(dates[len(dates) - history]) if history > 0 else start_date
+
+
+def load_dataset(cb_data_path: str,
+                 index_data_path: str,
+                 columns: Optional[List[str]] = None,
+                 start_date: Optional[str] = None,
+                 end_date: Optional[str] = None) -> Dataset:
+    """读取并规整可转债与指数数据
+
+    Args:
+        cb_data_path: 可转债数据文件路径或分区目录（见 partition_dataset）
+        index_data_path: 指数数据文件路径或分区目录
+        columns: 需要读取的可转债数据列（见 strategy_columns），None 表示全部列
+        start_date: 只读取该日期及之后的数据，格式：YYYYMMDD，None 表示不限
+        end_date: 只读取该日期及之前的数据，格式：YYYYMMDD，None 表示不限
+
+    Returns:
+        Dataset: 规整后的数据集
+    """
+    # 统一日期格式，便于与分区索引中的 YYYYMMDD 比较
+    start_date = pd.to_datetime(start_date).strftime('%Y%m%d') if start_date is not None else None
+    end_date = pd.to_datetime(end_date).strftime('%Y%m%d') if end_date is not None else None
+
+    version = dataset_version(cb_data_path, index_data_path)
+    if columns is not None or start_date is not None or end_date is not None:
+        # 投影或截取后的数据集与全量数据集内容不同，版本号需区分
+        projection = (version, sorted(columns) if columns is not None else None, start_date, end_date)
+        version = hashlib.md5(repr(projection).encode('utf-8')).hexdigest()
+    logger.info(f"Loading dataset {version} from {cb_data_path} and {index_data_path}")
+
+    cb_data = _prepare_cb_data(_read_cb_data(cb_data_path, columns, start_date, end_date))
+    index_data = _prepare_index_data(_read_index_data(index_data_path, start_date, end_date))
+    return Dataset(cb_data=cb_data, index_data=index_data, version=version)
+
+
+class DatasetRegistry:
+    """进程级数据集注册表
+
+    按数据文件路径缓存 Dataset，每次获取时比对文件指纹 (mtime/size)，
+    文件变化后重新加载并整体替换缓存项。正在使用旧数据集的请求不受影响。
+    """
+
+    def __init__(self):
+        self._datasets: Dict[Tuple[str, str], Dataset] = {}
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _key_lock(self, key: Tuple[str, str]) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, cb_data_path: str, index_data_path: str) -> Dataset:
+        """获取数据集，未加载或文件已变化时（重新）加载
+
+        Args:
+            cb_data_path: 可转债数据文件路径
+            index_data_path: 指数数据文件路径
+
+        Returns:
+            Dataset: 当前版本的数据集
+        """
+        key = (os.path.abspath(cb_data_path), os.path.abspath(index_data_path))
+        dataset = self._datasets.get(key)
+        if dataset is not None and dataset.version == dataset_version(*key):
+            return dataset
+
+        # 同一份数据只允许一个线程加载，其余线程等待后直接复用结果
+        with self._key_lock(key):
+            dataset = self._datasets.get(key)
+            if dataset is not None and dataset.version == dataset_version(*key):
+                return dataset
+            if dataset is not None:
+                logger.info(f"Dataset files changed, reloading {key}")
+            dataset = load_dataset(*key)
+            self._datasets[key] = dataset
+            return dataset
+
+    def clear(self):
+        """清空全部缓存的数据集"""
+        with self._lock:
+            self._datasets.clear()
+
+
+_registry = DatasetRegistry()
+
+
+def get_registry() -> DatasetRegistry:
+    """返回进程级共享的数据集注册表"""
+    return _registry
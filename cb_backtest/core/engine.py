@@ -1,49 +1,47 @@
 # engine.py - 因子计算模块
 
+from typing import Iterable, Optional
 import pandas as pd
-import numpy as np
+from .factors import FACTORS, FactorContext
 
 class FactorEngine:
     def __init__(self, df: pd.DataFrame):
         self.df = df.copy()
-
-    def compute_all_factors(self) -> pd.DataFrame:
-        df = self.df
-
+        self.context = FactorContext.from_frame(self.df)
+
+    def compute(self, names: Iterable[str], workers: int = 1) -> pd.DataFrame:
+        """只计算指定的注册因子（及其依赖），结果写入 self.df
+
+        依赖的中间量（前收盘价、真实范围等）在本引擎内缓存，多次调用之间共享。
+
+        Args:
+            names: 因子名称列表
+            workers: 工作进程数，大于 1 时按代码分片并行计算
+
+        Returns:
+            pd.DataFrame: 增加了因子列的数据
+        """
+        names = list(names)
+        for name in names:
+            if name not in FACTORS:
+                raise ValueError(f"Unknown factor: {name}")
+        for name, values in self.context.compute(names, workers).items():
+            self.df[name] = values
+        return self.df
+
+    def compute_all_factors(self, names: Optional[Iterable[str]] = None, workers: int = 1) -> pd.DataFrame:
+        """计算全部注册因子
+
+        Args:
+            names: 只计算这些因子，None 表示原始输入在数据中都存在的全部非中间量因子
+            workers: 工作进程数，大于 1 时按代码分片并行计算，截面因子仍在主进程计算
+
+        Returns:
+            pd.DataFrame: 增加了因子列的数据
+        """
         # 创建过滤条件
-        df['filter'] = False  # 默认不过滤任何数据
-        
-        # 计算动量相关因子
-        df['max_value'] = df.groupby('code')['close'].cummax().shift(1)
-        df['max_value_position'] = df['close'] / df['max_value']
-        df['zhengfu'] = (df['high'] - df['low']) / df['close']
-
-        # NATR波动率因子
-        def natr(sub_df, n):
-            # 计算真实范围 (True Range)
-            tr = pd.DataFrame({
-                'hl': sub_df['high'] - sub_df['low'],
-                'hc': abs(sub_df['high'] - sub_df['close'].shift(1)),
-                'lc': abs(sub_df['low'] - sub_df['close'].shift(1))
-            }).max(axis=1)
-            
-            # 计算ATR (Average True Range)
-            atr = tr.rolling(window=n).mean()
-            
-            # 计算NATR (Normalized Average True Range)
-            natr = (atr / sub_df['close']) * 100
-            return natr
-
-        for n in [1, 3, 5, 10, 20]:
-            df[f'natr_{n}'] = df.groupby('code').apply(lambda x: pd.Series(natr(x, n), index=x.index)).reset_index(level=0, drop=True)
-
-        # 动量因子
-        df['momentum_20'] = df.groupby('code')['close'].pct_change(20)
-        df['momentum_60'] = df.groupby('code')['close'].pct_change(60)
-
-        # 相对强弱因子
-        df['rs_5'] = df.groupby('code')['close'].pct_change(5) - df.groupby('trade_date')['close'].transform('mean').pct_change(5)
-        df['rs_20'] = df.groupby('code')['close'].pct_change(20) - df.groupby('trade_date')['close'].transform('mean').pct_change(20)
-
-        self.df = df
-        return df
+        self.df['filter'] = False  # 默认不过滤任何数据
+
+        if names is None:
+            names = self.context.available_factors()
+        return self.compute(names, workers)
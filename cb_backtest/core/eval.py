@@ -2,7 +2,7 @@
 
 import pandas as pd
 import numpy as np
-import quantstats as qs
+from ..utils.metrics import performance_metrics
 
 def evaluate_performance(df: pd.DataFrame, benchmark_series: pd.Series = None, html_output_path: str = None) -> dict:
     """
@@ -81,34 +81,33 @@ def evaluate_performance(df: pd.DataFrame, benchmark_series: pd.Series = None, h
     days = (clean_returns.index[-1] - clean_returns.index[0]).days if len(clean_returns) > 1 else 0
     years = days / 365.0
 
-    # 基础指标
-    final_nav = (1 + clean_returns).cumprod().iloc[-1]
-    result['final_nav'] = final_nav
-    # 年化收益率 = (最终净值)^(1/年数) - 1
-    result['annual_return'] = np.power(final_nav, 1/years) - 1 if years > 0 else 0
-    result['max_drawdown'] = qs.stats.max_drawdown(clean_returns)
-    result['volatility'] = qs.stats.volatility(clean_returns)
-    result['sharpe'] = qs.stats.sharpe(clean_returns)
-    result['sortino_ratio'] = qs.stats.sortino(clean_returns)
-    result['win_rate'] = len(clean_returns[clean_returns > 0]) / len(clean_returns)
+    # 净值、年化收益率（(最终净值)^(1/年数) - 1）、回撤、波动率、夏普、索提诺和胜率
+    # 在收益率数组上一次计算，口径与 quantstats 一致
+    result.update(performance_metrics(clean_returns.to_numpy(dtype=np.float64), years=years))
     result['trade_count'] = len(clean_returns)
-    result['avg_hold_days'] = 1  # 默认为1天，因为是日频交易
+    # 平均持有天数 = 持仓总天数 / 调入次数；缺少持仓信息时按日频交易记为1天
+    if isinstance(df, pd.DataFrame) and {'positions', 'entries'} <= set(df.columns) and df['entries'].sum() > 0:
+        result['avg_hold_days'] = float(df['positions'].sum() / df['entries'].sum())
+    else:
+        result['avg_hold_days'] = 1
     
     # 添加回测区间信息
     result['start_date'] = clean_returns.index[0].strftime('%Y-%m-%d') if len(clean_returns) > 0 else None
     result['end_date'] = clean_returns.index[-1].strftime('%Y-%m-%d') if len(clean_returns) > 0 else None
     result['total_days'] = days
 
-    # 添加每日收益率序列（转换为日期和收益率的键值对）
-    result['daily_returns'] = {date.strftime('%Y-%m-%d'): float(ret) for date, ret in clean_returns.items()}
+    # 添加每日收益率序列（转换为日期和收益率的键值对），缺失收益记为 None 以便序列化为 JSON
+    result['daily_returns'] = {date.strftime('%Y-%m-%d'): None if np.isnan(ret) else float(ret)
+                               for date, ret in clean_returns.items()}
     
     # 添加空的持仓和交易记录（因为这些信息在回测过程中应该由回测器提供）
     result['positions'] = {}
     result['trades'] = []
 
-    # 生成 HTML 报告（如指定）
+    # 生成 HTML 报告（如指定）；quantstats 导入较慢，只在需要报告时导入
     if html_output_path:
         try:
+            import quantstats as qs
             if clean_benchmark is not None:
                 qs.reports.html(clean_returns, 
                               benchmark=clean_benchmark, 
@@ -0,0 +1,263 @@
+# expr.py - 过滤表达式解析与编译
+
+import ast
+import operator
+from functools import lru_cache
+from typing import Callable, FrozenSet, Iterable, Mapping, Optional, Set
+import numpy as np
+
+
+def referenced_names(expression: str) -> Set[str]:
+    """解析过滤表达式，返回其中引用的列名
+
+    表达式语法与 DataFrame.eval 一致，例如 "close < 102"、
+    "left_years < 0.7 and amount < 1000"。函数名不计入列名。
+
+    Args:
+        expression: 过滤表达式
+
+    Returns:
+        Set[str]: 表达式引用的列名集合
+
+    Raises:
+        ValueError: 表达式无法解析时抛出
+    """
+    try:
+        tree = ast.parse(expression.strip(), mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"Invalid expression '{expression}': {e.msg}") from e
+
+    functions = {
+        id(node.func) for node in ast.walk(tree)
+        if isinstance(node, ast.Call)
+    }
+    return {
+        node.id for node in ast.walk(tree)
+        if isinstance(node, ast.Name) and id(node) not in functions
+    }
+
+
+def normalize_condition(expression: str) -> str:
+    """规范化过滤表达式文本（统一空白、括号和引号），用作缓存键
+
+    Raises:
+        ValueError: 表达式无法解析时抛出
+    """
+    try:
+        return ast.unparse(ast.parse(expression.strip(), mode='eval'))
+    except SyntaxError as e:
+        raise ValueError(f"Invalid expression '{expression}': {e.msg}") from e
+
+
+# 过滤表达式允许的运算符和函数，其余语法一律拒绝
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Mod: operator.mod,
+    ast.Pow: np.power,
+    ast.BitAnd: np.logical_and,
+    ast.BitOr: np.logical_or,
+}
+_UNARY_OPS = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+    ast.Not: np.logical_not,
+    ast.Invert: np.logical_not,
+}
+_COMPARE_OPS = {
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+}
+_FUNCTIONS = {
+    'abs': np.abs,
+    'log': np.log,
+    'exp': np.exp,
+    'sqrt': np.sqrt,
+}
+
+Columns = Mapping[str, np.ndarray]
+_Node = Callable[[Columns], object]
+
+
+class Predicate:
+    """编译后的过滤条件
+
+    由 compile_condition 生成，调用时传入列名到一维或二维数组的映射，
+    返回同形状的布尔数组。
+
+    Attributes:
+        expression: 原始表达式
+        names: 表达式引用的列名
+    """
+
+    def __init__(self, expression: str, names: FrozenSet[str], func: _Node):
+        self.expression = expression
+        self.names = names
+        self._func = func
+
+    def __call__(self, columns: Columns) -> np.ndarray:
+        missing = [name for name in self.names if name not in columns]
+        if missing:
+            raise ValueError(f"Columns {sorted(missing)} referenced by '{self.expression}' not found")
+        with np.errstate(over='ignore'):
+            result = np.asarray(self._func(columns))
+        if result.dtype != bool:
+            raise ValueError(f"Condition '{self.expression}' does not evaluate to a boolean mask")
+        return result
+
+    def __repr__(self):
+        return f"Predicate({self.expression!r})"
+
+
+def _literal(node: ast.expr):
+    """取出 in/not in 右侧列表中的常量"""
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str, bool)):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub) and isinstance(node.operand, ast.Constant):
+        return -node.operand.value
+    raise ValueError("only constants are allowed in membership lists")
+
+
+def _compare(op: ast.cmpop, right: ast.expr) -> Callable[[object, Columns], object]:
+    """编译单个比较运算，右侧为常量列表时编译为 np.isin"""
+    if isinstance(op, (ast.In, ast.NotIn)):
+        if not isinstance(right, (ast.List, ast.Tuple, ast.Set)):
+            raise ValueError("'in' requires a list of constants")
+        values = [_literal(elt) for elt in right.elts]
+        invert = isinstance(op, ast.NotIn)
+        return lambda left, columns: np.isin(left, values, invert=invert)
+
+    compare = _COMPARE_OPS.get(type(op))
+    if compare is None:
+        raise ValueError(f"operator {type(op).__name__} is not allowed")
+    right = _compile(right)
+    return lambda left, columns: compare(left, right(columns))
+
+
+def _compile(node: ast.expr) -> _Node:
+    """将语法树节点编译为作用于列映射的闭包"""
+    if isinstance(node, ast.Constant):
+        if not isinstance(node.value, (int, float, str, bool)):
+            raise ValueError(f"constant {node.value!r} is not allowed")
+        value = node.value
+        # 数值常量按 np.float64 运算：溢出得到 inf，不会构造任意大的整数（如 9**9**9**9）
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            try:
+                value = np.float64(value)
+            except OverflowError:
+                raise ValueError(f"constant {node.value} is out of range") from None
+        return lambda columns: value
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        return lambda columns: columns[name]
+
+    if isinstance(node, ast.BoolOp):
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        operands = [_compile(value) for value in node.values]
+
+        def bool_op(columns):
+            result = operands[0](columns)
+            for operand in operands[1:]:
+                result = combine(result, operand(columns))
+            return result
+        return bool_op
+
+    if isinstance(node, ast.BinOp):
+        func = _BINARY_OPS.get(type(node.op))
+        if func is None:
+            raise ValueError(f"operator {type(node.op).__name__} is not allowed")
+        # 字符串不参与算术运算（'a' * 10**10 会耗尽内存，'%' 会变成字符串格式化）
+        if any(isinstance(operand, ast.Constant) and isinstance(operand.value, str)
+               for operand in (node.left, node.right)):
+            raise ValueError(f"string operands are not allowed in '{ast.unparse(node)}'")
+        left, right = _compile(node.left), _compile(node.right)
+        return lambda columns: func(left(columns), right(columns))
+
+    if isinstance(node, ast.UnaryOp):
+        func = _UNARY_OPS[type(node.op)]
+        operand = _compile(node.operand)
+        return lambda columns: func(operand(columns))
+
+    if isinstance(node, ast.Compare):
+        first = _compile(node.left)
+        steps = [_compare(op, right) for op, right in zip(node.ops, node.comparators)]
+        operands = [first] + [_compile(right) for right in node.comparators[:-1]]
+
+        # 链式比较 a < b < c 等价于 (a < b) & (b < c)
+        def compare(columns):
+            result = None
+            for operand, step in zip(operands, steps):
+                mask = step(operand(columns), columns)
+                result = mask if result is None else np.logical_and(result, mask)
+            return result
+        return compare
+
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCTIONS or node.keywords or len(node.args) != 1:
+            raise ValueError(f"function call '{ast.unparse(node)}' is not allowed")
+        func, arg = _FUNCTIONS[node.func.id], _compile(node.args[0])
+        return lambda columns: func(arg(columns))
+
+    raise ValueError(f"syntax {type(node).__name__} is not allowed")
+
+
+@lru_cache(maxsize=1024)
+def compile_condition(expression: str) -> Predicate:
+    """校验并编译过滤表达式，结果按表达式文本缓存
+
+    支持列名、数值/字符串常量、算术运算、比较（含链式比较）、and/or/not、
+    &/|/~、in/not in 常量列表以及 abs/log/exp/sqrt，不支持属性访问、
+    下标和其他函数调用，因此不会执行任意代码。数值常量按 np.float64 计算，
+    字符串常量不能参与算术运算，求值耗时只与数据行数成正比。
+
+    Args:
+        expression: 过滤表达式，例如 "close < 102"
+
+    Returns:
+        Predicate: 编译后的向量化谓词
+
+    Raises:
+        ValueError: 表达式无法解析或包含不允许的语法时抛出
+    """
+    try:
+        tree = ast.parse(expression.strip(), mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"Invalid expression '{expression}': {e.msg}") from e
+
+    try:
+        func = _compile(tree.body)
+    except ValueError as e:
+        raise ValueError(f"Invalid expression '{expression}': {e}") from e
+    return Predicate(expression, frozenset(referenced_names(expression)), func)
+
+
+def evaluate_conditions(conditions: Iterable[str],
+                        columns: Columns,
+                        shape: Optional[tuple] = None) -> np.ndarray:
+    """对一组过滤条件求值，返回任一条件成立的排除掩码
+
+    Args:
+        conditions: 过滤表达式列表
+        columns: 列名到数组的映射，数组形状一致
+        shape: 结果形状，条件为空或均为常量时使用
+
+    Returns:
+        np.ndarray: 布尔数组，True 表示被排除
+    """
+    excluded = None
+    for condition in conditions:
+        mask = compile_condition(condition)(columns)
+        if excluded is None:
+            excluded = np.array(np.broadcast_to(mask, shape) if shape is not None else mask, dtype=bool)
+        else:
+            excluded |= mask
+    if excluded is None:
+        excluded = np.zeros(shape if shape is not None else 0, dtype=bool)
+    return excluded
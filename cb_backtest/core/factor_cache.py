@@ -0,0 +1,307 @@
+# factor_cache.py - 派生因子的磁盘缓存
+
+import os
+import json
+import hashlib
+import inspect
+import logging
+import threading
+from functools import lru_cache
+from typing import BinaryIO, Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from .factors import FACTORS, FactorContext
+
+logger = logging.getLogger(__name__)
+
+# 默认磁盘上限 1GB
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+# 缓存文件格式版本，文件布局变化时递增使旧缓存失效
+CACHE_FORMAT = 1
+
+# 增量追加的分块合并阈值：末尾同一层级的分块达到该数量时合并为上一层级的一个分块，
+# 每行最多被重写 log_MERGE_CHUNKS(追加次数) 次（日频追加时 0 层约为一个月）
+MERGE_CHUNKS = 20
+
+# 整列文件作为分块时的层级，不参与合并
+BASE_LEVEL = -1
+
+
+@lru_cache(maxsize=None)
+def _source_hash(obj) -> str:
+    """函数或类源码的哈希，取不到源码时退化为限定名"""
+    try:
+        source = inspect.getsource(obj)
+    except (OSError, TypeError):
+        source = f"{obj.__module__}.{obj.__qualname__}"
+    return hashlib.md5(source.encode('utf-8')).hexdigest()
+
+
+def factor_fingerprint(name: str) -> str:
+    """因子定义的指纹
+
+    由因子名称、输入、窗口、计算函数源码、FactorContext 源码以及所依赖注册
+    因子的指纹计算得到，修改任一环节的定义或实现后缓存自动失效。
+    """
+    factor = FACTORS[name]
+    parts = [
+        CACHE_FORMAT,
+        factor.name,
+        factor.inputs,
+        factor.window,
+        _source_hash(factor.func),
+        _source_hash(FactorContext),
+        [factor_fingerprint(dependency) for dependency in factor.inputs if dependency in FACTORS],
+    ]
+    return hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+
+
+class FactorCache:
+    """派生因子列的磁盘缓存
+
+    每个因子列保存为一个 .npy 文件，文件名为 (数据版本, 因子指纹) 的哈希，
+    通过 np.load(mmap_mode='r') 读取，多个工作进程和后续运行共享同一份文件。
+    写入时先写临时文件再原子替换；总大小超过上限时按最近使用时间（文件
+    mtime，命中时更新）淘汰最久未使用的文件。
+
+    逐日追加（append）时不重写已有数据：新版本的因子列由分块清单（.chunks.json）
+    描述，沿用旧版本的整列文件和分块，只写入新交易日的分块，读取时拼接。
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _key(self, version: str, name: str) -> str:
+        return hashlib.md5(repr((version, factor_fingerprint(name))).encode('utf-8')).hexdigest()
+
+    def _path(self, version: str, name: str) -> str:
+        return os.path.join(self.directory, f"{name}-{self._key(version, name)}.npy")
+
+    def _manifest_path(self, version: str, name: str) -> str:
+        return os.path.join(self.directory, f"{name}-{self._key(version, name)}.chunks.json")
+
+    def _chunks(self, version: str, name: str) -> Optional[List[Dict]]:
+        """因子列的分块列表 [{'file', 'rows', 'level'}]，整列文件视为一个分块，未缓存时返回 None"""
+        path = self._path(version, name)
+        if os.path.exists(path):
+            try:
+                rows = len(np.load(path, mmap_mode='r'))
+            except (OSError, ValueError):
+                return None
+            return [{'file': os.path.basename(path), 'rows': rows, 'level': BASE_LEVEL}]
+        try:
+            with open(self._manifest_path(version, name), encoding='utf-8') as f:
+                return json.load(f)['chunks']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def rows(self, version: str, name: str) -> Optional[int]:
+        """缓存的因子列行数（不读取数据），未缓存时返回 None"""
+        chunks = self._chunks(version, name)
+        return None if chunks is None else sum(chunk['rows'] for chunk in chunks)
+
+    def load(self, version: str, name: str) -> Optional[np.ndarray]:
+        """读取缓存的因子列
+
+        Args:
+            version: 数据版本（Dataset.version 或 PanelStore.version）
+            name: 注册因子名称
+
+        Returns:
+            Optional[np.ndarray]: 只读数组（整列文件为内存映射，分块存储时为拼接结果），
+                未命中时返回 None
+        """
+        path = self._path(version, name)
+        if not os.path.exists(path) and os.path.exists(self._manifest_path(version, name)):
+            return self._load_chunks(version, name)
+        try:
+            values = np.load(path, mmap_mode='r')
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"因子缓存文件损坏，已删除: {path} ({str(e)})")
+            self._remove(path)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return values
+
+    def _load_chunks(self, version: str, name: str) -> Optional[np.ndarray]:
+        """读取分块存储的因子列并拼接为只读数组，分块缺失（已被淘汰）时删除清单"""
+        manifest = self._manifest_path(version, name)
+        chunks = self._chunks(version, name)
+        try:
+            parts = []
+            for chunk in chunks or []:
+                path = os.path.join(self.directory, chunk['file'])
+                parts.append(np.load(path, mmap_mode='r'))
+                os.utime(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"因子缓存分块缺失或损坏，已删除清单: {manifest} ({str(e)})")
+            self._remove(manifest)
+            self.misses += 1
+            return None
+        if chunks is None:
+            self.misses += 1
+            return None
+        values = np.concatenate(parts) if parts else np.zeros(0)
+        values.setflags(write=False)
+        self.hits += 1
+        return values
+
+    def _write(self, path: str, write: Callable[[BinaryIO], None]) -> bool:
+        """先写临时文件再原子替换，失败时返回 False"""
+        tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        try:
+            with open(tmp_path, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"写入因子缓存失败: {path} ({str(e)})")
+            self._remove(tmp_path)
+            return False
+        return True
+
+    def store(self, version: str, name: str, values: np.ndarray):
+        """写入因子列并按需淘汰旧文件"""
+        if self._write(self._path(version, name), lambda f: np.save(f, np.ascontiguousarray(values))):
+            self.evict()
+
+    def append(self, old_version: str, version: str, name: str, values: np.ndarray):
+        """在旧版本的因子列末尾追加新行，作为新版本缓存
+
+        已有的整列文件和分块保持不变，只写入新行的分块和新版本的分块清单；
+        末尾同一层级的分块达到 MERGE_CHUNKS 个时合并为上一层级的一个分块。
+
+        Args:
+            old_version: 已缓存的旧数据版本
+            version: 追加后的数据版本
+            name: 注册因子名称
+            values: 新增行的因子值
+
+        Raises:
+            ValueError: 旧版本的因子列未缓存时抛出
+        """
+        chunks = self._chunks(old_version, name)
+        if chunks is None:
+            raise ValueError(f"Factor {name} is not cached for version {old_version}")
+        key = self._key(version, name)
+        chunks = chunks + [{'file': f"{name}-{key}-0.npy", 'rows': len(values), 'level': 0}]
+        if not self._write(os.path.join(self.directory, chunks[-1]['file']),
+                           lambda f: np.save(f, np.ascontiguousarray(values))):
+            return
+
+        while len(chunks) >= MERGE_CHUNKS and chunks[-1]['level'] != BASE_LEVEL and \
+                all(chunk['level'] == chunks[-1]['level'] for chunk in chunks[-MERGE_CHUNKS:]):
+            merged = chunks[-MERGE_CHUNKS:]
+            level = merged[-1]['level'] + 1
+            parts = [np.load(os.path.join(self.directory, chunk['file']), mmap_mode='r') for chunk in merged]
+            chunk = {'file': f"{name}-{key}-{level}.npy", 'rows': sum(len(part) for part in parts), 'level': level}
+            if not self._write(os.path.join(self.directory, chunk['file']), lambda f: np.save(f, np.concatenate(parts))):
+                return
+            chunks = chunks[:-MERGE_CHUNKS] + [chunk]
+
+        manifest = json.dumps({'chunks': chunks}).encode('utf-8')
+        if self._write(self._manifest_path(version, name), lambda f: f.write(manifest)):
+            self.evict()
+
+    def _files(self) -> List[Tuple[int, int, str]]:
+        """缓存文件列表 [(mtime_ns, size, path)]，跳过被其他进程删除的文件"""
+        files = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.npy'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return files
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @property
+    def nbytes(self) -> int:
+        """缓存目录中因子文件的总字节数"""
+        return sum(size for _, size, _ in self._files())
+
+    def evict(self):
+        """总大小超过上限时删除最久未使用的文件
+
+        已被其他进程映射的文件删除后，映射在其关闭前仍然有效。
+        """
+        with self._lock:
+            files = sorted(self._files())
+            total = sum(size for _, size, _ in files)
+            for _, size, path in files:
+                if total <= self.max_bytes:
+                    break
+                total -= size
+                self._remove(path)
+                logger.info(f"Evicted factor cache file {os.path.basename(path)}")
+
+    def stats(self) -> Dict[str, int]:
+        """命中/未命中次数和磁盘占用"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'files': len(self._files()),
+            'nbytes': self.nbytes,
+            'max_bytes': self.max_bytes,
+        }
+
+    def clear(self):
+        """删除全部缓存文件并清零计数"""
+        with self._lock:
+            for _, _, path in self._files():
+                self._remove(path)
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.chunks.json'):
+                    self._remove(entry.path)
+            self.hits = 0
+            self.misses = 0
+
+
+def warm_factor_cache(context: FactorContext,
+                      names: Optional[Iterable[str]] = None,
+                      workers: int = 1) -> List[str]:
+    """计算因子并写入上下文绑定的磁盘缓存
+
+    Args:
+        context: 绑定了数据版本和 FactorCache 的因子上下文
+        names: 需要预热的因子，None 表示原始输入在数据中都存在的全部非中间量注册因子
+        workers: 工作进程数，大于 1 时按代码分片并行计算未命中的因子
+
+    Returns:
+        List[str]: 已预热的因子名称
+    """
+    names = context.available_factors() if names is None else list(names)
+    context.compute(names, workers)
+    return names
+
+
+_factor_cache: Optional[FactorCache] = None
+
+
+def configure_factor_cache(directory: Optional[str], max_bytes: int = DEFAULT_MAX_BYTES) -> Optional[FactorCache]:
+    """设置进程级的因子磁盘缓存，directory 为 None 时关闭缓存"""
+    global _factor_cache
+    _factor_cache = FactorCache(directory, max_bytes) if directory else None
+    return _factor_cache
+
+
+def get_factor_cache() -> Optional[FactorCache]:
+    """返回进程级的因子磁盘缓存，未配置时为 None"""
+    return _factor_cache
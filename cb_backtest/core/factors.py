@@ -0,0 +1,532 @@
+# factors.py - 因子注册表与按需计算
+
+import logging
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+import pandas as pd
+from .expr import referenced_names
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Factor:
+    """因子定义
+
+    Attributes:
+        name: 因子名称，即策略中引用的列名
+        inputs: 依赖的原始数据列或其他因子名称
+        func: 计算函数 func(ctx, *inputs, window=window)，输入与返回值均为与数据
+            行一一对应的一维数组
+        window: 窗口长度，None 表示不需要窗口
+        intermediate: 是否为中间量（如前收盘价、真实范围），中间量只在计算其他
+            因子时使用，不作为因子列输出
+        cross_sectional: 是否依赖同一交易日的全部转债（如市场平均涨幅），按代码
+            分片并行计算时这类因子在主进程整体计算一次
+    """
+    name: str
+    inputs: Tuple[str, ...]
+    func: Callable[..., np.ndarray]
+    window: Optional[int] = None
+    intermediate: bool = False
+    cross_sectional: bool = False
+
+
+# 全局因子注册表：因子名称 -> 定义
+FACTORS: Dict[str, Factor] = {}
+
+
+def register_factor(name: str,
+                    inputs: Iterable[str],
+                    window: Optional[int] = None,
+                    intermediate: bool = False,
+                    cross_sectional: bool = False):
+    """注册因子的装饰器
+
+    Args:
+        name: 因子名称
+        inputs: 依赖的原始数据列或其他因子名称
+        window: 窗口长度，计算时以关键字参数 window 传入
+        intermediate: 是否为中间量
+        cross_sectional: 是否为截面因子
+
+    Returns:
+        装饰器，原样返回被装饰的函数
+    """
+    def decorator(func):
+        FACTORS[name] = Factor(name, tuple(inputs), func, window, intermediate, cross_sectional)
+        return func
+    return decorator
+
+
+def resolve_factors(names: Iterable[str]) -> List[str]:
+    """按依赖关系解析需要计算的注册因子
+
+    Args:
+        names: 需要的因子或列名，未注册的名称视为原始数据列并忽略
+
+    Returns:
+        List[str]: 需要计算的注册因子（含中间量），依赖项在前
+    """
+    order: List[str] = []
+    done: Set[str] = set()
+    visiting: Set[str] = set()
+
+    def visit(name: str):
+        if name in done or name not in FACTORS:
+            return
+        if name in visiting:
+            raise ValueError(f"Circular factor dependency at {name}")
+        visiting.add(name)
+        for dependency in FACTORS[name].inputs:
+            visit(dependency)
+        visiting.discard(name)
+        done.add(name)
+        order.append(name)
+
+    for name in names:
+        visit(name)
+    return order
+
+
+def factor_inputs(names: Iterable[str]) -> Set[str]:
+    """返回计算这些因子需要读取的原始数据列"""
+    names = list(names)
+    factors = resolve_factors(names)
+    inputs = {dependency for name in factors for dependency in FACTORS[name].inputs}
+    return {name for name in names if name not in FACTORS} | (inputs - set(FACTORS))
+
+
+def strategy_factors(strategy: Dict[str, Any]) -> List[str]:
+    """返回策略评分因子和排除条件中引用到的注册因子"""
+    names = list(strategy.get('score_factors') or [])
+    for condition in strategy.get('exclude_conditions') or []:
+        try:
+            names.extend(sorted(referenced_names(condition)))
+        except ValueError:
+            continue
+    return [name for name in dict.fromkeys(names) if name in FACTORS and not FACTORS[name].intermediate]
+
+
+class FactorContext:
+    """一次因子计算的上下文
+
+    按需解析依赖并计算注册因子，计算结果（包括前收盘价、真实范围等中间量以及
+    滚动窗口用到的累加和）在上下文内缓存，多个因子共享同一个中间量时只计算
+    一次。同一代码的行须按交易日先后排列（如按 (trade_date, code) 排序）。
+
+    绑定磁盘缓存（见 FactorCache）和数据版本后，非中间量因子先从磁盘读取，
+    未命中时计算并写回；命中的因子不再计算其依赖。
+
+    Attributes:
+        code_idx: 每行的代码序号
+        date_idx: 每行的交易日序号（按日期升序编号）
+    """
+
+    def __init__(self,
+                 code_idx: np.ndarray,
+                 date_idx: np.ndarray,
+                 column: Callable[[str], np.ndarray],
+                 version: Optional[str] = None,
+                 cache=None):
+        """
+        Args:
+            code_idx: 每行的代码序号
+            date_idx: 每行的交易日序号
+            column: 按名称读取原始数据列，列不存在时抛出 KeyError
+            version: 数据版本，与 cache 一起提供时启用磁盘缓存
+            cache: FactorCache 实例，None 表示不使用磁盘缓存
+        """
+        self.code_idx = np.asarray(code_idx)
+        self.date_idx = np.asarray(date_idx)
+        self._column = column
+        self.version = version
+        self.cache = cache if version is not None else None
+        self._values: Dict[str, np.ndarray] = {}
+        self._cumsums: Dict[Any, Tuple[np.ndarray, np.ndarray]] = {}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, version: Optional[str] = None, cache=None) -> 'FactorContext':
+        """由 MultiIndex (code, trade_date) 长表构建上下文"""
+        code_idx, _ = pd.factorize(df.index.get_level_values('code'))
+        date_idx, _ = pd.factorize(df.index.get_level_values('trade_date'), sort=True)
+        return cls(code_idx, date_idx, lambda name: df[name].to_numpy(), version=version, cache=cache)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._values
+
+    def get(self, name: str) -> np.ndarray:
+        """返回因子或原始列的值，注册因子按依赖顺序计算并缓存"""
+        if name in self._values:
+            return self._values[name]
+
+        factor = FACTORS.get(name)
+        if factor is None:
+            try:
+                values = np.asarray(self._column(name), dtype=float)
+            except KeyError:
+                raise ValueError(f"Factor {name} not found in data") from None
+        else:
+            values = self._load(factor)
+            if values is None:
+                # 先解析完整依赖，循环依赖在计算前报错
+                resolve_factors([name])
+                inputs = [self.get(dependency) for dependency in factor.inputs]
+                kwargs = {} if factor.window is None else {'window': factor.window}
+                values = factor.func(self, *inputs, **kwargs)
+                if self.cache is not None and not factor.intermediate:
+                    self.cache.store(self.version, name, values)
+        self._values[name] = values
+        return values
+
+    def compute(self, names: Iterable[str], workers: int = 1) -> Dict[str, np.ndarray]:
+        """计算多个因子
+
+        workers 大于 1 时，上下文和磁盘缓存中都没有的因子按代码分片在进程池中
+        并行计算（见 parallel.compute_sharded），结果写入上下文和磁盘缓存。
+
+        Args:
+            names: 因子名称
+            workers: 工作进程数，1 表示在当前进程内计算
+
+        Returns:
+            Dict[str, np.ndarray]: 因子名称到取值的映射
+        """
+        names = list(names)
+        if workers > 1:
+            pending = []
+            for name in names:
+                if name in self._values or name not in FACTORS:
+                    continue
+                values = self._load(FACTORS[name])
+                if values is None:
+                    pending.append(name)
+                else:
+                    self._values[name] = values
+            if pending:
+                from .parallel import compute_sharded
+                for name, values in compute_sharded(self, pending, workers).items():
+                    self._values[name] = values
+                    if self.cache is not None and not FACTORS[name].intermediate:
+                        self.cache.store(self.version, name, values)
+        return {name: self.get(name) for name in names}
+
+    def available_factors(self, names: Optional[Iterable[str]] = None) -> List[str]:
+        """返回原始输入在数据中都存在的因子
+
+        Args:
+            names: 候选因子，None 表示全部非中间量注册因子
+
+        Returns:
+            List[str]: 可以计算的因子名称
+        """
+        if names is None:
+            names = [name for name, factor in FACTORS.items() if not factor.intermediate]
+        available = []
+        for name in names:
+            try:
+                for column in factor_inputs([name]):
+                    self.get(column)
+            except ValueError:
+                continue
+            available.append(name)
+        return available
+
+    def seed(self, name: str, values: np.ndarray):
+        """预先放入因子的取值（如增量更新时累计型因子的精确值），之后不再计算"""
+        self._values[name] = values
+
+    def _load(self, factor: Factor) -> Optional[np.ndarray]:
+        """从磁盘缓存读取非中间量因子"""
+        if self.cache is None or factor.intermediate:
+            return None
+        values = self.cache.load(self.version, factor.name)
+        if values is not None and len(values) != len(self.code_idx):
+            logger.warning(f"因子缓存 {factor.name} 行数与数据不一致，重新计算")
+            return None
+        return values
+
+    @cached_property
+    def layout(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """按代码分组的行布局
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: (按代码稳定排序的行顺序，
+                排序后每行是否为该代码首行，排序后每行在该代码内的位置)
+        """
+        order = np.argsort(self.code_idx, kind='stable')
+        codes = self.code_idx[order]
+        first = np.ones(len(codes), dtype=bool)
+        first[1:] = codes[1:] != codes[:-1]
+        start = np.maximum.accumulate(np.where(first, np.arange(len(codes)), 0))
+        return order, first, np.arange(len(codes)) - start
+
+    def _scatter(self, values: np.ndarray) -> np.ndarray:
+        """将按代码排序的数组还原为原始行顺序"""
+        result = np.empty_like(values)
+        result[self.layout[0]] = values
+        return result
+
+    def shift(self, values: np.ndarray, periods: int = 1) -> np.ndarray:
+        """同一代码内向后平移 periods 行（即 groupby('code').shift），不足处为 NaN"""
+        order, _, position = self.layout
+        ordered = values[order]
+        shifted = np.full(len(ordered), np.nan)
+        if periods < len(ordered):
+            shifted[periods:] = ordered[:-periods]
+        shifted[position < periods] = np.nan
+        return self._scatter(shifted)
+
+    def cummax(self, values: np.ndarray) -> np.ndarray:
+        """同一代码内的累计最大值（即 groupby('code').cummax()，缺失值保持 NaN）"""
+        return pd.Series(values).groupby(self.code_idx).cummax().to_numpy()
+
+    def _cumsum(self, key, values: Callable[[], np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """按代码排序后的累加和（缺失值记 0）及缺失值个数的累加，前面补 0，按 key 缓存"""
+        if key not in self._cumsums:
+            ordered = np.asarray(values(), dtype=float)[self.layout[0]]
+            missing = np.isnan(ordered)
+            self._cumsums[key] = (
+                np.concatenate([[0.0], np.cumsum(np.where(missing, 0.0, ordered))]),
+                np.concatenate([[0], np.cumsum(missing)]),
+            )
+        return self._cumsums[key]
+
+    def _window(self, window: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """每行滚动窗口在按代码排序的累加和中的 [begin, end)，以及窗口内的行数
+
+        窗口不会跨越代码边界：每只转债的前 window - 1 行窗口不满。
+        """
+        order, _, position = self.layout
+        end = np.arange(1, len(order) + 1)
+        rows = np.minimum(position + 1, window)
+        return end - rows, end, rows
+
+    def rolling_mean(self, name: str, window: int) -> np.ndarray:
+        """同一代码内的滚动均值（即 groupby('code').rolling(window).mean()）
+
+        窗口未满或窗口内有缺失值时为 NaN。同一列的累加和在上下文内只计算一次，
+        多个窗口共享。
+        """
+        total, missing = self._cumsum(name, lambda: self.get(name))
+        begin, end, rows = self._window(window)
+        complete = (rows == window) & (missing[end] - missing[begin] == 0)
+        return self._scatter(np.where(complete, (total[end] - total[begin]) / window, np.nan))
+
+    def rolling_sum(self, name: str, window: int, min_periods: Optional[int] = None) -> np.ndarray:
+        """同一代码内的滚动求和，忽略缺失值（即 rolling(window, min_periods).sum()）
+
+        窗口内非缺失值少于 min_periods（默认 window）时为 NaN。
+        """
+        total, missing = self._cumsum(name, lambda: self.get(name))
+        begin, end, rows = self._window(window)
+        count = rows - (missing[end] - missing[begin])
+        return self._scatter(np.where(count >= (window if min_periods is None else min_periods),
+                                      total[end] - total[begin], np.nan))
+
+    def rolling_prod(self, name: str, window: int, min_periods: Optional[int] = None) -> np.ndarray:
+        """同一代码内的滚动连乘（即 rolling(window, min_periods).apply(np.prod)）
+
+        由 log|x| 累加和之差取指数得到，零值和负值个数另行累加以确定结果为 0 和
+        符号。窗口内有缺失值或行数少于 min_periods（默认 window）时为 NaN。
+        """
+        values = lambda: self.get(name)
+        log_total, missing = self._cumsum(('log', name), lambda: np.log(np.abs(np.where(values() == 0, 1.0, values()))))
+        zeros, _ = self._cumsum(('zero', name), lambda: values() == 0)
+        negatives, _ = self._cumsum(('negative', name), lambda: values() < 0)
+        begin, end, rows = self._window(window)
+
+        sign = np.where((negatives[end] - negatives[begin]) % 2 == 1, -1.0, 1.0)
+        product = np.where(zeros[end] - zeros[begin] > 0, 0.0, sign * np.exp(log_total[end] - log_total[begin]))
+        complete = (rows >= (window if min_periods is None else min_periods)) & (missing[end] - missing[begin] == 0)
+        return self._scatter(np.where(complete, product, np.nan))
+
+    def rolling_std(self, name: str, window: int, ddof: int = 1) -> np.ndarray:
+        """同一代码内的滚动标准差（即 rolling(window).std()）
+
+        由累加和与平方和之差计算。先减去各代码的均值再累加，避免长历史累加和
+        过大带来的相消误差。窗口未满或窗口内有缺失值时为 NaN。
+        """
+        if ('centered', name) not in self._cumsums:
+            values = np.asarray(self.get(name), dtype=float)
+            valid = ~np.isnan(values)
+            n_codes = int(self.code_idx.max()) + 1 if len(self.code_idx) else 0
+            total = np.bincount(self.code_idx[valid], weights=values[valid], minlength=n_codes)
+            count = np.bincount(self.code_idx[valid], minlength=n_codes)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                centered = values - (total / count)[self.code_idx]
+            self._cumsum(('centered', name), lambda: centered)
+            self._cumsum(('centered_square', name), lambda: centered ** 2)
+        total, missing = self._cumsums[('centered', name)]
+        squares, _ = self._cumsums[('centered_square', name)]
+        begin, end, rows = self._window(window)
+
+        if window - ddof <= 0:
+            return np.full(len(self.code_idx), np.nan)
+        window_sum = total[end] - total[begin]
+        variance = (squares[end] - squares[begin] - window_sum * window_sum / window) / (window - ddof)
+        complete = (rows == window) & (missing[end] - missing[begin] == 0)
+        return self._scatter(np.where(complete, np.sqrt(np.maximum(variance, 0.0)), np.nan))
+
+    def date_mean(self, values: np.ndarray) -> np.ndarray:
+        """每个交易日的截面均值（忽略 NaN），按日期序号排列"""
+        valid = ~np.isnan(values)
+        n_dates = int(self.date_idx.max()) + 1 if len(self.date_idx) else 0
+        total = np.bincount(self.date_idx[valid], weights=values[valid], minlength=n_dates)
+        count = np.bincount(self.date_idx[valid], minlength=n_dates)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return total / count
+
+
+@register_factor('prev_close', ['close'], intermediate=True)
+def _prev_close(ctx: FactorContext, close: np.ndarray) -> np.ndarray:
+    """同一代码的前一交易日收盘价"""
+    return ctx.shift(close)
+
+
+@register_factor('true_range', ['high', 'low', 'prev_close'], intermediate=True)
+def _true_range(ctx: FactorContext, high: np.ndarray, low: np.ndarray, prev_close: np.ndarray) -> np.ndarray:
+    """真实范围 (True Range)，忽略缺失的前收盘价"""
+    return np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+
+
+@register_factor('close_cummax', ['close'], intermediate=True)
+def _close_cummax(ctx: FactorContext, close: np.ndarray) -> np.ndarray:
+    """同一代码上市以来的最高收盘价"""
+    return ctx.cummax(close)
+
+
+@register_factor('max_value', ['close_cummax'])
+def _max_value(ctx: FactorContext, close_cummax: np.ndarray) -> np.ndarray:
+    """截至前一交易日的最高收盘价"""
+    return ctx.shift(close_cummax)
+
+
+@register_factor('max_value_position', ['close', 'max_value'])
+def _max_value_position(ctx: FactorContext, close: np.ndarray, max_value: np.ndarray) -> np.ndarray:
+    """收盘价相对历史最高收盘价的位置"""
+    return close / max_value
+
+
+@register_factor('zhengfu', ['high', 'low', 'close'])
+def _zhengfu(ctx: FactorContext, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """当日振幅"""
+    return (high - low) / close
+
+
+def _natr(ctx: FactorContext, true_range: np.ndarray, close: np.ndarray, window: int) -> np.ndarray:
+    """NATR 波动率：真实范围的滚动均值占收盘价的百分比"""
+    return ctx.rolling_mean('true_range', window) / close * 100
+
+
+def _momentum(ctx: FactorContext, close: np.ndarray, window: int) -> np.ndarray:
+    """同一代码 window 个交易日的涨跌幅"""
+    return close / ctx.shift(close, window) - 1
+
+
+def _market_momentum(ctx: FactorContext, close: np.ndarray, window: int) -> np.ndarray:
+    """全市场平均收盘价 window 个交易日的涨跌幅"""
+    market = ctx.date_mean(close)
+    momentum = np.full(len(market), np.nan)
+    momentum[window:] = market[window:] / market[:-window] - 1
+    return momentum[ctx.date_idx]
+
+
+def _relative_strength(ctx: FactorContext, momentum: np.ndarray, market_momentum: np.ndarray, window: int) -> np.ndarray:
+    """相对强弱：个券动量减去市场动量"""
+    return momentum - market_momentum
+
+
+for _n in [1, 3, 5, 10, 20]:
+    register_factor(f'natr_{_n}', ['true_range', 'close'], window=_n)(_natr)
+
+for _n in [5, 20, 60]:
+    register_factor(f'momentum_{_n}', ['close'], window=_n)(_momentum)
+
+for _n in [5, 20]:
+    register_factor(f'market_momentum_{_n}', ['close'], window=_n, intermediate=True,
+                    cross_sectional=True)(_market_momentum)
+    register_factor(f'rs_{_n}', [f'momentum_{_n}', f'market_momentum_{_n}'], window=_n)(_relative_strength)
+
+
+# 以下因子移植自 backtest/search_strategy.py，窗口计算均为按代码分段的一次累加
+
+@register_factor('pct_chg_growth', ['pct_chg'], intermediate=True)
+def _pct_chg_growth(ctx: FactorContext, pct_chg: np.ndarray) -> np.ndarray:
+    """转债当日净值增长倍数 1 + pct_chg"""
+    return 1 + pct_chg
+
+
+@register_factor('pct_chg_stk_growth', ['pct_chg_stk'], intermediate=True)
+def _pct_chg_stk_growth(ctx: FactorContext, pct_chg_stk: np.ndarray) -> np.ndarray:
+    """正股当日净值增长倍数 1 + pct_chg_stk"""
+    return 1 + pct_chg_stk
+
+
+def _compound_return(name: str):
+    """window 个交易日的累计涨跌幅，上市不足 window 日时按已有交易日计算"""
+    def compound_return(ctx: FactorContext, growth: np.ndarray, window: int) -> np.ndarray:
+        return ctx.rolling_prod(name, window, min_periods=1) - 1
+    return compound_return
+
+
+def _rolling_average(name: str):
+    """window 个交易日的滚动均值"""
+    def rolling_average(ctx: FactorContext, values: np.ndarray, window: int) -> np.ndarray:
+        return ctx.rolling_mean(name, window)
+    return rolling_average
+
+
+def _volatility(name: str):
+    """window 个交易日的波动率：滚动标准差乘以 sqrt(window)"""
+    def volatility(ctx: FactorContext, values: np.ndarray, window: int) -> np.ndarray:
+        return ctx.rolling_std(name, window) * np.sqrt(window)
+    return volatility
+
+
+def _event_count(name: str):
+    """最近 window 个交易日内事件发生的次数，上市不足 window 日时按已有交易日计算"""
+    def event_count(ctx: FactorContext, events: np.ndarray, window: int) -> np.ndarray:
+        return ctx.rolling_sum(name, window, min_periods=1)
+    return event_count
+
+
+@register_factor('bodong_20_to_bodong_60', ['bodong_20', 'bodong_60'])
+def _bodong_ratio(ctx: FactorContext, bodong_20: np.ndarray, bodong_60: np.ndarray) -> np.ndarray:
+    """正股 20 日波动率与 60 日波动率之比"""
+    return bodong_20 / bodong_60
+
+
+@register_factor('high_jump', ['high', 'pre_close'], intermediate=True)
+def _high_jump(ctx: FactorContext, high: np.ndarray, pre_close: np.ndarray) -> np.ndarray:
+    """盘中最高价相对昨收涨幅超过 2.5%"""
+    with np.errstate(invalid='ignore'):
+        return (high / pre_close - 1 > 0.025).astype(float)
+
+
+@register_factor('close_drop', ['close', 'pre_close'], intermediate=True)
+def _close_drop(ctx: FactorContext, close: np.ndarray, pre_close: np.ndarray) -> np.ndarray:
+    """收盘价相对昨收跌幅超过 2%"""
+    with np.errstate(invalid='ignore'):
+        return (close / pre_close - 1 < -0.02).astype(float)
+
+
+for _n in [5, 20]:
+    register_factor(f'pct_chg_{_n}', ['pct_chg_growth'], window=_n)(_compound_return('pct_chg_growth'))
+    register_factor(f'pct_chg_stk_{_n}', ['pct_chg_stk_growth'], window=_n)(_compound_return('pct_chg_stk_growth'))
+
+for _n in [5, 10, 20, 60]:
+    register_factor(f'turnover_{_n}_avg', ['turnover'], window=_n)(_rolling_average('turnover'))
+    register_factor(f'zhengfu_{_n}_bodong', ['zhengfu'], window=_n)(_volatility('zhengfu'))
+
+for _n in [10, 20, 60]:
+    register_factor(f'bodong_{_n}', ['pct_chg_stk'], window=_n)(_volatility('pct_chg_stk'))
+
+for _n in [5, 10, 20]:
+    register_factor(f'bodong_{_n}_bd', ['pct_chg'], window=_n)(_volatility('pct_chg'))
+
+for _n in [100, 250]:
+    register_factor(f'high_jump_count_{_n}', ['high_jump'], window=_n)(_event_count('high_jump'))
+    register_factor(f'close_drop_count_{_n}', ['close_drop'], window=_n)(_event_count('close_drop'))
@@ -0,0 +1,221 @@
+# incremental.py - 追加交易日时的因子增量更新
+
+import os
+import json
+import shutil
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from .factors import FACTORS, FactorContext, factor_inputs, resolve_factors
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = 'state.json'
+TAIL_FILE = 'tail.pq'
+RUNNING_FILE = 'running.pq'
+
+# 累计型因子：取值依赖全部历史，增量更新时按代码保存累计状态
+# 因子名称 -> (输入列, 累计函数)；输入缺失的行因子为 NaN，累计状态不变
+RUNNING_FACTORS = {
+    'close_cummax': ('close', np.fmax),
+}
+
+
+def factor_history(names: Iterable[str]) -> Optional[int]:
+    """计算因子在某一行的取值所需的历史长度
+
+    Args:
+        names: 因子名称（可含原始列名，原始列不需要历史）
+
+    Returns:
+        Optional[int]: 需要的交易日数（最大窗口 + 1，另含前收盘价一行），不引用
+            注册因子时为 0；依赖累计型因子（见 RUNNING_FACTORS）时为 None，表示
+            需要全部历史
+    """
+    resolved = resolve_factors(names)
+    if any(name in RUNNING_FACTORS for name in resolved):
+        return None
+    if not resolved:
+        return 0
+    return max((FACTORS[name].window or 0 for name in resolved), default=0) + 1
+
+
+def _tail_mask(df: pd.DataFrame, history: int) -> np.ndarray:
+    """每只转债最近 history 行以及最近 history 个交易日的全部行"""
+    codes = df.index.get_level_values('code')
+    dates = df.index.get_level_values('trade_date')
+    recent_rows = pd.Series(np.arange(len(df))).groupby(np.asarray(codes)).cumcount(ascending=False).to_numpy() < history
+    unique_dates = np.unique(dates)
+    recent_dates = np.asarray(dates) >= unique_dates[max(len(unique_dates) - history, 0)] if len(unique_dates) else False
+    return recent_rows | recent_dates
+
+
+class FactorState:
+    """因子增量更新状态
+
+    窗口因子在某一行的取值只依赖同一代码最近 window 行（另加前收盘价一行）以及
+    最近 window 个交易日的截面，因此只需保留这些行的原始输入列（tail）；累计型
+    因子（见 RUNNING_FACTORS）另按代码保存累计值，并在 tail 中保存其精确取值。
+    追加一个交易日时，只在 tail 和新交易日的行上运行注册因子。
+
+    数据须按 (trade_date, code) 排序，新交易日的行追加在末尾。
+
+    Attributes:
+        version: 状态对应的数据版本
+        rows: 状态对应的数据总行数
+        names: 维护的因子名称
+        history: tail 保留的行数/交易日数（最大窗口 + 1）
+        tail: MultiIndex (code, trade_date) 的尾部数据
+        running: 累计型因子在每只转债上的累计值，索引为代码
+    """
+
+    def __init__(self,
+                 version: str,
+                 rows: int,
+                 names: List[str],
+                 history: int,
+                 tail: pd.DataFrame,
+                 running: pd.DataFrame):
+        self.version = version
+        self.rows = rows
+        self.names = names
+        self.history = history
+        self.tail = tail
+        self.running = running
+
+    @property
+    def last_date(self) -> int:
+        """状态覆盖的最后一个交易日"""
+        return int(self.tail.index.get_level_values('trade_date').max())
+
+    @classmethod
+    def from_frame(cls,
+                   df: pd.DataFrame,
+                   version: str,
+                   names: Optional[Iterable[str]] = None,
+                   context: Optional[FactorContext] = None) -> 'FactorState':
+        """由全量数据构建状态
+
+        Args:
+            df: 全量数据，MultiIndex (code, trade_date)，按 (trade_date, code) 排序
+            version: 数据版本
+            names: 需要维护的因子，None 表示原始输入在数据中都存在的全部非中间量注册因子
+            context: 已在 df 上计算过的因子上下文，可复用其中的累计型因子
+
+        Returns:
+            FactorState: 增量更新状态
+        """
+        context = context or FactorContext.from_frame(df)
+        names = context.available_factors() if names is None else list(names)
+        resolved = resolve_factors(names)
+        windows = [FACTORS[name].window for name in resolved if FACTORS[name].window is not None]
+        history = max(windows, default=0) + 1
+
+        mask = _tail_mask(df, history)
+        columns = sorted(factor_inputs(names))
+        tail = df.loc[mask, columns].copy()
+        running = pd.DataFrame(index=pd.Index(np.unique(df.index.get_level_values('code')), name='code'))
+        codes = np.asarray(df.index.get_level_values('code'))
+        for name in resolved:
+            if name in RUNNING_FACTORS:
+                source, _ = RUNNING_FACTORS[name]
+                tail[name] = np.asarray(context.get(name))[mask]
+                running[name] = pd.Series(df[source].to_numpy(dtype=float)).groupby(codes).max()
+        return cls(version, len(df), names, history, tail, running)
+
+    def update(self, new_rows: pd.DataFrame, version: str) -> Tuple[Dict[str, np.ndarray], 'FactorState']:
+        """计算新交易日各行的因子值
+
+        Args:
+            new_rows: 新交易日的数据，MultiIndex (code, trade_date)，只能包含一个
+                晚于状态最后交易日的日期
+            version: 追加后的数据版本
+
+        Returns:
+            Tuple[Dict[str, np.ndarray], FactorState]: 因子名称到新行取值的映射
+                （按代码排序，与追加后数据的末尾各行一一对应）以及更新后的状态
+        """
+        new_dates = np.unique(new_rows.index.get_level_values('trade_date'))
+        if len(new_dates) != 1 or new_dates[0] <= self.last_date:
+            raise ValueError(f"Incremental update needs exactly one trading day after {self.last_date}, "
+                             f"got {new_dates.tolist()}")
+        new_rows = new_rows.sort_index(level='code')
+        codes = np.asarray(new_rows.index.get_level_values('code'))
+
+        # 累计型因子：由每只转债的累计值递推新行，tail 中保存的是精确取值
+        appended = new_rows[[col for col in self.tail.columns if col not in RUNNING_FACTORS]].copy()
+        running = self.running.reindex(self.running.index.union(pd.Index(codes, name='code')))
+        for name in self.running.columns:
+            source, accumulate = RUNNING_FACTORS[name]
+            values = new_rows[source].to_numpy(dtype=float)
+            total = accumulate(running.loc[codes, name].to_numpy(dtype=float), values)
+            running.loc[codes, name] = total
+            appended[name] = np.where(np.isnan(values), np.nan, total)
+
+        frame = pd.concat([self.tail, appended])
+        context = FactorContext.from_frame(frame)
+        for name in self.running.columns:
+            context.seed(name, frame[name].to_numpy(dtype=float))
+        values = {name: np.asarray(context.get(name))[len(self.tail):] for name in self.names}
+
+        tail = frame.loc[_tail_mask(frame, self.history)]
+        state = FactorState(version, self.rows + len(new_rows), self.names, self.history, tail, running)
+        return values, state
+
+    def save(self, directory: str):
+        """写入状态目录（先写临时目录再整体替换）"""
+        directory = os.path.abspath(directory)
+        tmp_dir = f"{directory}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        self.tail.to_parquet(os.path.join(tmp_dir, TAIL_FILE))
+        self.running.to_parquet(os.path.join(tmp_dir, RUNNING_FILE))
+        meta = {'version': self.version, 'rows': self.rows, 'names': self.names, 'history': self.history}
+        with open(os.path.join(tmp_dir, STATE_FILE), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+        old_dir = f"{directory}.old-{os.getpid()}"
+        if os.path.exists(directory):
+            os.rename(directory, old_dir)
+        os.rename(tmp_dir, directory)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional['FactorState']:
+        """读取状态目录，不存在时返回 None"""
+        path = os.path.join(directory, STATE_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            meta = json.load(f)
+        tail = pd.read_parquet(os.path.join(directory, TAIL_FILE))
+        running = pd.read_parquet(os.path.join(directory, RUNNING_FILE))
+        return cls(meta['version'], meta['rows'], meta['names'], meta['history'], tail, running)
+
+
+def append_trading_day(cache, state: FactorState, new_rows: pd.DataFrame, version: str) -> FactorState:
+    """增量计算新交易日的因子并追加到磁盘缓存
+
+    只计算新交易日的因子值，作为新版本的分块追加到旧版本的缓存之后
+    （见 FactorCache.append），已缓存的历史数据既不读取也不重写。
+
+    Args:
+        cache: FactorCache 实例，须已缓存状态对应版本的全部维护因子
+        state: 旧版本数据的增量状态
+        new_rows: 新交易日的数据
+        version: 追加后的数据版本
+
+    Returns:
+        FactorState: 新版本数据的增量状态
+    """
+    for name in state.names:
+        if cache.rows(state.version, name) != state.rows:
+            raise ValueError(f"Factor {name} is not cached for version {state.version}")
+
+    values, new_state = state.update(new_rows, version)
+    for name in state.names:
+        cache.append(state.version, version, name, values[name])
+    logger.info(f"Appended {len(new_rows)} rows of {len(state.names)} factors for version {version}")
+    return new_state
@@ -0,0 +1,124 @@
+# kernel.py - 编译型回测模拟内核（可选 Numba）
+
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        """未安装 numba 时的占位装饰器，函数按普通 Python 执行"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+@njit(cache=True)
+def simulate_kernel(offsets, code_idx, score, excluded, close, next_open, next_high, next_ret,
+                    n_codes, hold_num, stop_profit, fee_rate):
+    """在一个循环内完成每日前N名选择、止盈收益和换手成本计算
+
+    输入数组按交易日连续存放，第 t 个交易日的行为 [offsets[t], offsets[t+1])。
+    选择规则与 rank(method='min') <= hold_num 一致，止盈和成本规则与
+    CBBacktester.simulate 一致。
+
+    Args:
+        offsets: 每个交易日的起始行，长度 T + 1
+        code_idx: 每行的代码序号
+        score: 每行的得分
+        excluded: 每行是否被过滤
+        close: 每行的收盘价
+        next_open: 每行同一代码次日开盘价
+        next_high: 每行同一代码次日最高价
+        next_ret: 每行同一代码次日涨跌幅
+        n_codes: 代码数量
+        hold_num: 每日持仓数量
+        stop_profit: 止盈比例，0 表示不止盈
+        fee_rate: 交易费率（双边）
+
+    Returns:
+        tuple: (selected, trade_returns, stop_hit, time_return, cost, counts, entries)，
+            前三项按行，后四项按交易日
+    """
+    n_dates = len(offsets) - 1
+    n_rows = len(score)
+    selected = np.zeros(n_rows, dtype=np.bool_)
+    trade_returns = np.full(n_rows, np.nan)
+    stop_hit = np.zeros(n_rows, dtype=np.bool_)
+    time_return = np.zeros(n_dates)
+    cost = np.zeros(n_dates)
+    counts = np.zeros(n_dates, dtype=np.int64)
+    entries = np.zeros(n_dates, dtype=np.int64)
+
+    held = np.zeros(n_codes, dtype=np.bool_)
+    candidates = np.empty(n_rows)
+    prev_lo, prev_hi, prev_count = 0, 0, 0
+
+    for t in range(n_dates):
+        lo, hi = offsets[t], offsets[t + 1]
+
+        # 入选门槛：当日有效得分中第 hold_num 小的值
+        m = 0
+        for i in range(lo, hi):
+            if not excluded[i] and not np.isnan(score[i]):
+                candidates[m] = score[i]
+                m += 1
+        k = min(hold_num, m)
+        threshold = -np.inf
+        if k > 0:
+            threshold = np.partition(candidates[:m], k - 1)[k - 1]
+
+        count, kept, valid, total = 0, 0, 0, 0.0
+        if k > 0:
+            for i in range(lo, hi):
+                if excluded[i] or np.isnan(score[i]) or score[i] > threshold:
+                    continue
+                selected[i] = True
+                count += 1
+                if held[code_idx[i]]:
+                    kept += 1
+
+                ret = next_ret[i]
+                if stop_profit != 0:
+                    target = close[i] * (1 + stop_profit)
+                    if next_high[i] >= target:
+                        ret = stop_profit
+                        stop_hit[i] = True
+                    if next_open[i] >= target:
+                        ret = (next_open[i] - close[i]) / close[i]
+                        stop_hit[i] = True
+                trade_returns[i] = ret
+                if not np.isnan(ret):
+                    total += ret
+                    valid += 1
+
+        if valid > 0:
+            time_return[t] = total / valid
+        elif count > 0:
+            time_return[t] = np.nan
+
+        counts[t] = count
+        entries[t] = count - kept
+        # 等权持仓：0.5 * 费率 * (买入权重 + 卖出权重)，见 CBBacktester._turnover_cost
+        turnover = 0.0
+        if count > 0:
+            turnover += (count - kept) / count
+        if prev_count > 0:
+            turnover += (prev_count - kept) / prev_count
+        cost[t] = 0.5 * fee_rate * turnover
+
+        # 更新持仓标记：清除前一日持仓，记录当日持仓
+        for i in range(prev_lo, prev_hi):
+            if selected[i]:
+                held[code_idx[i]] = False
+        for i in range(lo, hi):
+            if selected[i]:
+                held[code_idx[i]] = True
+        prev_lo, prev_hi, prev_count = lo, hi, count
+
+    return selected, trade_returns, stop_hit, time_return, cost, counts, entries
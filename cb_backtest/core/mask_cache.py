@@ -0,0 +1,137 @@
+# mask_cache.py - 跨请求的过滤掩码缓存
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Tuple
+import numpy as np
+from .expr import compile_condition, normalize_condition
+
+logger = logging.getLogger(__name__)
+
+# 默认内存上限 64MB，约可容纳 5 亿行的掩码
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class MaskCache:
+    """过滤掩码的 LRU 缓存
+
+    按 (数据版本, 规范化条件文本) 缓存单个条件的排除掩码，按 (数据版本,
+    条件集合) 缓存合并后的掩码。掩码以 np.packbits 压缩为位图存储，每行
+    只占 1 bit。总字节数超过上限时淘汰最久未使用的项。
+
+    掩码覆盖数据集的全部行，调用方按日期区间的行范围截取。
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Tuple, Tuple[np.ndarray, int]]' = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        """当前缓存占用的字节数"""
+        return self._nbytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get(self, key: Tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        bits, length = entry
+        return np.unpackbits(bits, count=length).view(bool)
+
+    def _put(self, key: Tuple, mask: np.ndarray):
+        bits = np.packbits(mask)
+        if bits.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._nbytes -= old[0].nbytes
+            self._entries[key] = (bits, len(mask))
+            self._nbytes += bits.nbytes
+            self._evict()
+
+    def _evict(self):
+        while self._nbytes > self.max_bytes and self._entries:
+            _, (bits, _) = self._entries.popitem(last=False)
+            self._nbytes -= bits.nbytes
+
+    def resize(self, max_bytes: int):
+        """调整内存上限，超出部分立即淘汰"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def exclusion_mask(self,
+                       version: str,
+                       conditions: Iterable[str],
+                       column: Callable[[str], np.ndarray],
+                       length: int) -> np.ndarray:
+        """返回一组条件合并后的排除掩码
+
+        Args:
+            version: 数据版本（Dataset.version 或 PanelStore.version）
+            conditions: 过滤表达式列表
+            column: 按列名返回整列数组的函数，仅在未命中时调用
+            length: 数据集行数
+
+        Returns:
+            np.ndarray: 长度为 length 的布尔数组，True 表示被排除
+        """
+        normalized = sorted({normalize_condition(condition) for condition in conditions})
+        combined_key = (version, tuple(normalized))
+        if len(normalized) > 1:
+            mask = self._get(combined_key)
+            if mask is not None:
+                return mask
+
+        excluded = np.zeros(length, dtype=bool)
+        for condition in normalized:
+            key = (version, condition)
+            mask = self._get(key)
+            if mask is None:
+                predicate = compile_condition(condition)
+                mask = np.broadcast_to(predicate({name: column(name) for name in predicate.names}), (length,))
+                self._put(key, mask)
+            excluded |= mask
+
+        if len(normalized) > 1:
+            self._put(combined_key, excluded)
+        return excluded
+
+    def stats(self) -> Dict[str, int]:
+        """命中/未命中次数和内存占用"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'nbytes': self._nbytes,
+            'max_bytes': self.max_bytes,
+        }
+
+    def clear(self):
+        """清空缓存和计数"""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+
+_mask_cache = MaskCache()
+
+
+def get_mask_cache() -> MaskCache:
+    """返回进程级共享的过滤掩码缓存"""
+    return _mask_cache
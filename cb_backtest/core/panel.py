@@ -0,0 +1,121 @@
+# panel.py - 稠密面板数据结构
+
+from typing import Dict, Iterable, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+# 模拟成交需要的次日行情列
+NEXT_DAY_COLUMNS = ('open', 'high', 'close', 'pct_chg')
+
+
+class Panel:
+    """(trade_date × code) 稠密面板
+
+    每个字段是一个形状为 (交易日数, 转债数) 的二维数组，行按交易日升序、列按
+    代码排序；valid 标记该 (日期, 代码) 在原始长表中是否存在。过滤、打分、
+    排名和收益计算都可以写成整块数组运算，不再需要逐日 xs 或全表掩码。
+
+    Attributes:
+        dates: 交易日数组，长度 T
+        codes: 转债代码数组，长度 N
+        fields: 字段名到 (T, N) 数组的映射，缺失位置为 NaN（非数值字段为 None）
+        valid: (T, N) 布尔数组
+        date_idx: 原始长表每行对应的日期序号
+        code_idx: 原始长表每行对应的代码序号
+    """
+
+    def __init__(self,
+                 dates: np.ndarray,
+                 codes: np.ndarray,
+                 fields: Dict[str, np.ndarray],
+                 valid: np.ndarray,
+                 date_idx: np.ndarray,
+                 code_idx: np.ndarray):
+        self.dates = dates
+        self.codes = codes
+        self.fields = fields
+        self.valid = valid
+        self.date_idx = date_idx
+        self.code_idx = code_idx
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, columns: Optional[Iterable[str]] = None) -> 'Panel':
+        """由 MultiIndex (code, trade_date) 长表构建面板
+
+        Args:
+            df: 长表数据
+            columns: 需要展开的列，None 表示全部列
+
+        Returns:
+            Panel: 稠密面板
+        """
+        date_idx, dates = pd.factorize(df.index.get_level_values('trade_date'), sort=True)
+        code_idx, codes = pd.factorize(df.index.get_level_values('code'), sort=True)
+        shape = (len(dates), len(codes))
+
+        valid = np.zeros(shape, dtype=bool)
+        valid[date_idx, code_idx] = True
+
+        panel = cls(np.asarray(dates), np.asarray(codes), {}, valid, date_idx, code_idx)
+        for name in (df.columns if columns is None else columns):
+            values = df[name].to_numpy()
+            # 数值字段统一展开为浮点，缺失位置为 NaN
+            panel.fields[name] = panel.from_rows(values.astype(float) if values.dtype.kind == 'b' else values)
+        return panel
+
+    @property
+    def shape(self):
+        """面板形状 (交易日数, 转债数)"""
+        return self.valid.shape
+
+    @property
+    def rows(self) -> np.ndarray:
+        """(T, N) 行号矩阵：每个位置在原始长表中的行号，缺失位置为 -1"""
+        rows = np.full(self.shape, -1, dtype=np.int64)
+        rows[self.date_idx, self.code_idx] = np.arange(len(self.date_idx))
+        return rows
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.fields
+
+    def field(self, name: str) -> np.ndarray:
+        """返回字段的 (T, N) 数组"""
+        if name not in self.fields:
+            raise ValueError(f"Factor {name} not found in panel")
+        return self.fields[name]
+
+    def next_day(self, values: np.ndarray) -> np.ndarray:
+        """将 (T, N) 数组整体上移一个交易日，得到每个位置下一交易日的值"""
+        shifted = np.empty_like(values)
+        shifted[:-1] = values[1:]
+        shifted[-1:] = {'f': np.nan, 'b': False}.get(values.dtype.kind, None)
+        return shifted
+
+    def from_rows(self, values: np.ndarray) -> np.ndarray:
+        """将按原始长表行顺序排列的一维数组展开为 (T, N) 数组"""
+        if values.dtype.kind in 'biuf':
+            fill = False if values.dtype.kind == 'b' else np.nan
+            field = np.full(self.shape, fill, dtype=bool if values.dtype.kind == 'b' else float)
+        else:
+            field = np.full(self.shape, None, dtype=object)
+        field[self.date_idx, self.code_idx] = values
+        return field
+
+    def to_rows(self, values: np.ndarray) -> np.ndarray:
+        """按原始长表的行顺序取出 (T, N) 数组的值"""
+        return values[self.date_idx, self.code_idx]
+
+
+def next_day_values(df: pd.DataFrame, columns: Sequence[str] = NEXT_DAY_COLUMNS) -> Dict[str, np.ndarray]:
+    """计算每行同一代码下一交易日的取值
+
+    Args:
+        df: MultiIndex (code, trade_date) 长表
+        columns: 需要平移的列
+
+    Returns:
+        Dict[str, np.ndarray]: 列名到数组的映射，与 df 的行一一对应；
+            下一交易日没有该代码记录时为 NaN
+    """
+    panel = Panel.from_frame(df, columns=columns)
+    return {name: panel.to_rows(panel.next_day(panel.field(name))) for name in columns}
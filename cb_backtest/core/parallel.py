@@ -0,0 +1,119 @@
+# parallel.py - 按代码分片的多进程因子计算
+
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Tuple
+import numpy as np
+from .factors import FACTORS, FactorContext, factor_inputs, resolve_factors
+
+logger = logging.getLogger(__name__)
+
+# 每个工作进程分到的分片数，分片多一些便于负载均衡
+SHARDS_PER_WORKER = 4
+
+
+def _shared_array(shape: Tuple[int, ...], dtype) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    """创建共享内存块及其上的数组视图"""
+    nbytes = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+    shm = shared_memory.SharedMemory(create=True, size=nbytes)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _shard_bounds(first: np.ndarray, shards: int) -> List[Tuple[int, int]]:
+    """按代码边界将按代码排序的行切成行数大致相等的连续分片"""
+    starts = np.flatnonzero(first)
+    n = len(first)
+    targets = np.linspace(0, n, shards + 1)[1:-1]
+    cuts = np.unique(np.concatenate([[0], starts[np.minimum(np.searchsorted(starts, targets), len(starts) - 1)], [n]]))
+    return [(int(lo), int(hi)) for lo, hi in zip(cuts[:-1], cuts[1:]) if hi > lo]
+
+
+def _compute_shard(spec: Dict) -> None:
+    """工作进程：计算一个分片的因子并写入共享输出块
+
+    输入块按代码排序，分片为其中的连续行；输出块按原始行顺序排列，分片的结果
+    直接写到对应行，主进程无需再拼接。
+    """
+    lo, hi = spec['bounds']
+    blocks = {}
+    try:
+        for key in ('inputs', 'index', 'output'):
+            name, shape, dtype = spec[key]
+            shm = shared_memory.SharedMemory(name=name)
+            blocks[key] = (shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+        inputs = blocks['inputs'][1]
+        index = blocks['index'][1]
+        output = blocks['output'][1]
+
+        columns = {name: i for i, name in enumerate(spec['columns'])}
+        context = FactorContext(index[0, lo:hi], index[1, lo:hi], lambda name: inputs[columns[name], lo:hi])
+        # 截面因子已在主进程按全部转债计算，分片内不再重算
+        for name in spec['seeded']:
+            context.seed(name, inputs[columns[name], lo:hi])
+        rows = index[2, lo:hi]
+        for i, name in enumerate(spec['names']):
+            output[i, rows] = context.get(name)
+    finally:
+        for shm, _ in blocks.values():
+            shm.close()
+
+
+def compute_sharded(context: FactorContext, names: List[str], workers: int) -> Dict[str, np.ndarray]:
+    """按代码分片并行计算因子
+
+    截面因子（Factor.cross_sectional，如市场平均涨幅）在主进程基于全部数据计算
+    一次，与原始输入列一起按代码排序写入共享内存；各工作进程只读取自己的连续
+    分片，结果按原始行顺序写入共享输出块，最后一次性复制出来。
+
+    Args:
+        context: 全量数据的因子上下文（提供原始列、代码和交易日序号）
+        names: 需要计算的因子
+        workers: 工作进程数
+
+    Returns:
+        Dict[str, np.ndarray]: 因子名称到与数据行一一对应的数组
+    """
+    resolved = resolve_factors(names)
+    seeded = [name for name in resolved if FACTORS[name].cross_sectional]
+    columns = sorted(factor_inputs(names)) + seeded
+    order, first, _ = context.layout
+    n = len(order)
+
+    shm_blocks = []
+    try:
+        shm, inputs = _shared_array((len(columns), n), np.float64)
+        shm_blocks.append(shm)
+        for i, name in enumerate(columns):
+            np.take(np.asarray(context.get(name), dtype=float), order, out=inputs[i])
+
+        shm, index = _shared_array((3, n), np.int64)
+        shm_blocks.append(shm)
+        np.take(context.code_idx, order, out=index[0])
+        np.take(context.date_idx, order, out=index[1])
+        index[2] = order
+
+        shm, output = _shared_array((len(names), n), np.float64)
+        shm_blocks.append(shm)
+
+        bounds = _shard_bounds(first, workers * SHARDS_PER_WORKER)
+        spec = {
+            'inputs': (shm_blocks[0].name, inputs.shape, inputs.dtype.str),
+            'index': (shm_blocks[1].name, index.shape, index.dtype.str),
+            'output': (shm_blocks[2].name, output.shape, output.dtype.str),
+            'columns': columns,
+            'seeded': seeded,
+            'names': list(names),
+        }
+        logger.info(f"Computing {len(names)} factors over {len(bounds)} code shards with {workers} workers")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for future in [executor.submit(_compute_shard, {**spec, 'bounds': bound}) for bound in bounds]:
+                future.result()
+
+        # 共享内存随后释放，输出整体复制一次，各因子为其中一行的视图
+        result = output.copy()
+        return {name: result[i] for i, name in enumerate(names)}
+    finally:
+        for shm in shm_blocks:
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,148 @@
+# partition.py - 按日期分区的数据存储
+
+import os
+import json
+import shutil
+import logging
+from typing import Dict, List, Optional
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = '_index.json'
+FREQ_FORMATS = {'year': '%Y', 'month': '%Y%m'}
+
+
+def is_partitioned(path: str) -> bool:
+    """判断路径是否为分区数据目录"""
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, INDEX_FILE))
+
+
+def read_index(path: str) -> Dict:
+    """读取分区目录的元数据索引"""
+    with open(os.path.join(path, INDEX_FILE), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _trade_dates(df: pd.DataFrame) -> pd.DatetimeIndex:
+    """取出每行的交易日（trade_date 可以是索引级别或普通列）"""
+    if 'trade_date' in (df.index.names or []):
+        values = df.index.get_level_values('trade_date')
+    elif 'trade_date' in df.columns:
+        values = df['trade_date']
+    else:
+        raise ValueError("Data must have a 'trade_date' index level or column")
+    return pd.DatetimeIndex(pd.to_datetime(values.astype(str) if values.dtype.kind in 'iu' else values))
+
+
+def partition_dataset(src_path: str,
+                      dest_dir: str,
+                      freq: str = 'year',
+                      row_group_size: int = 20000) -> Dict:
+    """将单个 parquet 文件转换为按年/月分区的数据目录
+
+    每个分区内按 (trade_date, code) 排序写入，行组的日期统计信息紧凑，
+    读取时可以按日期跳过行组。目录下的 _index.json 记录每个分区的日期范围。
+
+    Args:
+        src_path: 源 parquet 文件路径（如 cb_data.pq、index.pq）
+        dest_dir: 输出目录
+        freq: 分区粒度，'year' 或 'month'
+        row_group_size: 每个行组的行数
+
+    Returns:
+        Dict: 写入的元数据索引
+    """
+    if freq not in FREQ_FORMATS:
+        raise ValueError(f"freq must be one of {list(FREQ_FORMATS)}, got {freq}")
+
+    df = pd.read_parquet(src_path)
+    dates = _trade_dates(df)
+    order = pd.DataFrame({
+        'date': dates,
+        'code': df.index.get_level_values('code') if 'code' in (df.index.names or []) else 0,
+    }).sort_values(['date', 'code'], kind='mergesort').index.to_numpy()
+    df = df.iloc[order]
+    dates = dates[order]
+    keys = dates.strftime(FREQ_FORMATS[freq])
+
+    dest_dir = os.path.abspath(dest_dir)
+    tmp_dir = f"{dest_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    partitions = []
+    for key in pd.unique(keys):
+        mask = keys == key
+        part_dates = dates[mask]
+        file_name = f"{key}.parquet"
+        table = pa.Table.from_pandas(df[mask], preserve_index=True)
+        pq.write_table(table, os.path.join(tmp_dir, file_name), row_group_size=row_group_size)
+        partitions.append({
+            'file': file_name,
+            'start_date': part_dates.min().strftime('%Y%m%d'),
+            'end_date': part_dates.max().strftime('%Y%m%d'),
+            'rows': int(mask.sum()),
+        })
+
+    meta = {
+        'freq': freq,
+        'source': os.path.basename(src_path),
+        'columns': [str(col) for col in df.columns],
+        'partitions': partitions,
+    }
+    with open(os.path.join(tmp_dir, INDEX_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    old_dir = f"{dest_dir}.old-{os.getpid()}"
+    if os.path.exists(dest_dir):
+        os.rename(dest_dir, old_dir)
+    os.rename(tmp_dir, dest_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    logger.info(f"Partitioned {src_path} into {len(partitions)} {freq} partitions at {dest_dir}")
+    return meta
+
+
+def read_partitioned(path: str,
+                     columns: Optional[List[str]] = None,
+                     start_date: Optional[str] = None,
+                     end_date: Optional[str] = None,
+                     filters: Optional[List] = None) -> pd.DataFrame:
+    """读取分区目录中与日期区间重叠的分区
+
+    Args:
+        path: 分区目录
+        columns: 需要读取的列，None 表示全部
+        start_date: 开始日期，格式：YYYYMMDD，None 表示不限
+        end_date: 结束日期，格式：YYYYMMDD，None 表示不限
+        filters: 传给 pyarrow 的行过滤条件，用于在分区内跳过行组
+
+    Returns:
+        pd.DataFrame: 按日期排序的数据
+    """
+    meta = read_index(path)
+    selected = [
+        part for part in meta['partitions']
+        if (start_date is None or part['end_date'] >= start_date)
+        and (end_date is None or part['start_date'] <= end_date)
+    ]
+    logger.info(f"Reading {len(selected)} of {len(meta['partitions'])} partitions from {path}")
+
+    if not selected:
+        # 没有重叠分区时返回结构一致的空表
+        first = os.path.join(path, meta['partitions'][0]['file'])
+        return pd.read_parquet(first, columns=columns).iloc[:0]
+
+    frames = [
+        pd.read_parquet(os.path.join(path, part['file']), columns=columns, filters=filters)
+        for part in selected
+    ]
+    return pd.concat(frames) if len(frames) > 1 else frames[0]
+
+
+def partition_schema(path: str) -> pa.Schema:
+    """返回分区目录的数据结构（取第一个分区）"""
+    meta = read_index(path)
+    return pq.read_schema(os.path.join(path, meta['partitions'][0]['file']))
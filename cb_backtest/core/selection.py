@@ -0,0 +1,173 @@
+# selection.py - 每日前N名持仓选择
+
+from typing import Dict, List, Tuple
+import numpy as np
+
+
+def top_n_mask(score: np.ndarray, valid: np.ndarray, n: int) -> np.ndarray:
+    """按行（交易日）选出得分最小的前 n 个位置
+
+    与 rank(method='min') <= n 的结果一致：并列得分要么全部入选，要么全部
+    落选，因此当日入选数量可能多于 n。只做部分排序（np.partition），不计算
+    完整排名。
+
+    Args:
+        score: (T, N) 得分矩阵
+        valid: (T, N) 布尔矩阵，False 的位置（被过滤或缺失）不参与选择
+        n: 每日持仓数量
+
+    Returns:
+        np.ndarray: (T, N) 布尔矩阵，True 表示入选
+    """
+    if n <= 0:
+        return np.zeros(score.shape, dtype=bool)
+    if n >= score.shape[1]:
+        return valid.copy()
+
+    # 无效位置以 +inf 填充，排在所有有效得分之后；
+    # 第 n 小的值为入选门槛，得分不超过门槛的有效位置排名必然 <= n
+    padded = np.where(valid, score, np.inf)
+    threshold = np.partition(padded, n - 1, axis=1)[:, n - 1:n]
+    return valid & (padded <= threshold)
+
+
+def rebalance_mask(score: np.ndarray,
+                   valid: np.ndarray,
+                   present: np.ndarray,
+                   n: int,
+                   rebalance_every: int = 1,
+                   hold_days: int = 1) -> np.ndarray:
+    """按调仓频率和最短持有期逐日推进持仓
+
+    只在调仓日（每 rebalance_every 个交易日）选出前 n 名，其余交易日沿用
+    上一交易日的持仓，不做任何排名。调仓日卖出不在前 n 名且已持有满
+    hold_days 个交易日的转债，未满期的继续持有，因此持仓数量可能暂时多于 n。
+    持仓的转债当日没有记录（停牌、退市）时视为卖出。
+
+    Args:
+        score: (T, N) 得分矩阵
+        valid: (T, N) 布尔矩阵，False 的位置不参与选择
+        present: (T, N) 布尔矩阵，当日是否有该转债的记录
+        n: 调仓日的持仓数量
+        rebalance_every: 调仓间隔（交易日）
+        hold_days: 最短持有期（交易日）
+
+    Returns:
+        np.ndarray: (T, N) 布尔矩阵，True 表示当日收盘持有
+    """
+    rebalance_days = np.arange(0, score.shape[0], rebalance_every)
+    targets = top_n_mask(score[rebalance_days], valid[rebalance_days], n)
+
+    held = np.zeros(score.shape, dtype=bool)
+    entered = np.full(score.shape[1], -1)  # 当前持仓的买入日序号，-1 表示未持有
+    for t in range(score.shape[0]):
+        holding = entered >= 0
+        if t % rebalance_every == 0:
+            locked = holding & (t - entered < hold_days)
+            target = targets[t // rebalance_every] | locked
+            entered[target & ~holding] = t
+            entered[~target] = -1
+        entered[(entered >= 0) & ~present[t]] = -1
+        held[t] = entered >= 0
+    return held
+
+
+class Selection:
+    """每日入选持仓的紧凑表示（按交易日分段的 CSR 结构）
+
+    第 i 个交易日入选的代码序号为 code_idx[offsets[i]:offsets[i+1]]，对应
+    原始长表中的行号为 rows[offsets[i]:offsets[i+1]]。
+
+    Attributes:
+        dates: 交易日数组，长度 T
+        codes: 转债代码数组
+        offsets: 每个交易日在 code_idx/rows 中的起始位置，长度 T + 1
+        code_idx: 入选代码在 codes 中的序号
+        rows: 入选记录在原始长表中的行号
+    """
+
+    def __init__(self,
+                 dates: np.ndarray,
+                 codes: np.ndarray,
+                 offsets: np.ndarray,
+                 code_idx: np.ndarray,
+                 rows: np.ndarray):
+        self.dates = dates
+        self.codes = codes
+        self.offsets = offsets
+        self.code_idx = code_idx
+        self.rows = rows
+
+    @classmethod
+    def from_mask(cls, mask: np.ndarray, dates: np.ndarray, codes: np.ndarray, rows: np.ndarray) -> 'Selection':
+        """由 (T, N) 入选矩阵构建
+
+        Args:
+            mask: (T, N) 布尔矩阵
+            dates: 交易日数组，长度 T
+            codes: 转债代码数组，长度 N
+            rows: (T, N) 行号矩阵，每个位置在原始长表中的行号
+
+        Returns:
+            Selection: 紧凑的入选结构
+        """
+        date_pos, code_idx = np.nonzero(mask)
+        offsets = np.zeros(len(dates) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(date_pos, minlength=len(dates)), out=offsets[1:])
+        return cls(dates, codes, offsets, code_idx, rows[date_pos, code_idx])
+
+    @classmethod
+    def empty(cls, dates: np.ndarray, codes: np.ndarray) -> 'Selection':
+        """没有任何持仓的选择结果"""
+        none = np.zeros(0, dtype=np.int64)
+        return cls(dates, codes, np.zeros(len(dates) + 1, dtype=np.int64), none, none)
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @property
+    def counts(self) -> np.ndarray:
+        """每个交易日的入选数量"""
+        return np.diff(self.offsets)
+
+    @property
+    def date_pos(self) -> np.ndarray:
+        """每条入选记录所属交易日的序号"""
+        return np.repeat(np.arange(len(self.dates)), self.counts)
+
+    def held_on(self, offset: int) -> np.ndarray:
+        """每条持仓的同一代码在 offset 个交易日之后（负数为之前）是否也被持有
+
+        每日的代码序号有序，以 (交易日序号, 代码序号) 编码为全局有序的键，
+        通过 searchsorted 查找，不需要展开 (交易日 × 全部代码) 的稠密持仓矩阵。
+        """
+        n_codes = len(self.codes)
+        keys = self.date_pos * n_codes + self.code_idx
+        targets = keys + offset * n_codes
+        pos = np.searchsorted(keys, targets)
+        found = pos < len(keys)
+        found[found] = keys[pos[found]] == targets[found]
+        return found
+
+    def turnover(self) -> Tuple[np.ndarray, np.ndarray]:
+        """计算每个交易日相对前一交易日的调入、调出数量
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (调入数量, 调出数量)，长度均为 T；
+                首日的调入数量即首日持仓数量
+        """
+        n_dates = len(self.dates)
+        kept = self.held_on(1)
+
+        counts = self.counts
+        held_over = np.bincount(self.date_pos[kept] + 1, minlength=n_dates + 1)[:n_dates]
+        previous = np.concatenate([[0], counts[:-1]])
+        return counts - held_over, previous - held_over
+
+    def codes_on(self, i: int) -> np.ndarray:
+        """第 i 个交易日入选的转债代码"""
+        return self.codes[self.code_idx[self.offsets[i]:self.offsets[i + 1]]]
+
+    def to_dict(self) -> Dict[object, List[str]]:
+        """转换为 {交易日: [代码, ...]}"""
+        return {date: self.codes_on(i).tolist() for i, date in enumerate(self.dates)}
@@ -1,7 +1,16 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 import logging
+import numpy as np
 import pandas as pd
 from .backtester import CBBacktester
+from .dataset import Dataset, load_dataset, lookback_start
+from .factor_cache import get_factor_cache
+from .factors import FACTORS, FactorContext, strategy_factors
+from .incremental import factor_history
+from .mask_cache import get_mask_cache
+from .store import PanelStore
+from .transforms import Transform, get_transform_cache, parse_transform
+from ..utils.date import to_int_date
 from .eval import evaluate_performance
 
 logger = logging.getLogger(__name__)
@@ -9,85 +18,192 @@ logger = logging.getLogger(__name__)
 class SingleRunner:
     """单次回测运行器"""
     
-    def __init__(self, cb_data_path: str, index_data_path: str):
+    def __init__(self,
+                 cb_data_path: Optional[str] = None,
+                 index_data_path: Optional[str] = None,
+                 dataset: Optional[Dataset] = None,
+                 store: Optional[PanelStore] = None,
+                 columns: Optional[List[str]] = None,
+                 start_date: Optional[str] = None,
+                 end_date: Optional[str] = None):
         """
         初始化单次回测运行器
         
         Args:
-            cb_data_path: 可转债数据文件路径
-            index_data_path: 指数数据文件路径
+            cb_data_path: 可转债数据文件路径或分区目录
+            index_data_path: 指数数据文件路径或分区目录
+            dataset: 已加载的数据集（如来自 DatasetRegistry），提供时不再读取文件
+            store: 内存映射的列式面板存储，提供时按日期区间直接从存储取数
+            columns: 只读取这些可转债数据列（通常由 strategy_columns 根据策略计算），
+                None 表示读取全部列
+            start_date: 只加载该日期及之后的数据，格式：YYYYMMDD，None 表示不限；
+                数据为分区目录时只读取重叠的分区。columns 引用注册因子时向前多读
+                因子窗口所需的交易日（累计型因子不下推），计算后再截取到回测区间
+            end_date: 只加载该日期及之前的数据，格式：YYYYMMDD，None 表示不限
         """
-        # 读取数据
-        self.cb_data = pd.read_parquet(cb_data_path)
-        self.index_data = pd.read_parquet(index_data_path)
+        self.dataset = None
+        self.store = store
         
-        # 打印数据信息
-        logger.info(f"CB Data columns: {self.cb_data.columns.tolist()}")
-        logger.info(f"CB Data shape: {self.cb_data.shape}")
-        logger.info(f"CB Data date range: {self.cb_data.index.get_level_values('trade_date').min()} to {self.cb_data.index.get_level_values('trade_date').max()}")
-        logger.info(f"CB Data unique dates count: {len(self.cb_data.index.get_level_values('trade_date').unique())}")
-        logger.info(f"CB Data unique codes count: {len(self.cb_data.index.get_level_values('code').unique())}")
-        logger.info(f"CB Data head:\n{self.cb_data.head()}")
-        logger.info(f"CB Data dtypes:\n{self.cb_data.dtypes}")
-        logger.info(f"CB Data index:\n{self.cb_data.index}")
+        if store is not None:
+            self.index_data = store.index_data
+            self._cb_data = None
+        else:
+            if dataset is None:
+                if cb_data_path is None or index_data_path is None:
+                    raise ValueError("cb_data_path and index_data_path are required when dataset is not provided")
+                if start_date is not None:
+                    start_date = self._load_start(index_data_path, start_date, columns)
+                dataset = load_dataset(
+                    cb_data_path,
+                    index_data_path,
+                    columns=columns,
+                    start_date=start_date,
+                    end_date=end_date
+                )
+            
+            # 数据集可能在多个运行器之间共享，只读使用
+            self.dataset = dataset
+            self._cb_data = dataset.cb_data
+            self.index_data = dataset.index_data
         
-        # 打印指数数据信息
-        logger.info(f"Index Data columns: {self.index_data.columns.tolist()}")
-        logger.info(f"Index Data head:\n{self.index_data.head()}")
-        logger.info(f"Index Data index:\n{self.index_data.index}")
+        self._engine = None
+        self._factors = None
+    
+    @staticmethod
+    def _load_start(index_data_path: str, start_date: str, columns: Optional[List[str]]) -> Optional[str]:
+        """下推的读取起始日期：向前多读注册因子窗口所需的交易日
+
+        窗口因子按每只转债的最近若干行计算，从区间开始日读取会使区间前段的因子
+        缺失或错误。停牌转债的行数少于交易日数，其窗口仍可能跨出读取范围。
+        """
+        names = [name for name in (columns if columns is not None else FACTORS) if name in FACTORS]
+        history = factor_history(names)
+        if history is None:
+            return None
+        if history == 0:
+            return start_date
+        return lookback_start(index_data_path, start_date, history)
+    
+    @property
+    def cb_data(self) -> pd.DataFrame:
+        """全量可转债数据（存储模式下首次访问时物化）"""
+        if self._cb_data is None:
+            self._cb_data = self.store.slice_frame()
+        return self._cb_data
+    
+    def _date_bounds(self) -> Tuple[int, int]:
+        """返回数据的首末交易日（YYYYMMDD 整数）"""
+        if self.store is not None:
+            return self.store.date_bounds()
+        dates = self.dataset.trade_dates
+        return int(dates[0]), int(dates[-1])
+    
+    def _row_range(self, start_date: int, end_date: int) -> Tuple[int, int]:
+        """返回 [start_date, end_date] 区间在全量数据中的行范围 [lo, hi)"""
+        if self.store is not None:
+            return self.store.row_range(start_date, end_date)
         
-        # 确保可转债数据有正确的MultiIndex
-        if not isinstance(self.cb_data.index, pd.MultiIndex):
-            raise ValueError("CB data must have MultiIndex with (code, trade_date)")
-            
-        # 如果指数数据不是MultiIndex，将其转换为MultiIndex
-        if not isinstance(self.index_data.index, pd.MultiIndex):
-            logger.info("Converting index data to MultiIndex format")
-            
-            # 检查是否已经有trade_date作为索引
-            if self.index_data.index.name == 'trade_date':
-                logger.info("Index data already has trade_date as index")
-                # 重置索引，将trade_date变成列
-                self.index_data = self.index_data.reset_index()
-            else:
-                # 检查日期列的名称
-                date_columns = [col for col in self.index_data.columns if 'date' in col.lower()]
-                if not date_columns:
-                    raise ValueError("No date column found in index data")
-                date_column = date_columns[0]
-                logger.info(f"Using {date_column} as trade_date column")
-                # 重命名日期列
-                self.index_data = self.index_data.rename(columns={date_column: 'trade_date'})
-            
-            # 添加code列并设置MultiIndex
-            self.index_data['code'] = '000001.SH'  # 使用上证指数作为默认指数
-            self.index_data = self.index_data.set_index(['code', 'trade_date'])
-            logger.info(f"Index Data after conversion:\n{self.index_data.head()}")
+        # 数据按交易日排序，二分定位区间的首末行
+        dates = self.dataset.trade_dates
+        lo = np.searchsorted(dates, start_date, side='left')
+        hi = np.searchsorted(dates, end_date, side='right')
+        return int(lo), int(hi)
+    
+    def _select_dates(self, start_date: int, end_date: int) -> pd.DataFrame:
+        """取出 [start_date, end_date] 区间的可转债数据（独立副本）"""
+        if self.store is not None:
+            return self.store.slice_frame(start_date, end_date)
         
-        # 确保必要的列存在
-        required_columns = ['close', 'open', 'high', 'low', 'pct_chg']  # trade_date和code在索引中
-        missing_columns = [col for col in required_columns if col not in self.cb_data.columns]
-        if missing_columns:
-            raise ValueError(f"Missing required columns in cb_data: {missing_columns}")
+        lo, hi = self._row_range(start_date, end_date)
+        return self.cb_data.iloc[lo:hi].copy()
+    
+    def _has_column(self, name: str) -> bool:
+        """数据文件中是否包含该列"""
+        return name in (self.store.columns if self.store is not None else self.cb_data.columns)
+    
+    @property
+    def factors(self) -> FactorContext:
+        """全量数据上的因子计算上下文
+
+        数据中没有的注册因子首次引用时计算并缓存；配置了进程级因子磁盘缓存
+        （见 configure_factor_cache）时优先从磁盘读取。
+        """
+        if self._factors is None:
+            cache = get_factor_cache()
+            if self.store is not None:
+                self._factors = FactorContext(self.store.code_idx, self.store.date_idx, self.store.column,
+                                              version=self.store.version, cache=cache)
+            else:
+                self._factors = FactorContext.from_frame(self.cb_data, version=self.dataset.version, cache=cache)
+        return self._factors
+    
+    def _is_transform(self, name: str) -> bool:
+        """是否为需要计算的截面变换列（数据和注册因子中都没有该名称）"""
+        return not self._has_column(name) and name not in FACTORS and parse_transform(name) is not None
+    
+    def _transforms(self, names: List[str], conditions: List[str]) -> Dict[str, np.ndarray]:
+        """返回全量数据上的截面变换列
         
-        # 确保索引中的trade_date是字符串类型，格式为YYYYMMDD
-        self.cb_data.index = self.cb_data.index.set_levels(
-            [self.cb_data.index.levels[0],  # code level
-             pd.to_datetime(self.cb_data.index.levels[1]).strftime('%Y%m%d')]  # trade_date level
-        )
+        结果按 (数据版本, 排除条件, 列, 变换) 缓存在进程级 TransformCache 中，
+        未命中的列按变换分组批量计算。
         
-        # 将指数数据的日期转换为字符串类型，格式为YYYYMMDD
-        if isinstance(self.index_data.index, pd.MultiIndex):
-            self.index_data.index = self.index_data.index.set_levels(
-                [self.index_data.index.levels[0],  # code level
-                pd.to_datetime(self.index_data.index.levels[1]).strftime('%Y%m%d')]  # trade_date level
-            )
+        Args:
+            names: 截面变换列名（如 bond_prem_score）
+            conditions: 排除条件，*_score 等只在未过滤转债中计算的变换使用
         
-        # 打印转换后的日期范围
-        logger.info(f"After format conversion - CB Data date range: {self.cb_data.index.get_level_values('trade_date').min()} to {self.cb_data.index.get_level_values('trade_date').max()}")
-        logger.info(f"After format conversion - Index Data date range: {self.index_data.index.get_level_values('trade_date').min()} to {self.index_data.index.get_level_values('trade_date').max()}")
+        Returns:
+            Dict[str, np.ndarray]: 列名到整列数组的映射
+        """
+        values = get_transform_cache().transform(
+            self._version,
+            [parse_transform(name) for name in names],
+            self._column,
+            self.factors.date_idx,
+            self.factors.code_idx,
+            conditions=conditions,
+            exclusion=lambda: self._exclusion(conditions)
+        )
+        return dict(zip(names, values))
+    
+    def _column(self, name: str) -> np.ndarray:
+        """返回全量数据的整列数组（数据中没有的注册因子和截面变换按需计算）"""
+        if not self._has_column(name) and name in FACTORS:
+            return self.factors.get(name)
+        if self._is_transform(name):
+            if parse_transform(name)[1].filtered:
+                raise ValueError(f"Column {name} depends on exclude_conditions and cannot be used here")
+            return self._transforms([name], [])[name]
+        try:
+            if self.store is not None:
+                return np.asarray(self.store.values(name))
+            return self.cb_data[name].to_numpy()
+        except KeyError:
+            raise ValueError(f"Column {name} not found in data") from None
+    
+    def _next_day(self, start_date: int, end_date: int) -> Dict[str, np.ndarray]:
+        """返回日期区间内各行的次日行情（全量数据上计算一次后缓存）"""
+        next_day = self.store.next_day if self.store is not None else self.dataset.next_day
+        lo, hi = self._row_range(start_date, end_date)
+        return {name: values[lo:hi] for name, values in next_day.items()}
+    
+    @property
+    def _version(self) -> str:
+        """数据版本"""
+        return self.store.version if self.store is not None else self.dataset.version
+    
+    def _exclusion(self, conditions: List[str]) -> np.ndarray:
+        """返回全量数据的排除掩码
         
-        self._engine = None
+        掩码按 (数据版本, 条件) 缓存在进程级 MaskCache 中，
+        只调整权重或持仓数量的重复请求无需重新扫描数据。
+        """
+        length = len(self.store.code_idx) if self.store is not None else len(self.cb_data)
+        return get_mask_cache().exclusion_mask(self._version, conditions, self._column, length)
+    
+    def _filter_mask(self, conditions: List[str], start_date: int, end_date: int) -> np.ndarray:
+        """返回日期区间内各行的排除掩码"""
+        lo, hi = self._row_range(start_date, end_date)
+        return self._exclusion(conditions)[lo:hi]
     
     @property
     def engine(self) -> CBBacktester:
@@ -105,7 +221,8 @@ class SingleRunner:
     def run(self, 
             start_date: str,
             end_date: str,
-            strategy: Dict[str, Any]) -> Dict[str, Any]:
+            strategy: Dict[str, Any],
+            trade_log: str = 'none') -> Dict[str, Any]:
         """
         运行单次回测
         
@@ -119,8 +236,18 @@ class SingleRunner:
                     "weights": List[float],
                     "hold_num": int,
                     "stop_profit": float,
-                    "fee_rate": float
+                    "fee_rate": float,
+                    "engine": str,  # 可选，'frame'（默认）或 'panel'
+                    "hold_days": int,  # 可选，最短持有天数，默认1
+                    "rebalance_every": int,  # 可选，调仓间隔（交易日），默认1
+                    "backend": str,  # 可选，'numpy'（默认）或 'jit'
+                    "normalize": str  # 可选，评分因子的截面变换，'raw'（默认）、'rank'、
+                                      # 'pct_rank'、'zscore' 或 'winsorized_zscore'
                 }
+            trade_log: 持仓和交易记录的返回方式，'none' 不返回（positions、trades 为空），
+                'records' 返回 {日期: [代码]} 和交易记录列表，'columnar' 额外返回
+                紧凑的列式结构 trade_log（见 TradeLog.to_columnar，含买入价和持有天数，
+                可还原 records 的全部内容）
         
         Returns:
             Dict[str, Any]: 回测结果，包含策略配置和指标
@@ -130,17 +257,14 @@ class SingleRunner:
             logger.info(f"Strategy: {strategy}")
             
             # 检查数据集的日期范围
-            data_start = self.cb_data.index.get_level_values('trade_date').min()
-            data_end = self.cb_data.index.get_level_values('trade_date').max()
+            data_start, data_end = self._date_bounds()
             
             logger.info(f"Data date range: {data_start} to {data_end}")
             logger.info(f"Request date range: {start_date} to {end_date}")
             
-            # 确保日期格式一致进行比较
-            start_date = pd.to_datetime(start_date).strftime('%Y%m%d')
-            end_date = pd.to_datetime(end_date).strftime('%Y%m%d')
-            data_start = pd.to_datetime(data_start).strftime('%Y%m%d')
-            data_end = pd.to_datetime(data_end).strftime('%Y%m%d')
+            # 统一转换为 YYYYMMDD 整数进行比较
+            start_date = to_int_date(start_date)
+            end_date = to_int_date(end_date)
             
             if start_date < data_start:
                 logger.warning(f"Requested start_date {start_date} is earlier than available data start date {data_start}")
@@ -170,19 +294,43 @@ class SingleRunner:
                 logger.warning(f"Requested end_date {end_date} is later than available data end date {data_end}, will use {data_end} instead")
                 end_date = data_end
             
-            # 使用索引级别进行日期过滤
-            filtered_data = self.cb_data[
-                (self.cb_data.index.get_level_values('trade_date') >= start_date) & 
-                (self.cb_data.index.get_level_values('trade_date') <= end_date)
-            ].copy()
+            filtered_data = self._select_dates(start_date, end_date)
             
+            # 数据中没有的注册因子在全量数据上计算（保证滚动窗口有完整历史）后截取区间
+            lo, hi = self._row_range(start_date, end_date)
+            for name in strategy_factors(strategy):
+                if not self._has_column(name):
+                    filtered_data[name] = self._column(name)[lo:hi]
+            
+            # 评分因子中的截面变换列（如 bond_prem_score）在全量数据上批量计算后截取区间；
+            # 截面变换只依赖同一交易日的数据，与先截取再计算的结果相同
+            transforms = [name for name in dict.fromkeys(strategy['score_factors']) if self._is_transform(name)]
+            full_transforms = self._transforms(transforms, strategy['exclude_conditions']) if transforms else {}
+            for name, values in full_transforms.items():
+                filtered_data[name] = values[lo:hi]
+            
+            # 评分因子的截面标准化同样在全量数据上按 (排除条件, 因子, 变换) 缓存
+            normalize = strategy.get('normalize') or 'raw'
+            normalized = None
+            if normalize != 'raw':
+                factors = list(dict.fromkeys(strategy['score_factors']))
+                values = get_transform_cache().transform(
+                    self._version,
+                    [(factor, Transform(normalize, filtered=True)) for factor in factors],
+                    lambda name: full_transforms[name] if name in full_transforms else self._column(name),
+                    self.factors.date_idx,
+                    self.factors.code_idx,
+                    conditions=strategy['exclude_conditions'],
+                    exclusion=lambda: self._exclusion(strategy['exclude_conditions'])
+                )
+                normalized = {factor: full[lo:hi] for factor, full in zip(factors, values)}
+            
+            index_dates = self.index_data.index.get_level_values('trade_date')
             filtered_index_data = self.index_data[
-                (self.index_data.index.get_level_values('trade_date') >= start_date) & 
-                (self.index_data.index.get_level_values('trade_date') <= end_date)
+                (index_dates >= start_date) & (index_dates <= end_date)
             ].copy()
             
             logger.info(f"Filtered data shape: {filtered_data.shape}")
-            logger.info(f"Filtered date range: {filtered_data.index.get_level_values('trade_date').min()} to {filtered_data.index.get_level_values('trade_date').max()}")
             logger.info(f"Filtered index data shape: {filtered_index_data.shape}")
             
             if filtered_data.empty:
@@ -210,18 +358,35 @@ class SingleRunner:
                 score_factors=strategy['score_factors'],
                 weights=strategy['weights'],
                 hold_num=strategy['hold_num'],
+                hold_days=strategy.get('hold_days') or 1,
+                rebalance_every=strategy.get('rebalance_every') or 1,
                 stop_profit=strategy['stop_profit'],
-                fee_rate=strategy['fee_rate']
+                fee_rate=strategy['fee_rate'],
+                engine=strategy.get('engine') or 'frame',
+                full_rank=False,  # 模拟只需要每日前N名
+                next_day=self._next_day(start_date, end_date),
+                filter_mask=self._filter_mask(strategy['exclude_conditions'], start_date, end_date),
+                normalize=normalize,
+                normalized=normalized,
+                copy=False  # filtered_data 已是本次回测独占的副本
             )
             
             # 运行回测
-            results = backtester.run()
+            results = backtester.run(backend=strategy.get('backend') or 'numpy')
             logger.info(f"Backtest results shape: {results.shape if results is not None else 'None'}")
             
             # 评估性能
             metrics = evaluate_performance(results)
             logger.info(f"Performance metrics: {metrics}")
             
+            # 持仓和交易记录只在请求时转换
+            extra = {}
+            if trade_log == 'records':
+                metrics["positions"] = backtester.trade_log.positions()
+                metrics["trades"] = backtester.trade_log.trades()
+            elif trade_log == 'columnar':
+                extra["trade_log"] = backtester.trade_log.to_columnar()
+            
             return {
                 "strategy": strategy,
                 "metrics": {
@@ -239,7 +404,8 @@ class SingleRunner:
                 },
                 "daily_returns": metrics["daily_returns"],
                 "positions": metrics["positions"],
-                "trades": metrics["trades"]
+                "trades": metrics["trades"],
+                **extra
             }
             
         except Exception as e:
@@ -0,0 +1,295 @@
+# store.py - 内存映射的列式面板存储
+
+import os
+import json
+import shutil
+import tempfile
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from .dataset import Dataset, dataset_version, file_fingerprint, load_dataset
+from .panel import NEXT_DAY_COLUMNS, Panel
+from ..utils.date import to_int_date, to_int_dates
+
+logger = logging.getLogger(__name__)
+
+META_FILE = 'meta.json'
+INDEX_FILE = 'index.pq'
+
+# 版本目录名：<存储目录名>.v-<数据版本>-<随机后缀>，存储目录本身是指向当前版本的符号链接
+VERSION_INFIX = '.v-'
+
+
+def _swap_link(directory: str, target: str) -> None:
+    """原子地将 directory 符号链接指向 target，并删除更早的版本目录
+
+    旧格式的存储（directory 为普通目录）先移开再建立链接，只在首次迁移时
+    存在短暂的不可读窗口。
+    """
+    parent, name = os.path.split(directory)
+    previous = os.path.realpath(directory) if os.path.islink(directory) else None
+
+    link = f"{directory}.link-{os.getpid()}"
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.path.basename(target), link)
+
+    legacy = None
+    if os.path.isdir(directory) and not os.path.islink(directory):
+        legacy = f"{directory}.old-{os.getpid()}"
+        os.rename(directory, legacy)
+    os.replace(link, directory)
+
+    if legacy is not None:
+        shutil.rmtree(legacy, ignore_errors=True)
+    keep = {os.path.realpath(target), previous}
+    for entry in os.listdir(parent):
+        path = os.path.join(parent, entry)
+        if entry.startswith(f"{name}{VERSION_INFIX}") and os.path.realpath(path) not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _row_panel(date_values: np.ndarray, code_labels: np.ndarray, date_idx: np.ndarray, code_idx: np.ndarray) -> Panel:
+    """按行的交易日/代码序号构造只含布局的面板，用于行与面板之间的转换"""
+    valid = np.zeros((len(date_values), len(code_labels)), dtype=bool)
+    valid[date_idx, code_idx] = True
+    return Panel(date_values, code_labels, {}, valid, date_idx, code_idx)
+
+
+class PanelStore:
+    """列式面板存储
+
+    每列一个连续的 NumPy 数组文件，行按 (trade_date, code) 排序，另存
+    code/date 序号数组、日期分段偏移和各行的次日行情。通过 np.load(mmap_mode='r') 打开后，
+    各 gunicorn 工作进程共享操作系统页缓存中的同一份数据，按日期区间取数只是
+    对数组做连续切片。
+    """
+
+    def __init__(self,
+                 directory: str,
+                 meta: Dict,
+                 arrays: Dict[str, np.ndarray],
+                 index_data: pd.DataFrame,
+                 next_day: Optional[Dict[str, np.ndarray]] = None):
+        self.directory = directory
+        self.meta = meta
+        self.version = meta['version']
+        self.columns: List[str] = [col['name'] for col in meta['columns']]
+        self.code_labels = np.asarray(meta['codes'], dtype=object)
+        self.date_values = arrays['__date_values__']
+        self.date_offsets = arrays['__date_offsets__']
+        self.code_idx = arrays['__code_idx__']
+        self.date_idx = arrays['__date_idx__']
+        self.index_data = index_data
+        # 每行同一代码下一交易日的开盘价、最高价、收盘价和涨跌幅（构建时写入的只读映射）
+        self.next_day = next_day or {}
+        self._arrays = arrays
+
+    @classmethod
+    def build(cls, dataset: Dataset, directory: str) -> 'PanelStore':
+        """将数据集写入存储目录并打开
+
+        数据写入带版本号的新目录，写完后用 os.replace 原子地把 directory 符号
+        链接指向新目录：读取方看到的要么是完整的旧存储，要么是完整的新存储。
+        上一版本目录保留（可能有进程正在打开），更早的版本目录随后删除；已映射
+        旧文件的进程不受影响。
+
+        Args:
+            dataset: 已加载的数据集
+            directory: 存储目录
+
+        Returns:
+            PanelStore: 以只读内存映射方式打开的存储
+        """
+        directory = os.path.abspath(directory)
+        parent, name = os.path.split(directory)
+        os.makedirs(parent, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=f"{name}{VERSION_INFIX}{dataset.version}-", dir=parent)
+
+        df = dataset.cb_data
+        date_int = to_int_dates(df.index.get_level_values('trade_date'))
+        code_idx, code_labels = pd.factorize(df.index.get_level_values('code'), sort=True)
+        code_idx = code_idx.astype(np.int32)
+
+        # 按 (trade_date, code) 排序，使任意日期区间对应连续行
+        order = np.lexsort((code_idx, date_int))
+        date_int = date_int[order]
+        code_idx = code_idx[order]
+        date_values, date_idx, counts = np.unique(date_int, return_inverse=True, return_counts=True)
+        date_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        np.save(os.path.join(tmp_dir, '__date_values__.npy'), date_values.astype(np.int32))
+        np.save(os.path.join(tmp_dir, '__date_offsets__.npy'), date_offsets)
+        np.save(os.path.join(tmp_dir, '__code_idx__.npy'), code_idx)
+        np.save(os.path.join(tmp_dir, '__date_idx__.npy'), date_idx.astype(np.int32))
+
+        columns = []
+        for name in df.columns:
+            values = df[name].to_numpy()[order]
+            column = {'name': name, 'file': f"col_{len(columns)}.npy"}
+            if values.dtype.kind in 'biuf':
+                column['kind'] = 'numeric'
+            elif values.dtype.kind == 'M':
+                column['kind'] = 'datetime'
+                values = values.astype('datetime64[ns]').view(np.int64)
+            else:
+                column['kind'] = 'category'
+                cat_codes, categories = pd.factorize(values)
+                column['categories'] = categories.tolist()
+                values = cat_codes.astype(np.int32)
+            np.save(os.path.join(tmp_dir, column['file']), np.ascontiguousarray(values))
+            columns.append(column)
+
+        # 次日行情也预先计算写入，各工作进程只需映射，不再各自计算
+        next_day = {}
+        names = [name for name in NEXT_DAY_COLUMNS if name in df.columns]
+        if names:
+            panel = _row_panel(date_values, np.asarray(code_labels, dtype=object), date_idx, code_idx)
+            for name in names:
+                values = panel.to_rows(panel.next_day(panel.from_rows(df[name].to_numpy(dtype=float)[order])))
+                next_day[name] = f"next_{len(next_day)}.npy"
+                np.save(os.path.join(tmp_dir, next_day[name]), np.ascontiguousarray(values))
+
+        dataset.index_data.to_parquet(os.path.join(tmp_dir, INDEX_FILE))
+
+        meta = {
+            'version': dataset.version,
+            'rows': int(len(order)),
+            'codes': [str(code) for code in code_labels],
+            'columns': columns,
+            'next_day': next_day,
+        }
+        with open(os.path.join(tmp_dir, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+        _swap_link(directory, tmp_dir)
+        logger.info(f"Built panel store {dataset.version} at {directory} ({len(order)} rows)")
+
+        return cls.open(directory)
+
+    @classmethod
+    def open(cls, directory: str) -> 'PanelStore':
+        """以只读内存映射方式打开存储目录
+
+        directory 为符号链接时先解析到其指向的版本目录，之后的文件都从该目录读取，
+        打开过程中存储被重建也不会混读两个版本。
+        """
+        directory = os.path.realpath(directory)
+        with open(os.path.join(directory, META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+
+        arrays = {}
+        for name in ['__date_values__', '__date_offsets__', '__code_idx__', '__date_idx__']:
+            arrays[name] = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')
+        for column in meta['columns']:
+            arrays[column['name']] = np.load(os.path.join(directory, column['file']), mmap_mode='r')
+
+        next_day = {
+            name: np.load(os.path.join(directory, file), mmap_mode='r')
+            for name, file in meta.get('next_day', {}).items()
+        }
+
+        index_data = pd.read_parquet(os.path.join(directory, INDEX_FILE))
+        return cls(directory, meta, arrays, index_data, next_day)
+
+    def date_bounds(self) -> Tuple[int, int]:
+        """返回存储中的首末交易日（YYYYMMDD 整数）"""
+        return int(self.date_values[0]), int(self.date_values[-1])
+
+    def row_range(self, start_date=None, end_date=None) -> Tuple[int, int]:
+        """返回 [start_date, end_date] 区间对应的行范围 [lo, hi)"""
+        lo_date = 0 if start_date is None else np.searchsorted(self.date_values, to_int_date(start_date), side='left')
+        hi_date = len(self.date_values) if end_date is None else np.searchsorted(self.date_values, to_int_date(end_date), side='right')
+        return int(self.date_offsets[lo_date]), int(self.date_offsets[hi_date])
+
+    def column(self, name: str) -> np.ndarray:
+        """返回整列的只读数组（分类列为整数编码）"""
+        return self._arrays[name]
+
+    def values(self, name: str, lo: int = 0, hi: Optional[int] = None) -> np.ndarray:
+        """返回 [lo, hi) 行的列值，日期列和分类列还原为原始类型"""
+        meta = next((column for column in self.meta['columns'] if column['name'] == name), None)
+        if meta is None:
+            raise KeyError(name)
+        values = self._arrays[name][lo:hi]
+        if meta['kind'] == 'datetime':
+            values = np.asarray(values).view('datetime64[ns]')
+        elif meta['kind'] == 'category':
+            values = pd.Categorical.from_codes(values, categories=meta['categories'])
+        return values
+
+    def slice_frame(self,
+                    start_date=None,
+                    end_date=None,
+                    columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """将日期区间内的数据物化为 MultiIndex (code, trade_date) DataFrame
+
+        Args:
+            start_date: 开始日期（YYYYMMDD 整数或日期字符串），None 表示不限
+            end_date: 结束日期（YYYYMMDD 整数或日期字符串），None 表示不限
+            columns: 需要的列，None 表示全部
+
+        Returns:
+            pd.DataFrame: 区间数据的独立副本，可被调用方修改
+        """
+        lo, hi = self.row_range(start_date, end_date)
+        date_idx = self.date_idx[lo:hi]
+        first = int(date_idx[0]) if hi > lo else 0
+        last = int(date_idx[-1]) + 1 if hi > lo else 0
+
+        index = pd.MultiIndex(
+            levels=[pd.Index(self.code_labels), pd.Index(self.date_values[first:last])],
+            codes=[self.code_idx[lo:hi], date_idx - first],
+            names=['code', 'trade_date']
+        )
+
+        wanted = set(columns) if columns is not None else None
+        data = {
+            column['name']: self.values(column['name'], lo, hi)
+            for column in self.meta['columns']
+            if wanted is None or column['name'] in wanted
+        }
+
+        return pd.DataFrame(data, index=index, copy=True)
+
+
+def ensure_store(cb_data_path: str, index_data_path: str, directory: str) -> PanelStore:
+    """确保存储目录与数据文件版本一致，必要时重新构建
+
+    供 gunicorn 主进程在 fork 工作进程前调用，数据只构建一次。
+
+    Args:
+        cb_data_path: 可转债数据文件路径
+        index_data_path: 指数数据文件路径
+        directory: 存储目录
+
+    Returns:
+        PanelStore: 当前版本的存储
+    """
+    version = dataset_version(cb_data_path, index_data_path)
+    meta_path = os.path.join(directory, META_FILE)
+    if os.path.exists(meta_path):
+        with open(meta_path, encoding='utf-8') as f:
+            if json.load(f).get('version') == version:
+                return PanelStore.open(directory)
+    return PanelStore.build(load_dataset(cb_data_path, index_data_path), directory)
+
+
+_stores: Dict[str, Tuple[Tuple[str, int, int], PanelStore]] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(directory: str) -> PanelStore:
+    """获取进程内缓存的存储，存储被重建（链接指向新的版本目录）后重新打开"""
+    directory = os.path.abspath(directory)
+    target = os.path.realpath(directory)
+    fingerprint = file_fingerprint(os.path.join(target, META_FILE))
+    with _stores_lock:
+        cached = _stores.get(directory)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+        store = PanelStore.open(target)
+        _stores[directory] = (fingerprint, store)
+        return store
@@ -0,0 +1,189 @@
+# trade_log.py - 列式持仓与交易记录
+
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from .selection import Selection
+from ..utils.date import int_dates_to_datetime
+
+# 交易方向
+BUY = 1
+SELL = -1
+
+
+def _format_dates(dates: np.ndarray) -> List[str]:
+    """将交易日格式化为 YYYY-MM-DD 字符串"""
+    dates = np.asarray(dates)
+    index = int_dates_to_datetime(dates) if dates.dtype.kind in 'iu' else pd.to_datetime(dates)
+    return list(index.strftime('%Y-%m-%d'))
+
+
+class TradeLog:
+    """列式交易记录
+
+    每日持仓沿用 Selection 的 CSR 结构；买卖事件保存在预先分配的定长数组中，
+    每个事件一行。只有在调用 positions()/trades()/to_columnar() 时才转换为
+    API 需要的结构。
+
+    以收盘价买入，卖出价为持仓最后一日的收盘价按当日持有收益（含止盈）
+    折算的价格，卖出记录的收益为整个持有期的累计收益，并记录该段持仓的
+    买入价、持有天数以及是否因次日盘中止盈卖出。卖出日没有行情时价格为 NaN
+    （转换为 API 结构时为 None）。
+
+    Attributes:
+        selection: 每日持仓
+        date_idx: 事件所在交易日序号
+        code_idx: 事件代码序号
+        side: 方向，BUY(1) 或 SELL(-1)
+        price: 成交价格
+        returns: 卖出事件的持有期收益，买入事件为 NaN
+        entry_price: 卖出事件对应的买入价格，买入事件为 NaN
+        hold_days: 卖出事件的持有天数（持仓的交易日数），买入事件为 0
+        stop_hit: 卖出事件是否由止盈触发（持仓最后一日次日盘中达到止盈价），买入事件为 False
+    """
+
+    def __init__(self,
+                 selection: Selection,
+                 date_idx: np.ndarray,
+                 code_idx: np.ndarray,
+                 side: np.ndarray,
+                 price: np.ndarray,
+                 returns: np.ndarray,
+                 entry_price: np.ndarray,
+                 hold_days: np.ndarray,
+                 stop_hit: np.ndarray):
+        self.selection = selection
+        self.date_idx = date_idx
+        self.code_idx = code_idx
+        self.side = side
+        self.price = price
+        self.returns = returns
+        self.entry_price = entry_price
+        self.hold_days = hold_days
+        self.stop_hit = stop_hit
+
+    @classmethod
+    def from_selection(cls,
+                       selection: Selection,
+                       close: np.ndarray,
+                       trade_returns: np.ndarray,
+                       stop_hit: Optional[np.ndarray] = None) -> 'TradeLog':
+        """由每日持仓生成买卖记录
+
+        Args:
+            selection: 每日持仓
+            close: 原始长表每行的收盘价
+            trade_returns: 与 selection.rows 一一对应的每笔持仓次日收益
+            stop_hit: 与 selection.rows 一一对应的止盈标记，None 表示均未止盈
+
+        Returns:
+            TradeLog: 交易记录
+        """
+        date_pos = selection.date_pos
+        entered = ~selection.held_on(-1)
+
+        # 按 (代码, 交易日) 排序后，每段连续持有从买入记录开始
+        order = np.lexsort((date_pos, selection.code_idx))
+        starts = np.flatnonzero(entered[order])
+        ends = np.append(starts[1:], len(order)) - 1
+        growth = 1 + np.nan_to_num(trade_returns[order], nan=0.0)
+        spell_returns = np.multiply.reduceat(growth, starts) - 1 if len(starts) else np.zeros(0)
+
+        # 最后一个交易日仍持有的仓位没有卖出记录
+        last = order[ends]
+        closed = date_pos[last] + 1 < len(selection)
+        last = last[closed]
+        spell_first = order[starts][closed]
+        spell_days = (ends - starts + 1)[closed]
+        first = np.flatnonzero(entered)
+
+        n_buys, n_sells = len(first), len(last)
+        date_idx = np.empty(n_buys + n_sells, dtype=np.int32)
+        code_idx = np.empty(n_buys + n_sells, dtype=np.int32)
+        side = np.empty(n_buys + n_sells, dtype=np.int8)
+        price = np.empty(n_buys + n_sells, dtype=np.float64)
+        returns = np.full(n_buys + n_sells, np.nan)
+        entry_price = np.full(n_buys + n_sells, np.nan)
+        hold_days = np.zeros(n_buys + n_sells, dtype=np.int32)
+        stopped = np.zeros(n_buys + n_sells, dtype=bool)
+
+        date_idx[:n_buys] = date_pos[first]
+        code_idx[:n_buys] = selection.code_idx[first]
+        side[:n_buys] = BUY
+        price[:n_buys] = close[selection.rows[first]]
+
+        date_idx[n_buys:] = date_pos[last] + 1
+        code_idx[n_buys:] = selection.code_idx[last]
+        side[n_buys:] = SELL
+        price[n_buys:] = close[selection.rows[last]] * (1 + trade_returns[last])
+        returns[n_buys:] = spell_returns[closed]
+        entry_price[n_buys:] = close[selection.rows[spell_first]]
+        hold_days[n_buys:] = spell_days
+        if stop_hit is not None:
+            stopped[n_buys:] = stop_hit[last]
+
+        # 按交易日排序，同一日先卖后买
+        event_order = np.lexsort((code_idx, side, date_idx))
+        return cls(selection, date_idx[event_order], code_idx[event_order], side[event_order],
+                   price[event_order], returns[event_order], entry_price[event_order], hold_days[event_order],
+                   stopped[event_order])
+
+    def __len__(self) -> int:
+        return len(self.side)
+
+    def positions(self) -> Dict[str, List[str]]:
+        """每日持仓 {日期: [代码, ...]}"""
+        selection = self.selection
+        return {
+            date: selection.codes_on(i).tolist()
+            for i, date in enumerate(_format_dates(selection.dates))
+        }
+
+    def trades(self) -> List[Dict[str, Any]]:
+        """交易记录列表，每条包含 date、code、side、price、return、entry_price、hold_days、stop_hit
+
+        return、entry_price、hold_days、stop_hit 只有卖出记录有值，买入记录为 None。
+        """
+        dates = _format_dates(self.selection.dates)
+        codes = self.selection.codes
+        return [
+            {
+                'date': dates[d],
+                'code': str(codes[c]),
+                'side': 'buy' if s == BUY else 'sell',
+                'price': None if np.isnan(p) else float(p),
+                'return': None if np.isnan(r) else float(r),
+                'entry_price': None if np.isnan(e) else float(e),
+                'hold_days': None if s == BUY else int(h),
+                'stop_hit': None if s == BUY else bool(t),
+            }
+            for d, c, s, p, r, e, h, t in zip(self.date_idx.tolist(), self.code_idx.tolist(), self.side.tolist(),
+                                              self.price.tolist(), self.returns.tolist(), self.entry_price.tolist(),
+                                              self.hold_days.tolist(), self.stop_hit.tolist())
+        ]
+
+    def to_columnar(self) -> Dict[str, Any]:
+        """紧凑的列式结构：日期和代码只出现一次，持仓和交易均以序号表示
+
+        positions 为每日持仓的 CSR 结构（offsets、code_idx），trades 各列与
+        trades() 的字段一一对应，可据此还原 positions() 和 trades()。
+        """
+        selection = self.selection
+        return {
+            'dates': _format_dates(selection.dates),
+            'codes': [str(code) for code in selection.codes],
+            'positions': {
+                'offsets': selection.offsets.tolist(),
+                'code_idx': selection.code_idx.tolist(),
+            },
+            'trades': {
+                'date_idx': self.date_idx.tolist(),
+                'code_idx': self.code_idx.tolist(),
+                'side': self.side.tolist(),
+                'price': [None if np.isnan(p) else p for p in self.price.tolist()],
+                'return': [None if np.isnan(r) else r for r in self.returns.tolist()],
+                'entry_price': [None if np.isnan(e) else e for e in self.entry_price.tolist()],
+                'hold_days': [None if s == BUY else h for s, h in zip(self.side.tolist(), self.hold_days.tolist())],
+                'stop_hit': [None if s == BUY else t for s, t in zip(self.side.tolist(), self.stop_hit.tolist())],
+            },
+        }
@@ -0,0 +1,315 @@
+# transforms.py - 按交易日的截面变换（排名、百分位、标准分）及其缓存
+
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from .expr import normalize_condition
+
+logger = logging.getLogger(__name__)
+
+# 默认内存上限 256MB
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# 一次批量排序展开的稠密数组上限，超过时按列分批
+BATCH_BYTES = 64 * 1024 * 1024
+
+# winsorized_zscore 的截断阈值（标准差倍数）
+WINSOR_LIMIT = 3.0
+
+
+@dataclass(frozen=True)
+class Transform:
+    """截面变换定义
+
+    Attributes:
+        method: 'rank'（并列取平均名次，1 为第一名）、'pct_rank'（名次 / 当日有效
+            个数）、'zscore'（减当日均值后除以标准差，ddof=1）或 'winsorized_zscore'
+            （标准分截断到 ±WINSOR_LIMIT）
+        ascending: 排名方向，False 时最大值为第一名；标准分忽略该参数
+        filtered: 是否只在未被排除条件过滤的转债中计算，被过滤的行结果为 NaN
+    """
+    method: str
+    ascending: bool = True
+    filtered: bool = False
+
+
+METHODS = ('rank', 'pct_rank', 'zscore', 'winsorized_zscore')
+
+# 策略 normalize 选项：评分前对各评分因子做的截面变换，raw 表示不变换
+NORMALIZE_METHODS = ('raw',) + METHODS
+
+# 策略中可直接引用的截面变换列：原始列名 + 后缀
+# *_score 与 search_strategy.py 一致：未过滤转债中按降序的名次
+TRANSFORM_SUFFIXES: Dict[str, Transform] = {
+    '_score': Transform('rank', ascending=False, filtered=True),
+    '_pct': Transform('pct_rank'),
+    '_zscore': Transform('zscore', filtered=True),
+}
+
+
+def parse_transform(name: str) -> Optional[Tuple[str, Transform]]:
+    """解析截面变换列名，返回 (原始列名, 变换)，不是变换列名时返回 None"""
+    for suffix, transform in TRANSFORM_SUFFIXES.items():
+        if name.endswith(suffix) and len(name) > len(suffix):
+            return name[:-len(suffix)], transform
+    return None
+
+
+def transform_inputs(names: Iterable[str]) -> Set[str]:
+    """返回列名以及其中截面变换列（逐层）依赖的原始列名"""
+    result = set()
+    for name in names:
+        while name not in result:
+            result.add(name)
+            parsed = parse_transform(name)
+            if parsed is None:
+                break
+            name = parsed[0]
+    return result
+
+
+def _ranks(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """沿最后一维计算升序平均名次（NaN 不参与排名）和有效个数"""
+    order = np.argsort(values, axis=-1, kind='stable')
+    ordered = np.take_along_axis(values, order, axis=-1)
+    n = values.shape[-1]
+    position = np.broadcast_to(np.arange(n), ordered.shape)
+
+    # 并列区间的首末位置：值变化处开始新区间（NaN 彼此不等，结果随后置为 NaN）
+    starts = np.ones(ordered.shape, dtype=bool)
+    starts[..., 1:] = ordered[..., 1:] != ordered[..., :-1]
+    ends = np.ones(ordered.shape, dtype=bool)
+    ends[..., :-1] = starts[..., 1:]
+    first = np.maximum.accumulate(np.where(starts, position, 0), axis=-1)
+    last = np.minimum.accumulate(np.where(ends, position, n - 1)[..., ::-1], axis=-1)[..., ::-1]
+
+    ordered_ranks = (first + last) / 2 + 1
+    ordered_ranks[np.isnan(ordered)] = np.nan
+    ranks = np.empty_like(ordered_ranks)
+    np.put_along_axis(ranks, order, ordered_ranks, axis=-1)
+    counts = (~np.isnan(values)).sum(axis=-1, keepdims=True)
+    return ranks, counts
+
+
+def _transform_dense(values: np.ndarray, transform: Transform) -> np.ndarray:
+    """在 (列数, 交易日数, 转债数) 稠密数组上沿转债维度做截面变换"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if transform.method in ('zscore', 'winsorized_zscore'):
+            valid = ~np.isnan(values)
+            counts = valid.sum(axis=-1, keepdims=True)
+            mean = np.where(valid, values, 0).sum(axis=-1, keepdims=True) / counts
+            centered = values - mean
+            var = np.where(valid, centered ** 2, 0).sum(axis=-1, keepdims=True) / (counts - 1)
+            zscore = centered / np.sqrt(var)
+            if transform.method == 'winsorized_zscore':
+                zscore = np.clip(zscore, -WINSOR_LIMIT, WINSOR_LIMIT)
+            return zscore
+
+        ranks, counts = _ranks(values)
+        if not transform.ascending:
+            ranks = counts + 1 - ranks
+        if transform.method == 'pct_rank':
+            ranks = ranks / counts
+        return ranks
+
+
+def dense_transform(values: np.ndarray, transform: Transform, exclude: Optional[np.ndarray] = None) -> np.ndarray:
+    """在 (交易日数, 转债数) 或 (列数, 交易日数, 转债数) 面板上做截面变换
+
+    Args:
+        values: 面板数组，缺失位置为 NaN
+        transform: 截面变换
+        exclude: (交易日数, 转债数) 排除掩码，True 的位置不参与计算且结果为 NaN
+
+    Returns:
+        np.ndarray: 与 values 形状相同的变换结果
+    """
+    if transform.method not in METHODS:
+        raise ValueError(f"Unknown transform method: {transform.method}")
+    values = np.asarray(values, dtype=float)
+    if exclude is not None:
+        values = np.where(exclude, np.nan, values)
+    if values.size == 0:
+        return values.copy()
+    return _transform_dense(values, transform)
+
+
+def cross_sectional(values: np.ndarray,
+                    date_idx: np.ndarray,
+                    code_idx: np.ndarray,
+                    transform: Transform,
+                    exclude: Optional[np.ndarray] = None) -> np.ndarray:
+    """批量计算多列的按交易日截面变换
+
+    各列按 (交易日, 代码) 展开为稠密数组后沿代码维度整块排序，所有交易日在一次
+    排序中完成，不再逐列逐日 groupby。
+
+    Args:
+        values: 形状为 (列数, 行数) 或 (行数,) 的数组，与数据行一一对应
+        date_idx: 每行的交易日序号
+        code_idx: 每行的代码序号
+        transform: 截面变换
+        exclude: 排除掩码，True 的行不参与计算且结果为 NaN；None 表示全部参与
+
+    Returns:
+        np.ndarray: 与 values 形状相同的变换结果，缺失值保持 NaN
+    """
+    if transform.method not in METHODS:
+        raise ValueError(f"Unknown transform method: {transform.method}")
+    values = np.asarray(values, dtype=float)
+    stacked = np.atleast_2d(values)
+    if exclude is not None:
+        stacked = np.where(exclude, np.nan, stacked)
+    result = np.full(stacked.shape, np.nan)
+    if stacked.shape[1] == 0:
+        return result.reshape(values.shape)
+
+    shape = (int(date_idx.max()) + 1, int(code_idx.max()) + 1)
+    step = max(1, BATCH_BYTES // (8 * shape[0] * shape[1]))
+    for lo in range(0, len(stacked), step):
+        chunk = stacked[lo:lo + step]
+        dense = np.full((len(chunk),) + shape, np.nan)
+        dense[:, date_idx, code_idx] = chunk
+        result[lo:lo + step] = _transform_dense(dense, transform)[:, date_idx, code_idx]
+    return result.reshape(values.shape)
+
+
+class TransformCache:
+    """截面变换结果的 LRU 缓存
+
+    按 (数据版本, 条件集合, 原始列名, 变换) 缓存覆盖全部行的结果，不受排除条件
+    影响的变换（filtered=False）与条件无关。截面变换只依赖同一交易日的数据，
+    调用方按日期区间的行范围截取即可。总字节数超过上限时淘汰最久未使用的项。
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Tuple, np.ndarray]' = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        """当前缓存占用的字节数"""
+        return self._nbytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get(self, key: Tuple) -> Optional[np.ndarray]:
+        with self._lock:
+            values = self._entries.get(key)
+            if values is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return values
+
+    def _put(self, key: Tuple, values: np.ndarray):
+        if values.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._nbytes -= old.nbytes
+            self._entries[key] = values
+            self._nbytes += values.nbytes
+            self._evict()
+
+    def _evict(self):
+        while self._nbytes > self.max_bytes and self._entries:
+            _, values = self._entries.popitem(last=False)
+            self._nbytes -= values.nbytes
+
+    def resize(self, max_bytes: int):
+        """调整内存上限，超出部分立即淘汰"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def transform(self,
+                  version: str,
+                  items: Iterable[Tuple[str, Transform]],
+                  column: Callable[[str], np.ndarray],
+                  date_idx: np.ndarray,
+                  code_idx: np.ndarray,
+                  conditions: Iterable[str] = (),
+                  exclusion: Optional[Callable[[], np.ndarray]] = None) -> List[np.ndarray]:
+        """返回一组截面变换的结果
+
+        未命中的项按变换分组，每组在一次批量排序中计算。
+
+        Args:
+            version: 数据版本（Dataset.version 或 PanelStore.version）
+            items: (原始列名, 变换) 列表
+            column: 按列名返回整列数组的函数，仅在未命中时调用
+            date_idx: 每行的交易日序号
+            code_idx: 每行的代码序号
+            conditions: 排除条件，只影响 filtered 变换的缓存键
+            exclusion: 返回 conditions 合并后整列排除掩码的函数，仅在 filtered
+                变换未命中时调用
+
+        Returns:
+            List[np.ndarray]: 与 items 一一对应的只读数组
+        """
+        items = list(items)
+        filter_key = tuple(sorted({normalize_condition(condition) for condition in conditions}))
+        keys = [(version, filter_key if transform.filtered else None, name, transform) for name, transform in items]
+
+        results = [self._get(key) for key in keys]
+        pending: Dict[Transform, List[int]] = {}
+        for i, values in enumerate(results):
+            if values is None:
+                pending.setdefault(items[i][1], []).append(i)
+
+        exclude = None
+        for transform, positions in pending.items():
+            if transform.filtered and exclude is None:
+                exclude = exclusion() if exclusion is not None else np.zeros(len(date_idx), dtype=bool)
+            names = list(dict.fromkeys(items[i][0] for i in positions))
+            computed = cross_sectional(
+                np.stack([np.asarray(column(name), dtype=float) for name in names]),
+                date_idx, code_idx, transform,
+                exclude=exclude if transform.filtered else None
+            )
+            for name, values in zip(names, computed):
+                values = values.copy()
+                values.setflags(write=False)
+                for i in positions:
+                    if items[i][0] == name:
+                        results[i] = values
+                        self._put(keys[i], values)
+            logger.info(f"Computed {transform.method} transform of {len(names)} columns")
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        """命中/未命中次数和内存占用"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'nbytes': self._nbytes,
+            'max_bytes': self.max_bytes,
+        }
+
+    def clear(self):
+        """清空缓存和计数"""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+
+_transform_cache = TransformCache()
+
+
+def get_transform_cache() -> TransformCache:
+    """返回进程级共享的截面变换缓存"""
+    return _transform_cache
@@ -55,14 +55,33 @@ preload_app = True
 user = "www"
 group = "www"
 
+def build_panel_store(server):
+    """按 api/config.yaml 构建列式面板存储，工作进程 fork 后只读映射同一份数据"""
+    import yaml
+    from cb_backtest.core.store import ensure_store
+
+    with open(os.path.join(project_dir, "api", "config.yaml"), "r", encoding='utf-8') as f:
+        data_config = (yaml.safe_load(f) or {}).get('data', {})
+    if not data_config.get('store_dir'):
+        return
+    try:
+        ensure_store(
+            cb_data_path=data_config['cb_data_path'],
+            index_data_path=data_config['index_data_path'],
+            directory=data_config['store_dir']
+        )
+        server.log.info("Panel store ready: %s", data_config['store_dir'])
+    except Exception as e:
+        server.log.error("Failed to build panel store: %s", e)
+
 # 启动前和启动后的钩子
 def on_starting(server):
     """服务启动前执行"""
-    pass
+    build_panel_store(server)
 
 def on_reload(server):
-    """重新加载时执行"""
-    pass
+    """重新加载时执行（数据文件更新后 kill -HUP 即可重建存储）"""
+    build_panel_store(server)
 
 def post_fork(server, worker):
     """Fork 工作进程后执行"""
@@ -0,0 +1,41 @@
+import argparse
+import sys
+from pathlib import Path
+import logging
+
+# 添加父目录到系统路径以导入核心模块
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from cb_backtest.core.partition import partition_dataset
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description='将单个 parquet 数据文件转换为按日期分区的目录')
+    parser.add_argument('src_path', help='源数据文件路径，如 data/cb_data.pq')
+    parser.add_argument('dest_dir', help='输出分区目录，如 data/cb_data')
+    parser.add_argument('--freq', choices=['year', 'month'], default='year', help='分区粒度')
+    parser.add_argument('--row_group_size', type=int, default=20000, help='每个行组的行数')
+
+    args = parser.parse_args()
+
+    try:
+        meta = partition_dataset(
+            src_path=args.src_path,
+            dest_dir=args.dest_dir,
+            freq=args.freq,
+            row_group_size=args.row_group_size
+        )
+        for part in meta['partitions']:
+            logger.info(f"{part['file']}: {part['start_date']} - {part['end_date']}, {part['rows']} rows")
+        logger.info("分区转换完成")
+
+    except Exception as e:
+        logger.error(f"运行出错: {str(e)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
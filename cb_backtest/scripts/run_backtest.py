@@ -6,8 +6,8 @@ import logging
 from typing import Optional
 
 # 添加父目录到系统路径以导入核心模块
-sys.path.append(str(Path(__file__).parent.parent))
-from core import BatchRunner
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from cb_backtest.core import BatchRunner
 
 logging.basicConfig(
     level=logging.INFO,
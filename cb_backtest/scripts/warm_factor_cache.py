@@ -0,0 +1,86 @@
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+import logging
+
+# 添加父目录到系统路径以导入核心模块
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from cb_backtest.core.dataset import load_dataset
+from cb_backtest.core.factor_cache import FactorCache, warm_factor_cache
+from cb_backtest.core.factors import FACTORS, FactorContext, factor_inputs
+from cb_backtest.core.incremental import FactorState, append_trading_day
+from cb_backtest.core.store import get_store
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='预先计算注册因子并写入因子磁盘缓存；数据只追加了一个交易日时增量计算新增的行'
+    )
+    parser.add_argument('cache_dir', help='因子缓存目录，与 api/config.yaml 中的 factor_cache_dir 一致')
+    parser.add_argument('--cb_data_path', help='可转债数据文件路径或分区目录')
+    parser.add_argument('--index_data_path', help='指数数据文件路径或分区目录')
+    parser.add_argument('--store_dir', help='列式面板存储目录，服务使用 store_dir 时按存储版本预热')
+    parser.add_argument('--factors', nargs='*', help='只预热这些因子，默认全部注册因子')
+    parser.add_argument('--max_mb', type=float, default=1024, help='缓存上限（MB）')
+    parser.add_argument('--full', action='store_true', help='忽略增量状态，全量重新计算')
+    parser.add_argument('--workers', type=int, default=1, help='全量计算时的工作进程数，按代码分片并行')
+
+    args = parser.parse_args()
+
+    try:
+        cache = FactorCache(args.cache_dir, int(args.max_mb * 1024 * 1024))
+        if args.store_dir:
+            store = get_store(args.store_dir)
+            version = store.version
+            context = FactorContext(store.code_idx, store.date_idx, store.column, version=version, cache=cache)
+            columns = sorted(factor_inputs(FACTORS))
+            rows = len(store.code_idx)
+            frame = lambda lo=0: store.slice_frame(columns=columns).iloc[lo:]
+        elif args.cb_data_path and args.index_data_path:
+            dataset = load_dataset(args.cb_data_path, args.index_data_path)
+            version = dataset.version
+            context = FactorContext.from_frame(dataset.cb_data, version=version, cache=cache)
+            rows = len(dataset.cb_data)
+            frame = lambda lo=0: dataset.cb_data.iloc[lo:]
+        else:
+            parser.error('需要提供 --store_dir 或 --cb_data_path 与 --index_data_path')
+
+        start_time = time.time()
+        if args.factors:
+            names = warm_factor_cache(context, args.factors, args.workers)
+        else:
+            # 增量状态与缓存放在同一目录，记录上次预热时的数据版本和尾部数据
+            state_dir = os.path.join(args.cache_dir, 'state')
+            state = None if args.full else FactorState.load(state_dir)
+            if state is not None and state.version != version and rows > state.rows:
+                try:
+                    state = append_trading_day(cache, state, frame(state.rows), version)
+                except ValueError as e:
+                    logger.warning(f"无法增量更新，改为全量计算: {str(e)}")
+                    state = None
+            elif state is not None and state.version != version:
+                state = None
+            if state is None:
+                warm_factor_cache(context, workers=args.workers)
+                state = FactorState.from_frame(frame(), version, context=context)
+            state.save(state_dir)
+            names = state.names
+
+        stats = cache.stats()
+        logger.info(f"Warmed {len(names)} factors in {time.time() - start_time:.2f}s "
+                    f"(hits={stats['hits']}, misses={stats['misses']}, nbytes={stats['nbytes']})")
+        logger.info("因子缓存预热完成")
+
+    except Exception as e:
+        logger.error(f"运行出错: {str(e)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
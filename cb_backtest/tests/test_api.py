@@ -0,0 +1,107 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from importlib import import_module
+from unittest import mock
+import pandas as pd
+import numpy as np
+from pydantic import ValidationError
+from ..api.models import BacktestRequest
+
+# api 包导出了同名的 FastAPI 实例，这里取模块本身以替换服务配置
+api = import_module('..api.app', __package__)
+
+class TestApi(unittest.TestCase):
+    def setUp(self):
+        """准备测试数据文件，并让服务配置指向这些文件"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        cb_path = os.path.join(self.tmpdir.name, 'cb_data.pq')
+        index_path = os.path.join(self.tmpdir.name, 'index.pq')
+
+        rng = np.random.default_rng(15)
+        dates = pd.bdate_range('2024-01-01', periods=10)
+        index = pd.MultiIndex.from_product([['123001', '123002', '123003', '123004'], dates], names=['code', 'trade_date'])
+        close = rng.uniform(100, 150, len(index))
+        pd.DataFrame({
+            'close': close,
+            'open': close,
+            'high': close,
+            'low': close,
+            'pct_chg': rng.uniform(-0.05, 0.05, len(index)),
+            'bond_prem': rng.uniform(-0.1, 0.1, len(index)),
+        }, index=index).to_parquet(cb_path)
+        pd.DataFrame({'index_jsl': 1.0}, index=pd.Index(dates, name='trade_date')).to_parquet(index_path)
+
+        self.config = api.config
+        api.config = {'data': {'cb_data_path': cb_path, 'index_data_path': index_path}}
+        self.payload = {
+            'data': {'start_date': '20240102', 'end_date': '20240112'},
+            'strategy': {
+                'exclude_conditions': ['close > 145'],
+                'score_factors': ['bond_prem'],
+                'weights': [1],
+                'hold_num': 2,
+                'stop_profit': 0,
+                'fee_rate': 0.002,
+            },
+        }
+
+    def tearDown(self):
+        api.config = self.config
+        self.tmpdir.cleanup()
+
+    def request(self, **strategy) -> BacktestRequest:
+        return BacktestRequest(**{**self.payload, 'strategy': {**self.payload['strategy'], **strategy}})
+
+    def test_backend_engine(self):
+        """测试 backend/engine 参数的校验，且不同取值的回测结果一致"""
+        for strategy in [{'backend': 'gpu'}, {'engine': 'polars'}]:
+            with self.assertRaises(ValidationError):
+                self.request(**strategy)
+
+        default = asyncio.run(api.run_backtest(self.request()))
+        self.assertTrue(default.success, default.message)
+        self.assertIsNone(default.request.strategy.engine)
+        for strategy in [{'engine': 'panel'}, {'backend': 'numpy', 'engine': 'frame'}]:
+            response = asyncio.run(api.run_backtest(self.request(**strategy)))
+            self.assertTrue(response.success, response.message)
+            self.assertEqual(response.request.strategy.engine, strategy['engine'])
+            self.assertEqual(response.result.daily_returns.keys(), default.result.daily_returns.keys())
+            np.testing.assert_allclose(list(response.result.daily_returns.values()),
+                                       list(default.result.daily_returns.values()))
+
+    def test_lifespan_warms_dataset(self):
+        """测试启动时通过 lifespan 预加载数据集，之后的请求不再读取文件"""
+        async def start():
+            async with api.lifespan(api.app):
+                pass
+
+        self.assertEqual(api.app.router.on_startup, [])
+        asyncio.run(start())
+        with mock.patch('cb_backtest.core.dataset.load_dataset', side_effect=AssertionError('reloaded')):
+            response = asyncio.run(api.run_backtest(self.request()))
+        self.assertTrue(response.success, response.message)
+
+    def test_lifespan_builds_store(self):
+        """测试配置的存储目录不存在时，请求退回数据集缓存，lifespan 预加载时构建存储"""
+        store_dir = os.path.join(self.tmpdir.name, 'panel_store')
+        api.config['data']['store_dir'] = store_dir
+        response = asyncio.run(api.run_backtest(self.request()))
+        self.assertTrue(response.success, response.message)
+        self.assertFalse(os.path.exists(store_dir))
+
+        async def start():
+            async with api.lifespan(api.app):
+                pass
+
+        asyncio.run(start())
+        self.assertTrue(os.path.exists(os.path.join(store_dir, 'meta.json')))
+        with mock.patch('cb_backtest.core.dataset.load_dataset', side_effect=AssertionError('reloaded')), \
+                mock.patch.object(api, 'get_registry', side_effect=AssertionError('registry used')):
+            stored = asyncio.run(api.run_backtest(self.request()))
+        self.assertTrue(stored.success, stored.message)
+        self.assertEqual(stored.result.daily_returns, response.result.daily_returns)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -122,6 +122,29 @@ class TestCBBacktester(unittest.TestCase):
                 actual_ranks = set(date_ranks)
                 self.assertEqual(expected_ranks, actual_ranks)
 
+    def test_compute_score_ties(self):
+        """测试并列得分按 method='min' 排名"""
+        df = self.df.copy()
+        df['bond_prem'] = 0.0
+        df['ytm'] = np.round(df['ytm'], 2)
+        df['turnover_5'] = 0.0
+        df.loc[('123001', '20240101'), 'ytm'] = df.loc[('123002', '20240101'), 'ytm']
+        
+        backtester = CBBacktester(
+            df=df,
+            index_df=self.index_df,
+            score_factors=self.score_factors,
+            weights=self.weights,
+            hold_num=self.hold_num
+        )
+        backtester.apply_filters()
+        backtester.compute_score()
+        
+        for date in df.index.get_level_values('trade_date').unique():
+            date_data = backtester.df.xs(date, level='trade_date')
+            expected = date_data['score'].rank(method='min', ascending=True)
+            pd.testing.assert_series_equal(date_data['rank'], expected, check_names=False)
+
     def test_simulate(self):
         """测试交易模拟"""
         backtester = CBBacktester(
@@ -144,6 +167,76 @@ class TestCBBacktester(unittest.TestCase):
         self.assertTrue(all(results['cost'] >= 0))
         self.assertTrue(all(results['cost'] <= self.fee_rate * 2))  # 最大成本不超过双倍费率
 
+    def test_simulate_missing_next_day(self):
+        """测试选中的转债在下一交易日缺失时不计入组合"""
+        df = self.df.drop(('123001', '20240102'))
+        df.loc[('123001', '20240101'), 'ytm'] = 1.0  # 确保 123001 在首日入选
+        
+        backtester = CBBacktester(
+            df=df,
+            index_df=self.index_df,
+            score_factors=['ytm'],
+            weights=[-1],
+            hold_num=2,
+            stop_profit=0
+        )
+        results = backtester.run()
+        
+        selected = backtester.selection.codes_on(0).tolist()
+        self.assertIn('123001', selected)
+        others = [code for code in selected if code != '123001']
+        expected = df.loc[[(code, '20240102') for code in others], 'pct_chg'].mean()
+        self.assertAlmostEqual(results['time_return'].iloc[0], expected)
+        self.assertAlmostEqual(
+            results['returns'].iloc[0],
+            (1 + expected) * (1 - results['cost'].iloc[0]) - 1
+        )
+
+    def test_stop_profit(self):
+        """测试次日盘中止盈：最高价触发按止盈比例，开盘触发按开盘价"""
+        index = pd.MultiIndex.from_product([['123001', '123002', '123003'], ['20240101', '20240102']],
+                                           names=['code', 'trade_date'])
+        df = pd.DataFrame({
+            'close': [100.0, 101.0, 100.0, 106.0, 100.0, 99.0],
+            'open': [100.0, 100.5, 100.0, 105.0, 100.0, 99.5],
+            'high': [100.0, 104.0, 100.0, 107.0, 100.0, 100.0],
+            'pct_chg': [0.0, 0.01, 0.0, 0.06, 0.0, -0.01],
+            'ytm': [1.0, 1.0, 2.0, 2.0, 3.0, 3.0],
+        }, index=index)
+        
+        backtester = CBBacktester(df=df, index_df=self.index_df, score_factors=['ytm'], weights=[1],
+                                  hold_num=3, stop_profit=0.03, fee_rate=0)
+        results = backtester.run()
+        
+        np.testing.assert_allclose(backtester.trade_returns[:3], [0.03, 0.05, -0.01])
+        np.testing.assert_array_equal(backtester.stop_hit[:3], [True, True, False])
+        self.assertAlmostEqual(results['time_return'].iloc[0], (0.03 + 0.05 - 0.01) / 3)
+
+    def test_turnover_cost(self):
+        """测试换手成本：空仓日清仓和次日重新建仓均按半个费率，换一半持仓按半个费率"""
+        dates = ['20240101', '20240102', '20240103', '20240104', '20240105', '20240108']
+        index = pd.MultiIndex.from_product([['123001', '123002', '123003'], dates], names=['code', 'trade_date'])
+        df = pd.DataFrame({
+            'close': 100.0,
+            'open': 100.0,
+            'high': 100.0,
+            'pct_chg': 0.01,
+            'ytm': [1.0, 1.0, 1.0, 1.0, 3.0, 3.0,
+                    2.0, 2.0, 2.0, 2.0, 2.0, 2.0,
+                    3.0, 3.0, 3.0, 3.0, 1.0, 1.0],
+        }, index=index)
+        df.loc[(slice(None), '20240103'), 'close'] = 300.0
+        
+        fee_rate = 0.002
+        expected = [0.5 * fee_rate, 0.0, 0.5 * fee_rate, 0.5 * fee_rate, 0.5 * fee_rate]
+        for engine, backend in [('frame', 'numpy'), ('panel', 'numpy'), ('frame', 'jit')]:
+            backtester = CBBacktester(df=df, index_df=self.index_df, exclude_conditions=['close > 200'],
+                                      score_factors=['ytm'], weights=[1], hold_num=2, stop_profit=0,
+                                      fee_rate=fee_rate, engine=engine)
+            results = backtester.run(backend=backend)
+            self.assertEqual(backtester.selection.counts.tolist(), [2, 2, 0, 2, 2, 2])
+            np.testing.assert_allclose(results['cost'].to_numpy(), expected)
+
     def test_full_backtest(self):
         """测试完整的回测流程"""
         backtester = CBBacktester(
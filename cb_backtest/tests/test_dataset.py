@@ -0,0 +1,172 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+import numpy as np
+from ..core.dataset import Dataset, DatasetRegistry, load_dataset, strategy_columns
+from ..core.single_runner import SingleRunner
+
+class TestDatasetRegistry(unittest.TestCase):
+    def setUp(self):
+        """准备测试数据文件"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cb_path = os.path.join(self.tmpdir.name, 'cb_data.pq')
+        self.index_path = os.path.join(self.tmpdir.name, 'index.pq')
+
+        dates = pd.to_datetime(['2024-01-02', '2024-01-03', '2024-01-04'])
+        codes = ['123001', '123002', '123003']
+        index = pd.MultiIndex.from_product([codes, dates], names=['code', 'trade_date'])
+
+        self.cb_df = pd.DataFrame({
+            'close': np.random.uniform(100, 150, len(index)),
+            'open': np.random.uniform(100, 150, len(index)),
+            'high': np.random.uniform(100, 150, len(index)),
+            'low': np.random.uniform(100, 150, len(index)),
+            'pct_chg': np.random.uniform(-0.05, 0.05, len(index)),
+            'bond_prem': np.random.uniform(-0.1, 0.1, len(index)),
+        }, index=index)
+        self.cb_df.to_parquet(self.cb_path)
+
+        index_df = pd.DataFrame({'index_jsl': [1.0, 1.01, 1.02]}, index=pd.Index(dates, name='trade_date'))
+        index_df.to_parquet(self.index_path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_load_dataset(self):
+        """测试数据集加载与日期规整"""
+        dataset = load_dataset(self.cb_path, self.index_path)
+
+        self.assertEqual(len(dataset.cb_data), len(self.cb_df))
+        self.assertEqual(dataset.cb_data.index.get_level_values('trade_date')[0], 20240102)
+        self.assertEqual(dataset.index_data.index.names, ['code', 'trade_date'])
+
+    def test_strategy_columns(self):
+        """测试根据策略计算需要读取的列"""
+        strategy = {
+            'exclude_conditions': ['close < 102', 'left_years < 0.7 and amount < 1000'],
+            'score_factors': ['bond_prem', 'ytm'],
+        }
+        columns = strategy_columns([strategy])
+
+        for col in ['close', 'open', 'high', 'low', 'pct_chg', 'left_years', 'amount', 'bond_prem', 'ytm']:
+            self.assertIn(col, columns)
+
+        # 无法解析的表达式回退为读取全部列
+        self.assertIsNone(strategy_columns([{'exclude_conditions': ['close < @limit']}]))
+
+    def test_load_projected_dataset(self):
+        """测试只读取需要的列和日期区间"""
+        full = load_dataset(self.cb_path, self.index_path)
+        dataset = load_dataset(
+            self.cb_path, self.index_path,
+            columns=['close', 'open', 'high', 'low', 'pct_chg', 'natr_5'],
+            start_date='20240103'
+        )
+
+        self.assertNotIn('bond_prem', dataset.cb_data.columns)
+        self.assertNotIn('natr_5', dataset.cb_data.columns)
+        self.assertEqual(set(dataset.cb_data.index.get_level_values('trade_date')), {20240103, 20240104})
+        self.assertNotEqual(dataset.version, full.version)
+
+    def test_pushdown_factor_history(self):
+        """测试下推开始日期时多读窗口因子的历史，区间开始处因子与全量读取一致"""
+        rng = np.random.default_rng(18)
+        dates = pd.bdate_range('2024-01-01', periods=15)
+        index = pd.MultiIndex.from_product([['123001', '123002', '123003'], dates], names=['code', 'trade_date'])
+        close = rng.uniform(100, 150, len(index))
+        pd.DataFrame({
+            'close': close,
+            'open': close,
+            'high': close * 1.02,
+            'low': close * 0.98,
+            'pct_chg': rng.uniform(-0.05, 0.05, len(index)),
+        }, index=index).to_parquet(self.cb_path)
+        pd.DataFrame({'index_jsl': 1.0}, index=pd.Index(dates, name='trade_date')).to_parquet(self.index_path)
+
+        columns = strategy_columns([{'exclude_conditions': [], 'score_factors': ['natr_5', 'momentum_5']}])
+        pushdown = SingleRunner(self.cb_path, self.index_path, columns=columns, start_date='20240110')
+        full = SingleRunner(self.cb_path, self.index_path, columns=columns)
+        self.assertLess(pushdown.dataset.trade_dates[0], 20240110)
+        self.assertGreater(pushdown.dataset.trade_dates[0], 20240101)
+
+        for name in ['natr_5', 'momentum_5']:
+            lo, hi = pushdown._row_range(20240110, 20240119)
+            expected_lo, expected_hi = full._row_range(20240110, 20240119)
+            values = pushdown._column(name)[lo:hi]
+            self.assertFalse(np.isnan(values).any())
+            np.testing.assert_allclose(values, full._column(name)[expected_lo:expected_hi])
+
+    def test_registry_caches_dataset(self):
+        """测试注册表在文件未变化时复用数据集"""
+        registry = DatasetRegistry()
+        first = registry.get(self.cb_path, self.index_path)
+        second = registry.get(self.cb_path, self.index_path)
+
+        self.assertIs(first, second)
+
+    def test_registry_reloads_on_change(self):
+        """测试数据文件变化后重新加载"""
+        registry = DatasetRegistry()
+        first = registry.get(self.cb_path, self.index_path)
+
+        self.cb_df.iloc[:3].to_parquet(self.cb_path)
+        stat = os.stat(self.cb_path)
+        os.utime(self.cb_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        second = registry.get(self.cb_path, self.index_path)
+        self.assertIsNot(first, second)
+        self.assertNotEqual(first.version, second.version)
+        self.assertEqual(len(second.cb_data), 3)
+
+    def test_runner_from_dataset(self):
+        """测试运行器直接使用已加载数据集"""
+        dataset = load_dataset(self.cb_path, self.index_path)
+        runner = SingleRunner(dataset=dataset)
+
+        self.assertIs(runner.cb_data, dataset.cb_data)
+        self.assertIs(runner.index_data, dataset.index_data)
+
+    def test_dataset_is_read_only(self):
+        """测试共享数据集不能被原地修改，运行器取出的区间副本可以修改"""
+        dataset = load_dataset(self.cb_path, self.index_path)
+        runner = SingleRunner(dataset=dataset)
+        close = dataset.cb_data['close'].to_numpy().copy()
+
+        with self.assertRaises(ValueError):
+            runner.cb_data.iloc[0, runner.cb_data.columns.get_loc('close')] = 0.0
+        with self.assertRaises(ValueError):
+            dataset.cb_data.loc[dataset.cb_data['close'] > 0, 'bond_prem'] = 0.0
+        with self.assertRaises(ValueError):
+            dataset.cb_data['close'].to_numpy()[0] = 0.0
+        with self.assertRaises(ValueError):
+            dataset.index_data.iloc[0, 0] = 0.0
+        with self.assertRaises(ValueError):
+            dataset.next_day['close'][0] = 0.0
+        np.testing.assert_array_equal(dataset.cb_data['close'].to_numpy(), close)
+
+        selected = runner._select_dates(20240102, 20240104)
+        selected.iloc[0, selected.columns.get_loc('close')] = 0.0
+        np.testing.assert_array_equal(dataset.cb_data['close'].to_numpy(), close)
+
+        with self.assertRaises(ValueError):
+            dataset.trade_dates[0] = 0
+        # 写入整列替换（非原地写入）只改变该 DataFrame 的列，不影响已计算的只读数组
+        next_close = dataset.next_day['close'].copy()
+        dataset.cb_data['close'] = 0.0
+        np.testing.assert_array_equal(dataset.next_day['close'], next_close)
+        self.assertEqual(dataset.trade_dates[0], 20240102)
+
+    def test_dataset_keeps_source_frame(self):
+        """测试构造数据集不改变传入的 DataFrame，且不复制数值列"""
+        source = load_dataset(self.cb_path, self.index_path).cb_data.copy()
+        dataset = Dataset(cb_data=source, index_data=pd.DataFrame(), version='test')
+
+        self.assertTrue(np.shares_memory(dataset.cb_data['close'].to_numpy(), source['close'].to_numpy()))
+        self.assertTrue(dataset.cb_data.index.equals(source.index))
+        self.assertEqual(list(dataset.cb_data.columns), list(source.columns))
+        with self.assertRaises(ValueError):
+            dataset.cb_data.iloc[0, 0] = 0.0
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+import pandas as pd
+import numpy as np
+from ..core.engine import FactorEngine
+
+class TestFactorEngine(unittest.TestCase):
+    def setUp(self):
+        """准备按交易日排序、长度不一且含缺失值的多只转债行情"""
+        rng = np.random.default_rng(17)
+        dates = [int(d.strftime('%Y%m%d')) for d in pd.bdate_range('2024-01-01', periods=40)]
+        index = pd.MultiIndex.from_product([['123001', '123002', '123003'], dates], names=['code', 'trade_date'])
+        close = rng.uniform(100, 150, len(index))
+        df = pd.DataFrame({
+            'close': close,
+            'open': close * rng.uniform(0.98, 1.02, len(index)),
+            'high': close * rng.uniform(1.0, 1.05, len(index)),
+            'low': close * rng.uniform(0.95, 1.0, len(index)),
+        }, index=index)
+        df.iloc[50, df.columns.get_loc('high')] = np.nan
+        self.df = df.drop(df.index[85:]).sort_index(level=['trade_date', 'code'])
+
+    def test_natr(self):
+        """测试 NATR 与逐代码 rolling 计算一致"""
+        result = FactorEngine(self.df).compute_all_factors()
+
+        for code, group in self.df.groupby('code'):
+            group = group.sort_index(level='trade_date')
+            prev_close = group['close'].shift(1)
+            tr = pd.concat([group['high'] - group['low'],
+                            (group['high'] - prev_close).abs(),
+                            (group['low'] - prev_close).abs()], axis=1).max(axis=1)
+            for n in [1, 3, 5, 10, 20]:
+                expected = tr.rolling(n).mean() / group['close'] * 100
+                np.testing.assert_allclose(result.loc[group.index, f'natr_{n}'], expected, rtol=1e-9)
+
+    def test_parallel_matches_serial(self):
+        """测试按代码分片并行计算与单进程结果一致（含截面因子 rs_*）
+
+        滚动窗口基于累加和，分片后累加起点不同，只允许舍入误差。
+        """
+        serial = FactorEngine(self.df).compute_all_factors()
+        parallel = FactorEngine(self.df).compute_all_factors(workers=2)
+
+        names = [name for name in serial.columns if name not in self.df.columns and name != 'filter']
+        self.assertIn('rs_5', names)
+        for name in names:
+            np.testing.assert_allclose(parallel[name].to_numpy(), serial[name].to_numpy(), rtol=1e-9, err_msg=name)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import time
+import unittest
+import numpy as np
+from ..core.expr import compile_condition, evaluate_conditions
+
+class TestExpr(unittest.TestCase):
+    def setUp(self):
+        """准备测试数据"""
+        self.columns = {
+            'close': np.array([100.0, 105.0, np.nan, 160.0]),
+            'amount': np.array([500.0, 2000.0, 3000.0, 800.0]),
+            'is_call': np.array(['正常', '已公告强赎', '正常', '正常'], dtype=object),
+        }
+
+    def test_compile_condition(self):
+        """测试常见条件的向量化求值"""
+        cases = {
+            'close < 102': [True, False, False, False],
+            'close < 102 or close > 155': [True, False, False, True],
+            'close > 102 and amount < 1000': [False, False, False, True],
+            '(close > 102) & ~(amount >= 1000)': [False, False, False, True],
+            '102 <= close <= 155': [False, True, False, False],
+            "is_call != '正常'": [False, True, False, False],
+            "is_call in ['已公告强赎', '已满足强赎条件']": [False, True, False, False],
+            'abs(close - 100) * 2 < amount / 100': [True, True, False, False],
+        }
+        for expression, expected in cases.items():
+            np.testing.assert_array_equal(compile_condition(expression)(self.columns), expected, err_msg=expression)
+
+    def test_compile_cached(self):
+        """测试编译结果按表达式文本缓存"""
+        predicate = compile_condition('close < 102')
+
+        self.assertIs(compile_condition('close < 102'), predicate)
+        self.assertEqual(predicate.names, {'close'})
+
+    def test_reject_unsafe(self):
+        """测试拒绝非法或不安全的表达式"""
+        for expression in ['close <', '__import__("os").system("ls")', 'close.__class__', 'close[0] < 1',
+                           'lambda: 1', "open('x')"]:
+            with self.assertRaises(ValueError, msg=expression):
+                compile_condition(expression)
+
+        with self.assertRaises(ValueError):
+            compile_condition('left_years < 1')(self.columns)
+        with self.assertRaises(ValueError):
+            compile_condition('close + 1')(self.columns)
+
+    def test_reject_oversized(self):
+        """测试超大整数幂和字符串乘法被拒绝或立即完成，不会耗尽 CPU/内存"""
+        start = time.perf_counter()
+        mask = compile_condition('close < 9**9**9**9')(self.columns)
+        np.testing.assert_array_equal(mask, [True, True, False, True])
+        np.testing.assert_array_equal(compile_condition('close > 2**10000')(self.columns), [False] * 4)
+        np.testing.assert_array_equal(compile_condition('close ** 2 > 11000')(self.columns), [False, True, False, True])
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+        for expression in ["is_call == '正常' * 10**10", "close < 10**10 * 'a'", "is_call == '%s' % close"]:
+            with self.assertRaises(ValueError, msg=expression):
+                compile_condition(expression)
+
+    def test_evaluate_conditions(self):
+        """测试多个条件一次性合并"""
+        excluded = evaluate_conditions(['close < 102', 'amount < 1000'], self.columns, shape=(4,))
+        np.testing.assert_array_equal(excluded, [True, False, False, True])
+
+        np.testing.assert_array_equal(evaluate_conditions([], self.columns, shape=(4,)), [False] * 4)
+
+if __name__ == '__main__':
+    unittest.main()
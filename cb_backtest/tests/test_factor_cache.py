@@ -0,0 +1,80 @@
+import os
+import tempfile
+import time
+import unittest
+import pandas as pd
+import numpy as np
+from ..core.factor_cache import FactorCache, factor_fingerprint, warm_factor_cache
+from ..core.factors import FactorContext
+
+class TestFactorCache(unittest.TestCase):
+    def setUp(self):
+        """准备缓存目录和行情数据"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(19)
+        dates = [int(d.strftime('%Y%m%d')) for d in pd.bdate_range('2024-01-01', periods=30)]
+        index = pd.MultiIndex.from_product([dates, ['123001', '123002']], names=['trade_date', 'code'])
+        close = rng.uniform(100, 150, len(index))
+        self.df = pd.DataFrame({
+            'close': close,
+            'high': close * 1.02,
+            'low': close * 0.98,
+        }, index=index)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_fingerprint(self):
+        """测试不同窗口的同族因子指纹不同"""
+        self.assertNotEqual(factor_fingerprint('natr_5'), factor_fingerprint('natr_10'))
+        self.assertEqual(factor_fingerprint('natr_5'), factor_fingerprint('natr_5'))
+
+    def test_context_uses_cache(self):
+        """测试命中磁盘缓存时直接映射文件，不再计算依赖"""
+        cache = FactorCache(self.tmpdir.name)
+        first = FactorContext.from_frame(self.df, version='v1', cache=cache)
+        expected = np.array(first.get('natr_5'))
+        self.assertEqual(cache.misses, 1)
+
+        second = FactorContext.from_frame(self.df, version='v1', cache=cache)
+        values = second.get('natr_5')
+        self.assertEqual(cache.hits, 1)
+        self.assertIsInstance(values, np.memmap)
+        self.assertNotIn('true_range', second)
+        np.testing.assert_array_equal(values, expected)
+
+        # 数据版本变化后不命中
+        FactorContext.from_frame(self.df, version='v2', cache=cache).get('natr_5')
+        self.assertEqual(cache.misses, 2)
+
+    def test_eviction(self):
+        """测试超过上限时删除最久未使用的文件"""
+        cache = FactorCache(self.tmpdir.name)
+        values = np.zeros(1000)
+        cache.store('v1', 'natr_5', values)
+        cache.store('v1', 'natr_10', values)
+        # 命中会刷新文件的使用时间
+        past = time.time() - 60
+        for name in os.listdir(self.tmpdir.name):
+            os.utime(os.path.join(self.tmpdir.name, name), (past, past))
+        cache.load('v1', 'natr_5')
+
+        cache.max_bytes = 17000
+        cache.store('v1', 'natr_20', values)
+
+        self.assertIsNotNone(cache.load('v1', 'natr_5'))
+        self.assertIsNone(cache.load('v1', 'natr_10'))
+        self.assertLessEqual(cache.nbytes, 17000)
+
+    def test_warm(self):
+        """测试预热全部注册因子"""
+        cache = FactorCache(self.tmpdir.name)
+        context = FactorContext.from_frame(self.df, version='v1', cache=cache)
+        names = warm_factor_cache(context)
+
+        self.assertIn('rs_20', names)
+        self.assertNotIn('true_range', names)
+        self.assertEqual(cache.stats()['files'], len(names))
+
+if __name__ == '__main__':
+    unittest.main()
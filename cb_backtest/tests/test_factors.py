@@ -0,0 +1,119 @@
+import unittest
+import pandas as pd
+import numpy as np
+from ..core.dataset import Dataset, strategy_columns
+from ..core.factors import FactorContext, factor_inputs, resolve_factors, strategy_factors
+from ..core.single_runner import SingleRunner
+
+class TestFactors(unittest.TestCase):
+    def setUp(self):
+        """准备按 (trade_date, code) 排序、含停牌缺失的行情"""
+        rng = np.random.default_rng(18)
+        dates = [int(d.strftime('%Y%m%d')) for d in pd.bdate_range('2024-01-01', periods=30)]
+        index = pd.MultiIndex.from_product([dates, ['123001', '123002', '123003']], names=['trade_date', 'code'])
+        close = rng.uniform(100, 150, len(index))
+        df = pd.DataFrame({
+            'close': close,
+            'open': close,
+            'high': close * rng.uniform(1.0, 1.05, len(index)),
+            'low': close * rng.uniform(0.95, 1.0, len(index)),
+            'pct_chg': rng.uniform(-0.05, 0.05, len(index)),
+            'ytm': rng.random(len(index)),
+        }, index=index)
+        self.df = df.drop(index=[(dates[4], '123002'), (dates[0], '123003')])
+        self.index_df = pd.DataFrame({'close': 1.0},
+                                     index=pd.MultiIndex.from_product([['000001.SH'], dates], names=['code', 'trade_date']))
+
+    def test_resolve_factors(self):
+        """测试依赖解析：依赖项在前，原始列不计入"""
+        order = resolve_factors(['natr_5', 'max_value_position', 'ytm'])
+
+        self.assertEqual(set(order), {'prev_close', 'true_range', 'natr_5', 'close_cummax', 'max_value',
+                                      'max_value_position'})
+        self.assertLess(order.index('prev_close'), order.index('true_range'))
+        self.assertLess(order.index('true_range'), order.index('natr_5'))
+        self.assertEqual(factor_inputs(['natr_5', 'ytm']), {'high', 'low', 'close', 'ytm'})
+
+    def test_strategy_factors(self):
+        """测试从评分因子和排除条件中找出注册因子"""
+        strategy = {'score_factors': ['ytm', 'natr_5'], 'exclude_conditions': ['rs_20 < 0 and close > 130']}
+        self.assertEqual(strategy_factors(strategy), ['natr_5', 'rs_20'])
+        self.assertIn('high', strategy_columns([strategy]))
+
+    def test_lazy_computation(self):
+        """测试只计算需要的因子，中间量被多个因子共享"""
+        ctx = FactorContext.from_frame(self.df)
+        ctx.get('natr_5')
+        ctx.get('natr_10')
+
+        self.assertIn('true_range', ctx)
+        self.assertNotIn('momentum_20', ctx)
+        self.assertEqual(list(ctx._cumsums), ['true_range'])
+        with self.assertRaises(ValueError):
+            ctx.get('bond_prem')
+
+    def test_per_code_semantics(self):
+        """测试历史最高价和相对强弱按代码、按交易日计算"""
+        ctx = FactorContext.from_frame(self.df)
+        close = self.df['close']
+
+        expected = close.groupby(level='code').transform(lambda s: s.cummax().shift(1))
+        np.testing.assert_allclose(ctx.get('max_value'), expected)
+
+        market = close.groupby(level='trade_date').mean().pct_change(5)
+        momentum = close.groupby(level='code').pct_change(5)
+        expected = momentum - market.reindex(self.df.index.get_level_values('trade_date')).to_numpy()
+        np.testing.assert_allclose(ctx.get('rs_5'), expected)
+
+    def test_search_strategy_factors(self):
+        """测试移植自 search_strategy.py 的因子与逐代码 rolling 计算一致"""
+        rng = np.random.default_rng(21)
+        df = self.df.copy()
+        df['turnover'] = rng.uniform(0, 30, len(df))
+        df['pct_chg_stk'] = rng.normal(0, 0.02, len(df))
+        df['pre_close'] = df['close'] / (1 + df['pct_chg'])
+        df.iloc[7, df.columns.get_loc('pct_chg_stk')] = np.nan
+        ctx = FactorContext.from_frame(df)
+
+        grouped = df.groupby(level='code')
+        expected = {
+            'pct_chg_5': grouped['pct_chg'].transform(lambda s: (s + 1).rolling(5, min_periods=1).apply(np.prod, raw=True) - 1),
+            'turnover_5_avg': grouped['turnover'].transform(lambda s: s.rolling(5).mean()),
+            'bodong_10': grouped['pct_chg_stk'].transform(lambda s: s.rolling(10).std() * np.sqrt(10)),
+            'zhengfu_5_bodong': ((df['high'] - df['low']) / df['close']).groupby(level='code').transform(
+                lambda s: s.rolling(5).std() * np.sqrt(5)),
+            'high_jump_count_100': (df['high'] / df['pre_close'] - 1 > 0.025).groupby(level='code').transform(
+                lambda s: s.rolling(100, min_periods=1).sum()),
+        }
+        for name, values in expected.items():
+            np.testing.assert_allclose(ctx.get(name), values, rtol=1e-9, atol=1e-12, err_msg=name)
+
+    def test_rolling_prod_signs(self):
+        """测试滚动连乘对零值和负值的处理"""
+        index = pd.MultiIndex.from_product([[20240102, 20240103, 20240104, 20240105], ['123001']],
+                                           names=['trade_date', 'code'])
+        ctx = FactorContext.from_frame(pd.DataFrame({'x': [2.0, -3.0, 0.0, 4.0]}, index=index))
+        np.testing.assert_allclose(ctx.rolling_prod('x', 2, min_periods=1), [2.0, -6.0, 0.0, 0.0])
+        np.testing.assert_allclose(ctx.rolling_prod('x', 3), [np.nan, np.nan, 0.0, 0.0])
+
+    def test_runner_computes_missing_factors(self):
+        """测试数据中没有的注册因子在全量数据上计算后按区间截取"""
+        runner = SingleRunner(dataset=Dataset(cb_data=self.df, index_data=self.index_df, version='test'))
+        strategy = {
+            'exclude_conditions': ['natr_3 > 100'],
+            'score_factors': ['momentum_5'],
+            'weights': [1],
+            'hold_num': 1,
+            'stop_profit': 0,
+            'fee_rate': 0,
+        }
+        result = runner.run('20240115', '20240209', strategy)
+
+        self.assertGreater(len(result['daily_returns']), 0)
+        self.assertNotIn('momentum_5', self.df.columns)
+        # 区间首日的动量使用了区间之前的历史数据
+        lo, _ = runner._row_range(20240115, 20240209)
+        self.assertFalse(np.isnan(runner.factors.get('momentum_5')[lo]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+import numpy as np
+from ..core.factor_cache import MERGE_CHUNKS, FactorCache, warm_factor_cache
+from ..core.factors import FactorContext
+from ..core.incremental import FactorState, append_trading_day
+
+class TestIncremental(unittest.TestCase):
+    def setUp(self):
+        """准备按 (trade_date, code) 排序、含停牌和新上市转债的行情"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(20)
+        self.dates = [int(d.strftime('%Y%m%d')) for d in pd.bdate_range('2024-01-01', periods=90)]
+        codes = ['123001', '123002', '123003', '123004']
+        index = pd.MultiIndex.from_product([codes, self.dates], names=['code', 'trade_date'])
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(index))))
+        df = pd.DataFrame({
+            'close': close,
+            'high': close * rng.uniform(1.0, 1.03, len(index)),
+            'low': close * rng.uniform(0.97, 1.0, len(index)),
+        }, index=index)
+        # 123002 长期停牌后复牌，123004 最后两天才上市
+        df = df.drop(index=[('123002', d) for d in self.dates[10:80]] + [('123004', d) for d in self.dates[:-2]])
+        self.df = df.sort_index(level=['trade_date', 'code'])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _until(self, date):
+        return self.df[self.df.index.get_level_values('trade_date') <= date]
+
+    def _on(self, date):
+        return self.df[self.df.index.get_level_values('trade_date') == date]
+
+    def test_update_matches_full(self):
+        """测试逐日增量追加的结果与全量计算一致"""
+        cache = FactorCache(self.tmpdir.name)
+        history = self._until(self.dates[-3])
+        context = FactorContext.from_frame(history, version='v0', cache=cache)
+        warm_factor_cache(context)
+        state = FactorState.from_frame(history, 'v0', context=context)
+
+        state = append_trading_day(cache, state, self._on(self.dates[-2]), 'v1')
+        state.save(f"{self.tmpdir.name}/state")
+        state = FactorState.load(f"{self.tmpdir.name}/state")
+        state = append_trading_day(cache, state, self._on(self.dates[-1]), 'v2')
+
+        self.assertEqual(state.rows, len(self.df))
+        full = FactorContext.from_frame(self.df)
+        for name in state.names:
+            np.testing.assert_allclose(cache.load('v2', name), full.get(name), rtol=1e-9, atol=1e-12, err_msg=name)
+
+    def test_append_keeps_existing_chunks(self):
+        """测试追加只写入新交易日的分块，已有文件不被重写，合并后结果仍与全量一致"""
+        cache = FactorCache(self.tmpdir.name)
+        history = self._until(self.dates[-26])
+        context = FactorContext.from_frame(history, version='v0', cache=cache)
+        warm_factor_cache(context)
+        state = FactorState.from_frame(history, 'v0', context=context)
+
+        def snapshot():
+            return {entry.name: (entry.stat().st_ino, entry.stat().st_mtime_ns)
+                    for entry in os.scandir(self.tmpdir.name) if entry.name.endswith('.npy')}
+
+        for i, date in enumerate(self.dates[-25:]):
+            before = snapshot()
+            state = append_trading_day(cache, state, self._on(date), f'v{i + 1}')
+            after = snapshot()
+            self.assertTrue(all(after.get(name) == stat for name, stat in before.items()))
+            # 每个因子新增一个日分块，第 20 天末尾 20 个日分块另外合并为一个月分块
+            self.assertEqual(len(after) - len(before), len(state.names) * (2 if i == MERGE_CHUNKS - 1 else 1))
+
+        full = FactorContext.from_frame(self.df)
+        for name in state.names:
+            self.assertEqual(cache.rows('v25', name), len(self.df))
+            np.testing.assert_allclose(cache.load('v25', name), full.get(name), rtol=1e-9, atol=1e-12, err_msg=name)
+
+    def test_tail_is_bounded(self):
+        """测试状态只保留每只转债的最近窗口和最近交易日"""
+        state = FactorState.from_frame(self.df, 'v0')
+        self.assertEqual(state.history, 61)
+        self.assertLess(len(state.tail), len(self.df))
+        self.assertIn('close_cummax', state.tail.columns)
+        self.assertAlmostEqual(state.running.loc['123001', 'close_cummax'],
+                               self.df.xs('123001', level='code')['close'].max())
+
+    def test_rejects_non_consecutive_update(self):
+        """测试只接受晚于状态末日的单个交易日"""
+        state = FactorState.from_frame(self._until(self.dates[-3]), 'v0')
+        with self.assertRaises(ValueError):
+            state.update(self._on(self.dates[-3]), 'v1')
+        with self.assertRaises(ValueError):
+            state.update(self.df[self.df.index.get_level_values('trade_date') > self.dates[-3]], 'v1')
+
+if __name__ == '__main__':
+    unittest.main()
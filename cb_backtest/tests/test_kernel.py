@@ -0,0 +1,62 @@
+import unittest
+import pandas as pd
+import numpy as np
+from ..core.backtester import CBBacktester
+
+class TestKernel(unittest.TestCase):
+    def setUp(self):
+        """准备测试数据（含并列得分、停牌和过滤）"""
+        rng = np.random.default_rng(7)
+        dates = [int(d.strftime('%Y%m%d')) for d in pd.bdate_range('2024-01-01', periods=30)]
+        codes = [f'1230{i:02d}' for i in range(15)]
+        index = pd.MultiIndex.from_product([codes, dates], names=['code', 'trade_date'])
+        close = rng.uniform(100, 150, len(index))
+
+        self.df = pd.DataFrame({
+            'close': close,
+            'open': close * rng.uniform(0.97, 1.04, len(index)),
+            'high': close * rng.uniform(1.0, 1.06, len(index)),
+            'pct_chg': rng.uniform(-0.05, 0.05, len(index)),
+            'amount': rng.uniform(500, 5000, len(index)),
+            'ytm': rng.integers(0, 6, len(index)).astype(float),
+        }, index=index)
+        self.df = self.df.drop(self.df.sample(frac=0.05, random_state=0).index)
+        self.strategy = {
+            'exclude_conditions': ['amount < 1000'],
+            'score_factors': ['ytm'],
+            'weights': [-1],
+            'hold_num': 4,
+            'stop_profit': 0.03,
+            'fee_rate': 0.002,
+        }
+
+    def test_kernel_parity(self):
+        """测试编译内核与向量化路径结果一致"""
+        for engine in ['frame', 'panel']:
+            expected_bt = CBBacktester(self.df, None, engine=engine, **self.strategy)
+            expected = expected_bt.run(backend='numpy')
+
+            # 直接调用内核（未安装 numba 时按普通 Python 执行）
+            kernel_bt = CBBacktester(self.df, None, engine=engine, **self.strategy)
+            kernel_bt.apply_filters()
+            kernel_bt.compute_score(select=False)
+            results = kernel_bt._simulate_kernel()
+
+            pd.testing.assert_frame_equal(results, expected, check_dtype=False)
+            np.testing.assert_array_equal(kernel_bt.selection.offsets, expected_bt.selection.offsets)
+            np.testing.assert_array_equal(kernel_bt.selection.rows, expected_bt.selection.rows)
+            np.testing.assert_allclose(kernel_bt.trade_returns, expected_bt.trade_returns)
+            np.testing.assert_array_equal(kernel_bt.stop_hit, expected_bt.stop_hit)
+            self.assertEqual(kernel_bt.trade_log.trades(), expected_bt.trade_log.trades())
+
+    def test_jit_backend(self):
+        """测试 jit 后端（未安装 numba 或多日持有时回退）与 numpy 后端结果一致"""
+        expected = CBBacktester(self.df, None, **self.strategy).run()
+        results = CBBacktester(self.df, None, **self.strategy).run(backend='jit')
+        pd.testing.assert_frame_equal(results, expected, check_dtype=False)
+
+        with self.assertRaises(ValueError):
+            CBBacktester(self.df, None, **self.strategy).run(backend='gpu')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import pandas as pd
+import numpy as np
+from ..core.dataset import Dataset
+from ..core.mask_cache import MaskCache
+from ..core.single_runner import SingleRunner
+
+class TestMaskCache(unittest.TestCase):
+    def setUp(self):
+        """准备测试数据"""
+        rng = np.random.default_rng(1)
+        self.columns = {
+            'close': rng.uniform(95, 160, 1000),
+            'amount': rng.uniform(500, 5000, 1000),
+        }
+        self.loads = []
+
+    def column(self, name):
+        self.loads.append(name)
+        return self.columns[name]
+
+    def test_exclusion_mask(self):
+        """测试合并掩码与直接求值一致"""
+        cache = MaskCache()
+        mask = cache.exclusion_mask('v1', ['close < 102', 'amount<1000'], self.column, 1000)
+
+        expected = (self.columns['close'] < 102) | (self.columns['amount'] < 1000)
+        np.testing.assert_array_equal(mask, expected)
+        self.assertEqual(cache.stats()['misses'], 3)
+
+    def test_cache_hits(self):
+        """测试重复条件（文本写法不同）命中缓存，不再读取数据"""
+        cache = MaskCache()
+        cache.exclusion_mask('v1', ['close < 102', 'amount < 1000'], self.column, 1000)
+        self.loads.clear()
+
+        mask = cache.exclusion_mask('v1', ['amount<1000', '(close < 102)'], self.column, 1000)
+        self.assertEqual(self.loads, [])
+        self.assertEqual(cache.hits, 1)
+
+        # 部分条件相同时复用单条件掩码
+        cache.exclusion_mask('v1', ['close < 102', 'close > 155'], self.column, 1000)
+        self.assertEqual(self.loads, ['close'])
+
+        # 数据版本变化后重新计算
+        self.loads.clear()
+        cache.exclusion_mask('v2', ['close < 102'], self.column, 1000)
+        self.assertEqual(self.loads, ['close'])
+        np.testing.assert_array_equal(mask, (self.columns['close'] < 102) | (self.columns['amount'] < 1000))
+
+    def test_memory_cap(self):
+        """测试超过内存上限后淘汰最久未使用的掩码"""
+        cache = MaskCache(max_bytes=300)
+        cache.exclusion_mask('v1', ['close < 102'], self.column, 1000)
+        cache.exclusion_mask('v1', ['close < 110'], self.column, 1000)
+        cache.exclusion_mask('v1', ['close < 120'], self.column, 1000)
+
+        self.assertEqual(len(cache), 2)
+        self.assertLessEqual(cache.nbytes, 300)
+
+        self.loads.clear()
+        cache.exclusion_mask('v1', ['close < 102'], self.column, 1000)
+        self.assertEqual(self.loads, ['close'])
+
+    def test_runner_filter_mask(self):
+        """测试运行器按日期区间截取缓存的掩码"""
+        dates = [20240102, 20240103, 20240104]
+        index = pd.MultiIndex.from_product([dates, ['123001', '123002']], names=['trade_date', 'code'])
+        cb_data = pd.DataFrame({'close': [100.0, 110.0, 101.0, 120.0, 130.0, 99.0]}, index=index)
+        runner = SingleRunner(dataset=Dataset(cb_data=cb_data, index_data=pd.DataFrame(), version='test'))
+
+        mask = runner._filter_mask(['close < 102'], 20240103, 20240104)
+        np.testing.assert_array_equal(mask, [True, False, False, True])
+
+if __name__ == '__main__':
+    unittest.main()
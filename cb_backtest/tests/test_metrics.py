@@ -0,0 +1,78 @@
+import json
+import sys
+import unittest
+import pandas as pd
+import numpy as np
+import quantstats as qs
+from ..core.eval import evaluate_performance
+from ..utils.metrics import performance_metrics
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        """准备日频收益率序列"""
+        rng = np.random.default_rng(25)
+        index = pd.bdate_range('2023-01-02', periods=300)
+        self.returns = pd.Series(rng.normal(0.0008, 0.012, len(index)), index=index)
+
+    def assert_parity(self, returns: pd.Series):
+        metrics = performance_metrics(returns.to_numpy())
+        np.testing.assert_allclose(metrics['max_drawdown'], qs.stats.max_drawdown(returns), rtol=1e-12)
+        np.testing.assert_allclose(metrics['volatility'], qs.stats.volatility(returns), rtol=1e-12)
+        np.testing.assert_allclose(metrics['sharpe'], qs.stats.sharpe(returns), rtol=1e-12)
+        np.testing.assert_allclose(metrics['sortino_ratio'], qs.stats.sortino(returns), rtol=1e-12)
+        np.testing.assert_allclose(metrics['final_nav'], (1 + returns).prod(), rtol=1e-12)
+        self.assertEqual(metrics['win_rate'], (returns > 0).sum() / len(returns))
+
+    def test_quantstats_parity(self):
+        """测试各指标与 quantstats 一致"""
+        self.assert_parity(self.returns)
+
+        # 首日即亏损：回撤从初始净值 1 起算
+        returns = self.returns.copy()
+        returns.iloc[0] = -0.05
+        self.assert_parity(returns)
+
+        # 含空仓日（收益为 0）和缺失值
+        returns.iloc[10:20] = 0.0
+        returns.iloc[30] = np.nan
+        self.assert_parity(returns)
+
+    def test_degenerate(self):
+        """测试没有下行收益时索提诺比率为 None，空序列报错"""
+        metrics = performance_metrics(np.array([0.01, 0.0, 0.02]), years=0)
+        self.assertIsNone(metrics['sortino_ratio'])
+        self.assertEqual(metrics['max_drawdown'], 0.0)
+        self.assertEqual(metrics['annual_return'], 0.0)
+        with self.assertRaises(ValueError):
+            performance_metrics(np.array([]))
+
+    def test_constant_returns(self):
+        """测试常数收益（含缺失值）：无法定义的比率为 None，结果可序列化为 JSON"""
+        returns = pd.Series(0.001, index=pd.bdate_range('2024-01-01', periods=30))
+        returns.iloc[5] = np.nan
+        metrics = evaluate_performance(pd.DataFrame({'returns': returns}))
+
+        self.assertEqual(metrics['volatility'], 0.0)
+        self.assertIsNone(metrics['sharpe'])
+        self.assertIsNone(metrics['sortino_ratio'])
+        self.assertIsNone(metrics['daily_returns'][returns.index[5].strftime('%Y-%m-%d')])
+        json.dumps(metrics, allow_nan=False)
+
+        self.assertIsNone(performance_metrics(np.array([0.01]))['sharpe'])
+
+    def test_evaluate_performance(self):
+        """测试 evaluate_performance 的指标与年化收益率，且计算指标时不导入 quantstats"""
+        sys.modules.pop('quantstats', None)
+        try:
+            metrics = evaluate_performance(pd.DataFrame({'returns': self.returns}))
+            self.assertNotIn('quantstats', sys.modules)
+        finally:
+            sys.modules['quantstats'] = qs
+
+        years = (self.returns.index[-1] - self.returns.index[0]).days / 365.0
+        np.testing.assert_allclose(metrics['annual_return'], (1 + self.returns).prod() ** (1 / years) - 1, rtol=1e-12)
+        np.testing.assert_allclose(metrics['sharpe'], qs.stats.sharpe(self.returns), rtol=1e-12)
+        self.assertEqual(metrics['trade_count'], len(self.returns))
+
+if __name__ == '__main__':
+    unittest.main()
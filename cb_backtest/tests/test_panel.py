@@ -0,0 +1,64 @@
+import unittest
+import pandas as pd
+import numpy as np
+from ..core.backtester import CBBacktester
+from ..core.panel import Panel
+
+class TestPanel(unittest.TestCase):
+    def setUp(self):
+        """准备测试数据（部分转债在部分交易日缺失）"""
+        rng = np.random.default_rng(0)
+        dates = [20240102, 20240103, 20240104, 20240105, 20240108]
+        codes = [f'1230{i:02d}' for i in range(8)]
+        index = pd.MultiIndex.from_product([codes, dates], names=['code', 'trade_date'])
+
+        self.df = pd.DataFrame({
+            'close': rng.uniform(100, 150, len(index)),
+            'open': rng.uniform(100, 150, len(index)),
+            'high': rng.uniform(100, 150, len(index)),
+            'low': rng.uniform(100, 150, len(index)),
+            'pct_chg': rng.uniform(-0.05, 0.05, len(index)),
+            'amount': rng.uniform(500, 5000, len(index)),
+            'bond_prem': rng.uniform(-0.1, 0.1, len(index)),
+            'ytm': np.round(rng.uniform(0, 0.05, len(index)), 2),
+        }, index=index).drop([('123003', 20240103), ('123005', 20240105)])
+        self.index_df = pd.DataFrame(index=dates)
+
+        self.strategy = {
+            'exclude_conditions': ['close < 105', 'amount < 1000 and close > 140'],
+            'score_factors': ['bond_prem', 'ytm'],
+            'weights': [-10, 10],
+            'hold_num': 3,
+        }
+
+    def test_from_frame(self):
+        """测试长表与面板的互相转换"""
+        panel = Panel.from_frame(self.df, columns=['close'])
+
+        self.assertEqual(panel.shape, (5, 8))
+        self.assertEqual(panel.valid.sum(), len(self.df))
+        np.testing.assert_array_equal(panel.to_rows(panel.field('close')), self.df['close'].to_numpy())
+        self.assertTrue(np.isnan(panel.field('close')[1, 3]))
+        self.assertTrue(np.isnan(panel.next_day(panel.field('close'))[-1]).all())
+        with self.assertRaises(ValueError):
+            panel.field('ytm')
+
+    def test_engine_parity(self):
+        """测试面板引擎与长表引擎结果一致"""
+        frame = CBBacktester(self.df, self.index_df, **self.strategy)
+        panel = CBBacktester(self.df, self.index_df, engine='panel', **self.strategy)
+
+        frame_results = frame.run()
+        panel_results = panel.run()
+
+        pd.testing.assert_frame_equal(panel_results, frame_results)
+        pd.testing.assert_series_equal(panel.df['filter'], frame.df['filter'])
+        pd.testing.assert_series_equal(panel.df['rank'], frame.df['rank'])
+
+    def test_invalid_engine(self):
+        """测试未知引擎"""
+        with self.assertRaises(ValueError):
+            CBBacktester(self.df, self.index_df, engine='gpu')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+import numpy as np
+from ..core.partition import partition_dataset, read_index, read_partitioned
+from ..core.dataset import load_dataset
+
+class TestPartition(unittest.TestCase):
+    def setUp(self):
+        """准备跨年的测试数据文件"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cb_path = os.path.join(self.tmpdir.name, 'cb_data.pq')
+        self.index_path = os.path.join(self.tmpdir.name, 'index.pq')
+
+        dates = pd.bdate_range('2023-11-01', '2024-02-29')
+        codes = ['123001', '123002', '123003']
+        index = pd.MultiIndex.from_product([codes, dates], names=['code', 'trade_date'])
+
+        pd.DataFrame({
+            'close': np.random.uniform(100, 150, len(index)),
+            'open': np.random.uniform(100, 150, len(index)),
+            'high': np.random.uniform(100, 150, len(index)),
+            'low': np.random.uniform(100, 150, len(index)),
+            'pct_chg': np.random.uniform(-0.05, 0.05, len(index)),
+        }, index=index).to_parquet(self.cb_path)
+
+        pd.DataFrame(
+            {'index_jsl': np.random.uniform(1, 2, len(dates))},
+            index=pd.Index(dates, name='trade_date')
+        ).to_parquet(self.index_path)
+
+        self.cb_dir = os.path.join(self.tmpdir.name, 'cb_data')
+        self.index_dir = os.path.join(self.tmpdir.name, 'index')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_partition_index(self):
+        """测试分区元数据"""
+        partition_dataset(self.cb_path, self.cb_dir, freq='month', row_group_size=10)
+        meta = read_index(self.cb_dir)
+
+        self.assertEqual([p['file'] for p in meta['partitions']],
+                         ['202311.parquet', '202312.parquet', '202401.parquet', '202402.parquet'])
+        self.assertEqual(meta['partitions'][0]['start_date'], '20231101')
+        self.assertEqual(sum(p['rows'] for p in meta['partitions']), len(pd.read_parquet(self.cb_path)))
+
+    def test_read_overlapping_partitions(self):
+        """测试只读取与日期区间重叠的分区"""
+        partition_dataset(self.cb_path, self.cb_dir, freq='year')
+        df = read_partitioned(self.cb_dir, start_date='20240101')
+
+        self.assertTrue((df.index.get_level_values('trade_date') >= pd.Timestamp('2024-01-01')).all())
+
+    def test_load_partitioned_dataset(self):
+        """测试分区数据与单文件数据加载结果一致"""
+        partition_dataset(self.cb_path, self.cb_dir, freq='month', row_group_size=10)
+        partition_dataset(self.index_path, self.index_dir, freq='year')
+
+        expected = load_dataset(self.cb_path, self.index_path, start_date='20231215', end_date='20240110')
+        result = load_dataset(self.cb_dir, self.index_dir, start_date='20231215', end_date='20240110')
+
+        pd.testing.assert_frame_equal(result.cb_data.sort_index(), expected.cb_data.sort_index())
+        self.assertEqual(result.index_data.index.get_level_values('trade_date').min(), 20231215)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+import pandas as pd
+import numpy as np
+from ..core.backtester import CBBacktester
+from ..core.eval import evaluate_performance
+from ..core.selection import Selection, rebalance_mask, top_n_mask
+
+class TestSelection(unittest.TestCase):
+    def test_top_n_mask_ties(self):
+        """测试前N名选择与 rank(method='min') <= N 一致（含并列）"""
+        rng = np.random.default_rng(2)
+        score = rng.integers(0, 5, size=(50, 12)).astype(float)
+        valid = rng.random((50, 12)) > 0.2
+
+        for n in [1, 3, 5, 12, 20]:
+            ranks = pd.DataFrame(np.where(valid, score, np.nan)).rank(axis=1, method='min').to_numpy()
+            np.testing.assert_array_equal(top_n_mask(score, valid, n), ranks <= n, err_msg=f"n={n}")
+
+    def test_rebalance_mask(self):
+        """测试按调仓频率和最短持有期推进持仓"""
+        rng = np.random.default_rng(5)
+        score = rng.random((20, 8))
+        valid = np.ones((20, 8), dtype=bool)
+
+        # 每日调仓、持有1天时与每日前N名一致
+        np.testing.assert_array_equal(rebalance_mask(score, valid, valid, 3), top_n_mask(score, valid, 3))
+
+        # 非调仓日沿用前一日持仓
+        held = rebalance_mask(score, valid, valid, 3, rebalance_every=5)
+        for t in range(20):
+            base = t - t % 5
+            np.testing.assert_array_equal(held[t], top_n_mask(score[base:base + 1], valid[base:base + 1], 3)[0])
+
+        # 未满最短持有期的持仓不卖出
+        score = np.array([[0.0, 1.0, 2.0], [2.0, 0.0, 1.0], [2.0, 1.0, 0.0]])
+        valid = np.ones((3, 3), dtype=bool)
+        held = rebalance_mask(score, valid, valid, 1, hold_days=2)
+        np.testing.assert_array_equal(held, [[True, False, False], [True, True, False], [False, True, True]])
+
+        # 当日没有记录的持仓视为卖出
+        present = valid.copy()
+        present[1, 0] = False
+        held = rebalance_mask(score, valid, present, 1, rebalance_every=3)
+        np.testing.assert_array_equal(held[:, 0], [True, False, False])
+
+    def test_from_mask(self):
+        """测试紧凑结构的分段与行号"""
+        mask = np.array([[True, False, True], [False, False, False], [False, True, False]])
+        rows = np.arange(9).reshape(3, 3)
+        selection = Selection.from_mask(mask, np.array([1, 2, 3]), np.array(['a', 'b', 'c']), rows)
+
+        np.testing.assert_array_equal(selection.offsets, [0, 2, 2, 3])
+        np.testing.assert_array_equal(selection.rows, [0, 2, 7])
+        self.assertEqual(selection.to_dict(), {1: ['a', 'c'], 2: [], 3: ['b']})
+
+    def test_turnover(self):
+        """测试调入调出数量与稠密持仓矩阵差分一致"""
+        rng = np.random.default_rng(4)
+        mask = rng.random((30, 10)) > 0.6
+        mask[5] = False
+        selection = Selection.from_mask(mask, np.arange(30), np.arange(10), np.zeros((30, 10), dtype=int))
+
+        entries, exits = selection.turnover()
+        previous = np.vstack([np.zeros((1, 10), dtype=bool), mask[:-1]])
+        np.testing.assert_array_equal(entries, (mask & ~previous).sum(axis=1))
+        np.testing.assert_array_equal(exits, (previous & ~mask).sum(axis=1))
+
+    def test_backtester_selection(self):
+        """测试回测器的选择结果与完整排名一致，且可按需计算排名"""
+        dates = [20240102, 20240103, 20240104]
+        codes = [f'1230{i:02d}' for i in range(6)]
+        index = pd.MultiIndex.from_product([codes, dates], names=['code', 'trade_date'])
+        rng = np.random.default_rng(3)
+        df = pd.DataFrame({
+            'close': rng.uniform(100, 150, len(index)),
+            'pct_chg': rng.uniform(-0.05, 0.05, len(index)),
+            'ytm': rng.integers(0, 3, len(index)).astype(float),
+        }, index=index)
+
+        for engine in ['frame', 'panel']:
+            backtester = CBBacktester(df, None, exclude_conditions=['close > 140'], score_factors=['ytm'],
+                                      weights=[1], hold_num=2, engine=engine, full_rank=False)
+            backtester.apply_filters()
+            backtester.compute_score()
+            self.assertNotIn('rank', backtester.df.columns)
+
+            ranks = backtester.compute_ranks()
+            expected = ranks[ranks <= 2].index
+            selected = [(code, date) for date, selected_codes in backtester.selection.to_dict().items()
+                        for code in selected_codes]
+            self.assertEqual(sorted(selected), sorted(expected), msg=engine)
+
+    def test_weekly_rebalance_hold_days(self):
+        """测试每5个交易日调仓时平均持有天数大于1"""
+        dates = [int(d.strftime('%Y%m%d')) for d in pd.bdate_range('2024-01-01', periods=20)]
+        codes = [f'1230{i:02d}' for i in range(10)]
+        index = pd.MultiIndex.from_product([codes, dates], names=['code', 'trade_date'])
+        rng = np.random.default_rng(6)
+        df = pd.DataFrame({
+            'close': rng.uniform(100, 150, len(index)),
+            'pct_chg': rng.uniform(-0.05, 0.05, len(index)),
+            'ytm': rng.random(len(index)),
+        }, index=index)
+
+        backtester = CBBacktester(df, None, score_factors=['ytm'], weights=[1], hold_num=3,
+                                  stop_profit=0, rebalance_every=5)
+        results = backtester.run()
+
+        self.assertTrue((results['positions'] == 3).all())
+        self.assertEqual(results['entries'].iloc[1:5].sum(), 0)
+        self.assertEqual(results['cost'].iloc[1:5].sum(), 0)
+        self.assertGreater(evaluate_performance(results)['avg_hold_days'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
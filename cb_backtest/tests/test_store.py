@@ -0,0 +1,126 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+import numpy as np
+from ..core.dataset import load_dataset
+from ..core.store import PanelStore, ensure_store, get_store
+from ..core.single_runner import SingleRunner
+
+class TestPanelStore(unittest.TestCase):
+    def setUp(self):
+        """准备测试数据文件"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cb_path = os.path.join(self.tmpdir.name, 'cb_data.pq')
+        self.index_path = os.path.join(self.tmpdir.name, 'index.pq')
+        self.store_dir = os.path.join(self.tmpdir.name, 'panel_store')
+
+        dates = pd.bdate_range('2024-01-01', periods=10)
+        codes = ['123001', '123002', '123003', '123004']
+        index = pd.MultiIndex.from_product([codes, dates], names=['code', 'trade_date'])
+
+        cb_df = pd.DataFrame({
+            'close': np.random.uniform(100, 150, len(index)),
+            'open': np.random.uniform(100, 150, len(index)),
+            'high': np.random.uniform(100, 150, len(index)),
+            'low': np.random.uniform(100, 150, len(index)),
+            'pct_chg': np.random.uniform(-0.05, 0.05, len(index)),
+            'is_call': np.random.choice(['正常', '已公告强赎'], len(index)),
+        }, index=index)
+        # 去掉部分行，模拟停牌
+        cb_df = cb_df.drop(index=[('123002', dates[3]), ('123004', dates[0])])
+        cb_df.to_parquet(self.cb_path)
+
+        index_df = pd.DataFrame({'index_jsl': np.random.uniform(1, 2, len(dates))}, index=pd.Index(dates, name='trade_date'))
+        index_df.to_parquet(self.index_path)
+
+        self.dataset = load_dataset(self.cb_path, self.index_path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _expected(self, start_date, end_date):
+        df = self.dataset.cb_data
+        dates = df.index.get_level_values('trade_date')
+        expected = df[(dates >= start_date) & (dates <= end_date)]
+        return expected.sort_index(level=['trade_date', 'code'])
+
+    def test_slice_frame(self):
+        """测试按日期区间物化的数据与原始数据一致"""
+        store = PanelStore.build(self.dataset, self.store_dir)
+        result = store.slice_frame('20240103', '20240110')
+        expected = self._expected(20240103, 20240110)
+
+        self.assertTrue(result.index.equals(expected.index))
+        np.testing.assert_allclose(result['close'].to_numpy(), expected['close'].to_numpy())
+        self.assertEqual(result['is_call'].astype(str).tolist(), expected['is_call'].tolist())
+
+    def test_next_day(self):
+        """测试存储与数据集的次日行情一致（停牌次日为 NaN）"""
+        store = PanelStore.build(self.dataset, self.store_dir)
+        expected = self.dataset.next_day
+
+        for name in ['open', 'high', 'close', 'pct_chg']:
+            np.testing.assert_allclose(store.next_day[name], expected[name])
+
+        # 次日行情在构建时写入文件，重新打开后同样以只读内存映射方式读取
+        reopened = PanelStore.open(self.store_dir)
+        self.assertIsInstance(reopened.next_day['close'], np.memmap)
+        self.assertFalse(reopened.next_day['close'].flags.writeable)
+        np.testing.assert_allclose(reopened.next_day['close'], expected['close'])
+
+        df = self.dataset.cb_data
+        row = df.index.get_loc(('123002', 20240103))
+        self.assertTrue(np.isnan(expected['close'][row]))
+        row = df.index.get_loc(('123001', 20240103))
+        self.assertEqual(expected['close'][row], df.loc[('123001', 20240104), 'close'])
+
+    def test_store_is_read_only(self):
+        """测试存储以只读内存映射方式打开"""
+        store = PanelStore.build(self.dataset, self.store_dir)
+
+        self.assertIsInstance(store.column('close'), np.memmap)
+        self.assertFalse(store.column('close').flags.writeable)
+
+    def test_ensure_store_reuses_current_version(self):
+        """测试数据版本未变化时不重复构建"""
+        first = ensure_store(self.cb_path, self.index_path, self.store_dir)
+        meta_mtime = os.stat(os.path.join(self.store_dir, 'meta.json')).st_mtime_ns
+        second = ensure_store(self.cb_path, self.index_path, self.store_dir)
+
+        self.assertEqual(first.version, second.version)
+        self.assertEqual(meta_mtime, os.stat(os.path.join(self.store_dir, 'meta.json')).st_mtime_ns)
+
+    def test_rebuild_swaps_link(self):
+        """测试重建存储时原子切换符号链接：已打开的旧存储仍可读，只保留最近两个版本目录"""
+        first = PanelStore.build(self.dataset, self.store_dir)
+        self.assertTrue(os.path.islink(self.store_dir))
+        second = PanelStore.build(self.dataset, self.store_dir)
+        self.assertNotEqual(first.directory, second.directory)
+        self.assertEqual(os.path.realpath(self.store_dir), second.directory)
+        np.testing.assert_allclose(first.column('close'), second.column('close'))
+
+        third = PanelStore.build(self.dataset, self.store_dir)
+        versions = [entry for entry in os.listdir(self.tmpdir.name) if entry.startswith('panel_store.v-')]
+        self.assertEqual(sorted(versions), sorted(os.path.basename(store.directory) for store in [second, third]))
+        self.assertFalse(os.path.exists(first.directory))
+        self.assertEqual(get_store(self.store_dir).directory, third.directory)
+
+        # 旧格式的普通目录在首次重建时迁移为链接
+        legacy = os.path.join(self.tmpdir.name, 'legacy_store')
+        shutil.copytree(third.directory, legacy)
+        PanelStore.build(self.dataset, legacy)
+        self.assertTrue(os.path.islink(legacy))
+
+    def test_runner_on_store(self):
+        """测试运行器直接基于存储取数"""
+        store = PanelStore.build(self.dataset, self.store_dir)
+        runner = SingleRunner(store=store)
+
+        self.assertEqual(runner._date_bounds(), (20240101, 20240112))
+        selected = runner._select_dates(20240102, 20240105)
+        self.assertTrue(selected.index.equals(self._expected(20240102, 20240105).index))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+import pandas as pd
+import numpy as np
+from ..core.backtester import CBBacktester
+from ..core.selection import Selection
+from ..core.trade_log import BUY, SELL, TradeLog
+
+class TestTradeLog(unittest.TestCase):
+    def setUp(self):
+        """准备每日持仓：a 连续持有两天，b 持有一天，c 最后一天买入"""
+        mask = np.array([
+            [True, True, False],
+            [True, False, False],
+            [False, False, True],
+        ])
+        rows = np.arange(9).reshape(3, 3)
+        self.selection = Selection.from_mask(mask, np.array([20240102, 20240103, 20240104]),
+                                             np.array(['a', 'b', 'c']), rows)
+        self.close = np.arange(100.0, 109.0)
+        self.trade_returns = np.array([0.1, 0.02, 0.05, np.nan])
+        self.stop_hit = np.array([False, True, False, False])
+
+    def test_from_selection(self):
+        """测试买卖事件与持有期收益"""
+        log = TradeLog.from_selection(self.selection, self.close, self.trade_returns, self.stop_hit)
+
+        np.testing.assert_array_equal(log.date_idx, [0, 0, 1, 2, 2])
+        np.testing.assert_array_equal(log.code_idx, [0, 1, 1, 0, 2])
+        np.testing.assert_array_equal(log.side, [BUY, BUY, SELL, SELL, BUY])
+        np.testing.assert_allclose(log.price, [100.0, 101.0, 101.0 * 1.02, 103.0 * 1.05, 108.0])
+        np.testing.assert_allclose(log.returns[[2, 3]], [0.02, 1.1 * 1.05 - 1])
+        self.assertTrue(np.isnan(log.returns[[0, 1, 4]]).all())
+        np.testing.assert_allclose(log.entry_price[[2, 3]], [101.0, 100.0])
+        np.testing.assert_array_equal(log.hold_days, [0, 0, 1, 2, 0])
+        np.testing.assert_array_equal(log.stop_hit, [False, False, True, False, False])
+        self.assertFalse(TradeLog.from_selection(self.selection, self.close, self.trade_returns).stop_hit.any())
+
+    def test_materialize(self):
+        """测试转换为 API 结构"""
+        log = TradeLog.from_selection(self.selection, self.close, self.trade_returns, self.stop_hit)
+
+        self.assertEqual(log.positions(), {'2024-01-02': ['a', 'b'], '2024-01-03': ['a'], '2024-01-04': ['c']})
+        trades = log.trades()
+        self.assertEqual(trades[2], {'date': '2024-01-03', 'code': 'b', 'side': 'sell', 'price': 101.0 * 1.02,
+                                     'return': 0.020000000000000018, 'entry_price': 101.0, 'hold_days': 1, 'stop_hit': True})
+        self.assertIsNone(trades[0]['return'])
+        self.assertIsNone(trades[0]['hold_days'])
+        self.assertIsNone(trades[0]['stop_hit'])
+        self.assertFalse(trades[3]['stop_hit'])
+
+        columnar = log.to_columnar()
+        self.assertEqual(columnar['codes'], ['a', 'b', 'c'])
+        self.assertEqual(columnar['positions']['offsets'], [0, 2, 3, 4])
+        self.assertEqual(columnar['trades']['side'], [1, 1, -1, -1, 1])
+        self.assertEqual(columnar['trades']['stop_hit'], [None, None, True, False, None])
+
+    def test_rebuild_from_columnar(self):
+        """测试由列式结构还原 positions() 和 trades()"""
+        log = TradeLog.from_selection(self.selection, self.close, self.trade_returns, self.stop_hit)
+        columnar = log.to_columnar()
+        dates, codes = columnar['dates'], columnar['codes']
+
+        offsets = columnar['positions']['offsets']
+        positions = {
+            date: [codes[c] for c in columnar['positions']['code_idx'][offsets[i]:offsets[i + 1]]]
+            for i, date in enumerate(dates)
+        }
+        self.assertEqual(positions, log.positions())
+
+        trades = columnar['trades']
+        rebuilt = [
+            {
+                'date': dates[trades['date_idx'][i]],
+                'code': codes[trades['code_idx'][i]],
+                'side': 'buy' if trades['side'][i] == BUY else 'sell',
+                **{key: trades[key][i] for key in ['price', 'return', 'entry_price', 'hold_days', 'stop_hit']},
+            }
+            for i in range(len(trades['side']))
+        ]
+        self.assertEqual(rebuilt, log.trades())
+
+    def test_backtester_trade_log(self):
+        """测试回测后交易记录与持仓、调入数量一致"""
+        rng = np.random.default_rng(8)
+        dates = [int(d.strftime('%Y%m%d')) for d in pd.bdate_range('2024-01-01', periods=15)]
+        index = pd.MultiIndex.from_product([[f'1230{i:02d}' for i in range(8)], dates], names=['code', 'trade_date'])
+        df = pd.DataFrame({
+            'close': rng.uniform(100, 150, len(index)),
+            'pct_chg': rng.uniform(-0.05, 0.05, len(index)),
+            'ytm': rng.random(len(index)),
+        }, index=index)
+
+        backtester = CBBacktester(df, None, score_factors=['ytm'], weights=[1], hold_num=3, stop_profit=0)
+        results = backtester.run()
+        log = backtester.trade_log
+
+        self.assertEqual((log.side == BUY).sum(), backtester.selection.turnover()[0].sum())
+        self.assertEqual(int(results['entries'].sum()), (log.side[log.date_idx < len(results)] == BUY).sum())
+        self.assertEqual(len(log.positions()), len(dates))
+
+    def test_backtester_stop_hit(self):
+        """测试回测的止盈卖出在交易记录和列式结构中可识别"""
+        index = pd.MultiIndex.from_product([['123001', '123002', '123003'], [20240101, 20240102, 20240103]],
+                                           names=['code', 'trade_date'])
+        df = pd.DataFrame({
+            'close': [100.0, 101.0, 101.0, 100.0, 106.0, 106.0, 100.0, 99.0, 99.0],
+            'open': [100.0, 100.5, 100.5, 100.0, 105.0, 105.0, 100.0, 99.5, 99.5],
+            'high': [100.0, 104.0, 104.0, 100.0, 107.0, 107.0, 100.0, 100.0, 100.0],
+            'pct_chg': [0.0, 0.01, 0.0, 0.0, 0.06, 0.0, 0.0, -0.01, 0.0],
+            'ytm': [1.0, 9.0, 9.0, 2.0, 9.0, 9.0, 3.0, 9.0, 9.0],
+        }, index=index)
+
+        backtester = CBBacktester(df, None, exclude_conditions=['ytm > 5'], score_factors=['ytm'], weights=[1], hold_num=3,
+                                  stop_profit=0.03, fee_rate=0)
+        backtester.run()
+        sells = {trade['code']: trade['stop_hit'] for trade in backtester.trade_log.trades() if trade['side'] == 'sell'}
+        self.assertEqual(sells, {'123001': True, '123002': True, '123003': False})
+        columnar = backtester.trade_log.to_columnar()['trades']
+        self.assertEqual(sorted(t for t in columnar['stop_hit'] if t is not None), [False, True, True])
+
+if __name__ == '__main__':
+    unittest.main()
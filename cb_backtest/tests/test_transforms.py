@@ -0,0 +1,177 @@
+import unittest
+import pandas as pd
+import numpy as np
+from ..core.backtester import CBBacktester
+from ..core.dataset import Dataset, strategy_columns
+from ..core.single_runner import SingleRunner
+from ..core.transforms import Transform, TransformCache, cross_sectional, parse_transform, get_transform_cache
+
+class TestTransforms(unittest.TestCase):
+    def setUp(self):
+        """准备按 (trade_date, code) 排序、含缺失值和并列值的截面数据"""
+        rng = np.random.default_rng(23)
+        dates = [int(d.strftime('%Y%m%d')) for d in pd.bdate_range('2024-01-01', periods=20)]
+        codes = [f'1230{i:02d}' for i in range(8)]
+        index = pd.MultiIndex.from_product([dates, codes], names=['trade_date', 'code'])
+        close = rng.uniform(100, 150, len(index))
+        df = pd.DataFrame({
+            'close': close,
+            'open': close,
+            'high': close,
+            'low': close,
+            'pct_chg': rng.uniform(-0.05, 0.05, len(index)),
+            'bond_prem': rng.integers(0, 5, len(index)).astype(float),
+            'ytm': rng.random(len(index)),
+        }, index=index)
+        df.iloc[::7, df.columns.get_loc('bond_prem')] = np.nan
+        self.df = df.drop(index=[(dates[3], codes[2]), (dates[0], codes[5])])
+        self.index_df = pd.DataFrame({'close': 1.0},
+                                     index=pd.MultiIndex.from_product([['000001.SH'], dates], names=['code', 'trade_date']))
+        self.date_idx, _ = pd.factorize(self.df.index.get_level_values('trade_date'), sort=True)
+        self.code_idx, _ = pd.factorize(self.df.index.get_level_values('code'))
+        get_transform_cache().clear()
+
+    def test_matches_pandas(self):
+        """测试批量截面变换与逐列 groupby 结果一致（含并列、缺失和排除）"""
+        exclude = (self.df['close'] > 140).to_numpy()
+        values = self.df[['bond_prem', 'ytm']].to_numpy().T
+        universe = self.df.loc[~exclude, ['bond_prem', 'ytm']].groupby('trade_date')
+
+        ranks = cross_sectional(values, self.date_idx, self.code_idx, Transform('rank', ascending=False, filtered=True),
+                                exclude=exclude)
+        expected = universe.rank(ascending=False).reindex(self.df.index)
+        np.testing.assert_allclose(ranks.T, expected.to_numpy())
+
+        pct = cross_sectional(values, self.date_idx, self.code_idx, Transform('pct_rank'))
+        expected = self.df[['bond_prem', 'ytm']].groupby('trade_date').rank(pct=True)
+        np.testing.assert_allclose(pct.T, expected.to_numpy())
+
+        zscore = cross_sectional(values, self.date_idx, self.code_idx, Transform('zscore', filtered=True), exclude=exclude)
+        expected = universe.transform(lambda x: (x - x.mean()) / x.std()).reindex(self.df.index)
+        np.testing.assert_allclose(zscore.T, expected.to_numpy(), rtol=1e-9, atol=1e-12)
+
+    def test_parse_transform(self):
+        """测试变换列名解析和策略读取列"""
+        self.assertEqual(parse_transform('bond_prem_score'), ('bond_prem', Transform('rank', ascending=False, filtered=True)))
+        self.assertEqual(parse_transform('turnover_pct'), ('turnover', Transform('pct_rank')))
+        self.assertIsNone(parse_transform('pct_chg'))
+
+        columns = strategy_columns([{'score_factors': ['bond_prem_score', 'natr_5_score'],
+                                     'exclude_conditions': ['turnover_pct < 0.1']}])
+        self.assertTrue({'bond_prem', 'turnover', 'natr_5', 'high', 'low'} <= set(columns))
+
+    def test_cache(self):
+        """测试按 (条件集合, 列) 缓存：条件写法不同也命中，条件变化时重新计算"""
+        cache = TransformCache()
+        loads = []
+
+        def column(name):
+            loads.append(name)
+            return self.df[name].to_numpy()
+
+        exclusion = lambda: (self.df['close'] > 140).to_numpy()
+        items = [('bond_prem', Transform('rank', ascending=False, filtered=True)), ('ytm', Transform('pct_rank'))]
+        first = cache.transform('v1', items, column, self.date_idx, self.code_idx, ['close > 140'], exclusion)
+        self.assertEqual(sorted(loads), ['bond_prem', 'ytm'])
+
+        loads.clear()
+        second = cache.transform('v1', items, column, self.date_idx, self.code_idx, ['(close>140)'], exclusion)
+        self.assertEqual(loads, [])
+        self.assertIs(first[0], second[0])
+        self.assertFalse(second[0].flags.writeable)
+
+        # 不受条件影响的变换在其他条件下同样命中
+        cache.transform('v1', items, column, self.date_idx, self.code_idx, ['close > 120'], exclusion)
+        self.assertEqual(loads, ['bond_prem'])
+        self.assertEqual(cache.stats()['hits'], 3)
+
+    def test_runner_score_factors(self):
+        """测试策略直接引用 *_score 列与预先计算的排名列结果一致"""
+        strategy = {
+            'exclude_conditions': ['close > 140', 'ytm_pct < 0.1'],
+            'score_factors': ['bond_prem_score', 'ytm'],
+            'weights': [1, -10],
+            'hold_num': 2,
+            'stop_profit': 0,
+            'fee_rate': 0,
+        }
+        runner = SingleRunner(dataset=Dataset(cb_data=self.df, index_data=self.index_df, version='test'))
+        result = runner.run('20240103', '20240126', strategy)
+
+        df = self.df.copy()
+        df['ytm_pct'] = df.groupby('trade_date')['ytm'].rank(pct=True)
+        excluded = (df['close'] > 140) | (df['ytm_pct'] < 0.1)
+        df['bond_prem_rank'] = df.loc[~excluded, 'bond_prem'].groupby('trade_date').rank(ascending=False)
+        expected = SingleRunner(dataset=Dataset(cb_data=df, index_data=self.index_df, version='expected')).run(
+            '20240103', '20240126', {**strategy, 'score_factors': ['bond_prem_rank', 'ytm'],
+                                     'exclude_conditions': ['close > 140', 'ytm_pct < 0.1']})
+
+        self.assertGreater(len(result['daily_returns']), 0)
+        self.assertEqual(result['daily_returns'], expected['daily_returns'])
+        self.assertGreater(get_transform_cache().stats()['entries'], 0)
+
+    def test_winsorized_zscore(self):
+        """测试截断标准分：与标准分同号，绝对值不超过阈值"""
+        values = np.zeros((2, 20))
+        values[:, 0] = 100.0
+        values[1, 1:] = np.arange(19)
+        date_idx = np.repeat([0, 1], 20)
+        code_idx = np.tile(np.arange(20), 2)
+
+        zscore = cross_sectional(values.ravel(), date_idx, code_idx, Transform('zscore'))
+        winsorized = cross_sectional(values.ravel(), date_idx, code_idx, Transform('winsorized_zscore'))
+        self.assertGreater(zscore[0], 3)
+        self.assertEqual(winsorized[0], 3)
+        np.testing.assert_array_equal(np.sign(winsorized), np.sign(zscore))
+        np.testing.assert_allclose(winsorized[20:], np.clip(zscore[20:], -3, 3))
+
+    def test_normalize_engines(self):
+        """测试 normalize 在长表与面板引擎上一致，rank 等价于预先计算的排名列"""
+        df = self.df.copy()
+        excluded = df['close'] > 140
+        for column in ['bond_prem', 'ytm']:
+            df[f'{column}_rank'] = df.loc[~excluded, column].groupby('trade_date').rank()
+        kwargs = dict(index_df=self.index_df, exclude_conditions=['close > 140'], weights=[1, -2], hold_num=2,
+                      stop_profit=0, fee_rate=0)
+
+        expected = CBBacktester(df, score_factors=['bond_prem_rank', 'ytm_rank'], **kwargs).run()
+        for engine in ['frame', 'panel']:
+            result = CBBacktester(df, score_factors=['bond_prem', 'ytm'], engine=engine, normalize='rank', **kwargs).run()
+            pd.testing.assert_series_equal(result['returns'], expected['returns'])
+
+        frame = CBBacktester(df, score_factors=['bond_prem', 'ytm'], normalize='winsorized_zscore', **kwargs).run()
+        panel = CBBacktester(df, score_factors=['bond_prem', 'ytm'], normalize='winsorized_zscore', engine='panel',
+                             **kwargs).run()
+        pd.testing.assert_series_equal(frame['returns'], panel['returns'])
+
+        with self.assertRaises(ValueError):
+            CBBacktester(df, score_factors=['ytm'], normalize='minmax', **kwargs)
+
+    def test_runner_normalize(self):
+        """测试策略 normalize 选项：结果与自行计算一致，重复请求命中变换缓存"""
+        strategy = {
+            'exclude_conditions': ['close > 140'],
+            'score_factors': ['bond_prem', 'ytm_score'],
+            'weights': [1, 2],
+            'hold_num': 2,
+            'stop_profit': 0,
+            'fee_rate': 0,
+            'normalize': 'zscore',
+        }
+        dataset = Dataset(cb_data=self.df, index_data=self.index_df, version='test')
+        result = SingleRunner(dataset=dataset).run('20240103', '20240126', strategy)
+
+        filtered = SingleRunner(dataset=dataset)._select_dates(20240103, 20240126)
+        filtered['ytm_score'] = filtered.loc[filtered['close'] <= 140, 'ytm'].groupby('trade_date').rank(ascending=False)
+        backtester = CBBacktester(filtered, self.index_df, exclude_conditions=strategy['exclude_conditions'],
+                                  score_factors=strategy['score_factors'], weights=strategy['weights'], hold_num=2,
+                                  stop_profit=0, fee_rate=0, normalize='zscore')
+        expected = backtester.run()
+        np.testing.assert_allclose(list(result['daily_returns'].values()), expected['returns'].to_numpy())
+
+        hits = get_transform_cache().hits
+        SingleRunner(dataset=dataset).run('20240103', '20240126', strategy)
+        self.assertEqual(get_transform_cache().hits, hits + 3)
+
+if __name__ == '__main__':
+    unittest.main()
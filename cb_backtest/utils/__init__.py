@@ -10,17 +10,20 @@
 """
 
 from .logger import setup_logger, logger
-from .date import parse_date, date_range
+from .date import parse_date, date_range, to_int_date, to_int_dates, int_dates_to_datetime
 from .data import safe_divide, round_dict
 from .file import ensure_directory
 from .validation import validate_weights, validate_date_order
-from .metrics import calculate_drawdown, calculate_sharpe_ratio
+from .metrics import calculate_drawdown, calculate_sharpe_ratio, performance_metrics
 
 __all__ = [
     'setup_logger',
     'logger',
     'parse_date',
     'date_range',
+    'to_int_date',
+    'to_int_dates',
+    'int_dates_to_datetime',
     'safe_divide',
     'round_dict',
     'ensure_directory',
@@ -28,4 +31,5 @@ __all__ = [
     'validate_date_order',
     'calculate_drawdown',
     'calculate_sharpe_ratio',
+    'performance_metrics',
 ] 
\ No newline at end of file
@@ -5,6 +5,7 @@
 
 from typing import List, Union
 from datetime import date, datetime
+import numpy as np
 import pandas as pd
 from .logger import logger
 
@@ -50,4 +51,48 @@ def date_range(
     if start > end:
         raise ValueError(f"开始日期 {start} 晚于结束日期 {end}")
         
-    return pd.date_range(start, end, freq=freq).date.tolist() 
\ No newline at end of file
+    return pd.date_range(start, end, freq=freq).date.tolist() 
+
+def to_int_date(value: Union[str, int, date]) -> int:
+    """将日期转换为 YYYYMMDD 格式的整数
+    
+    Args:
+        value: 日期字符串（如 '20240101'、'2024-01-01'）、日期对象或 YYYYMMDD 整数
+        
+    Returns:
+        YYYYMMDD 整数，如 20240101
+        
+    Raises:
+        ValueError: 日期格式无效时抛出
+    """
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    d = parse_date(value)
+    return d.year * 10000 + d.month * 100 + d.day
+
+def to_int_dates(values) -> np.ndarray:
+    """批量将日期序列转换为 YYYYMMDD 格式的 int32 数组
+    
+    Args:
+        values: 日期数组、字符串数组或已是 YYYYMMDD 整数的数组
+        
+    Returns:
+        int32 数组
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in 'iu':
+        return values.astype(np.int32)
+    dates = pd.DatetimeIndex(pd.to_datetime(values))
+    return (dates.year * 10000 + dates.month * 100 + dates.day).to_numpy(dtype=np.int32)
+
+def int_dates_to_datetime(values) -> pd.DatetimeIndex:
+    """将 YYYYMMDD 整数数组转换为 DatetimeIndex
+    
+    Args:
+        values: YYYYMMDD 整数数组
+        
+    Returns:
+        DatetimeIndex
+    """
+    values = np.asarray(values, dtype=np.int64)
+    return pd.DatetimeIndex(pd.to_datetime(values.astype(str), format='%Y%m%d'))
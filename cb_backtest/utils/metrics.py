@@ -5,7 +5,7 @@
 
 import numpy as np
 import pandas as pd
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 from .logger import logger
 
 def calculate_drawdown(returns: pd.Series) -> pd.Series:
@@ -114,4 +114,74 @@ def calculate_max_drawdown(returns: pd.Series) -> Tuple[float, Optional[pd.Times
         return float(max_dd), peak_idx, end_idx
     except Exception as e:
         logger.error(f"最大回撤计算错误: {str(e)}")
-        raise 
\ No newline at end of file
+        raise
+
+def _finite(value: float) -> Optional[float]:
+    """有限值转换为 float，NaN 和 ±inf 返回 None"""
+    return float(value) if np.isfinite(value) else None
+
+def performance_metrics(
+    returns: np.ndarray,
+    years: Optional[float] = None,
+    periods_per_year: int = 252
+) -> Dict[str, Optional[float]]:
+    """由日收益率数组一次计算全部绩效指标
+    
+    口径与 quantstats 一致（无风险利率为 0）：
+    - 净值为 (1 + r) 的累乘，缺失收益按 0 计；最大回撤以初始净值 1 为起点，
+      首日亏损也计入
+    - 波动率为样本标准差（ddof=1）乘以 sqrt(periods_per_year)
+    - 夏普比率为均值除以样本标准差后年化
+    - 索提诺比率的下行偏差为 sqrt(负收益平方和 / 有效样本数)
+    - 胜率为正收益天数占全部天数的比例
+    
+    无法定义的指标（有效样本不足 2 个时的波动率和夏普比率、零波动时的夏普比率、
+    没有下行收益时的索提诺比率）记为 None 而不是 NaN/inf：这些值没有合理的数值
+    替代（如记为 0 会与真实的零值混淆），None 可直接序列化为 JSON 的 null。
+    
+    Args:
+        returns: 日收益率数组
+        years: 回测区间的年数，用于年化收益率，None 或不大于 0 时年化收益率为 0
+        periods_per_year: 年化系数
+        
+    Returns:
+        包含 final_nav、annual_return、max_drawdown、volatility、sharpe、
+        sortino_ratio、win_rate 的字典，volatility、sharpe、sortino_ratio 可能为 None
+        
+    Raises:
+        ValueError: 输入为空时抛出
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    if returns.size == 0:
+        raise ValueError("收益率序列不能为空")
+        
+    valid = ~np.isnan(returns)
+    count = int(valid.sum())
+    filled = np.where(valid, returns, 0.0)
+    
+    # 净值与回撤：在净值前补初始净值 1，运行最高点从 1 开始
+    nav = np.cumprod(1 + filled)
+    peak = np.maximum(np.maximum.accumulate(nav), 1.0)
+    final_nav = float(nav[-1])
+    max_drawdown = float((nav / peak).min() - 1)
+    
+    # 均值、样本标准差和下行偏差（均跳过缺失值）
+    annualize = np.sqrt(periods_per_year)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = filled.sum() / count if count else np.nan
+        std = np.sqrt(np.square(np.where(valid, returns - mean, 0.0)).sum() / (count - 1)) if count > 1 else np.nan
+        if count > 1 and np.nanmax(returns) == np.nanmin(returns):
+            std = 0.0  # 常数收益：避免均值的舍入误差产生极小的非零标准差
+        downside = np.sqrt(np.square(np.minimum(filled, 0.0)).sum() / count) if count else np.nan
+        sharpe = mean / std * annualize if std != 0 else np.nan
+        sortino = mean / downside * annualize if downside != 0 else np.nan
+        
+    return {
+        'final_nav': final_nav,
+        'annual_return': float(np.power(final_nav, 1 / years) - 1) if years and years > 0 else 0.0,
+        'max_drawdown': max_drawdown,
+        'volatility': _finite(std * annualize),
+        'sharpe': _finite(sharpe),
+        'sortino_ratio': _finite(sortino),
+        'win_rate': float((filled > 0).sum() / len(returns)),
+    }